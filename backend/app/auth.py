@@ -1,15 +1,19 @@
 from datetime import datetime, timedelta
 from typing import Optional
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status, Response
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
 from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo.errors import DuplicateKeyError
 import os
 from pydantic import BaseModel, EmailStr
 
 from .database import get_db
+from .pagination import PageParams, page_params, set_next_cursor
+from .fields import fields_param, is_sparse, sparse_response
+from .principal_cache import principal_cache
 from .models import User, UserCreate, Token, TokenData, UserUpdate
-from .repository import create_user, get_user_by_email, verify_password, get_user_by_id, update_user, get_all_users
+from .repository import create_user, get_user_by_email, verify_password_async, get_user_by_id, update_user, get_all_users, PasswordHashingBusy
 from typing import List
 
 router = APIRouter()
@@ -19,11 +23,20 @@ ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24 # 24 hours for easier dev
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/v1/auth/login")
+# EventSource cannot set headers, so event streams also accept the token as ?access_token=
+optional_oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/v1/auth/login", auto_error=False)
 
 class LoginRequest(BaseModel):
     email: EmailStr
     password: str
 
+def _password_hashing_busy() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Too many sign-in requests in progress, please retry shortly",
+        headers={"Retry-After": "1"},
+    )
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
     if expires_delta:
@@ -39,12 +52,22 @@ async def signup(user: UserCreate, db: AsyncIOMotorDatabase = Depends(get_db)):
     db_user = await get_user_by_email(db, user.email)
     if db_user:
         raise HTTPException(status_code=400, detail="Email already registered")
-    return await create_user(db, user)
+    try:
+        return await create_user(db, user)
+    except PasswordHashingBusy:
+        raise _password_hashing_busy()
+    except DuplicateKeyError:
+        # A concurrent signup took the email after the check above; the unique index decides
+        raise HTTPException(status_code=400, detail="Email already registered")
 
 @router.post("/login", response_model=Token)
 async def login(login_data: LoginRequest, db: AsyncIOMotorDatabase = Depends(get_db)):
     user = await get_user_by_email(db, login_data.email)
-    if not user or not verify_password(login_data.password, user.hashed_password):
+    try:
+        password_ok = user is not None and await verify_password_async(login_data.password, user.hashed_password)
+    except PasswordHashingBusy:
+        raise _password_hashing_busy()
+    if not password_ok:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
@@ -56,7 +79,18 @@ async def login(login_data: LoginRequest, db: AsyncIOMotorDatabase = Depends(get
         data={"sub": user.email, "role": user.role.value}, expires_delta=access_token_expires
     )
     return {"access_token": access_token, "token_type": "bearer"}
+
 async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncIOMotorDatabase = Depends(get_db)):
+    return await _user_for_token(token, db)
+
+async def get_stream_user(
+    token: Optional[str] = Depends(optional_oauth2_scheme),
+    access_token: Optional[str] = Query(None),
+    db: AsyncIOMotorDatabase = Depends(get_db)
+):
+    return await _user_for_token(token or access_token or "", db)
+
+async def _user_for_token(token: str, db: AsyncIOMotorDatabase) -> User:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -70,22 +104,37 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncIOMotor
         token_data = TokenData(email=email)
     except JWTError:
         raise credentials_exception
+
+    # Hot path: a cached principal skips the users lookup entirely.
+    # Hand out a copy so a handler mutating current_user cannot corrupt the cache.
+    principal = principal_cache.get(token_data.email)
+    if principal is not None:
+        return principal.copy(deep=True)
+
     user = await get_user_by_email(db, email=token_data.email)
     if user is None:
         raise credentials_exception
     # Ensure _id is a string when returning
     if user.id is None and hasattr(user, '_id'):
          user.id = str(user._id)
-    return user
+    # Cache the public User only; the password hash stays out of memory between requests
+    principal = User(**user.dict(by_alias=True, exclude={"hashed_password"}))
+    principal_cache.set(token_data.email, principal)
+    return principal.copy(deep=True)
 
 @router.get("/users", response_model=List[User])
 async def read_users(
+    response: Response,
+    page: PageParams = Depends(page_params),
+    projection: Optional[dict] = Depends(fields_param(User, default_exclude=("hashed_password",))),
     current_user: User = Depends(get_current_user),
     db: AsyncIOMotorDatabase = Depends(get_db)
 ):
     if current_user.role != "operator":
         raise HTTPException(status_code=403, detail="Not authorized to view users")
-    return await get_all_users(db)
+    users = await get_all_users(db, page.limit, page.after, projection)
+    set_next_cursor(response, users, page)
+    return sparse_response(response, users, by_alias=True) if is_sparse(projection) else users
 
 @router.get("/me", response_model=User)
 async def read_users_me(current_user: User = Depends(get_current_user)):
@@ -106,7 +155,7 @@ async def update_user_me(
     # Let's construct the merchant_profile dict if fields are present.
     
     if current_user.role == "merchant":
-        merchant_profile = current_user.merchant_profile or {}
+        merchant_profile = dict(current_user.merchant_profile or {})
         if user_update.min_integration_fee is not None:
             merchant_profile["min_integration_fee"] = user_update.min_integration_fee
         if user_update.eligibility_rules is not None:
@@ -125,11 +174,11 @@ async def update_user_me(
     if not update_data:
         return current_user
 
-    success = await update_user(db, current_user.id, update_data)
-    if not success:
-        raise HTTPException(status_code=500, detail="Failed to update user profile")
+    user = await update_user(db, current_user.id, update_data)
+    if user is None:
+        raise HTTPException(status_code=404, detail="User not found")
         
-    return await get_user_by_id(db, current_user.id)
+    return user
 
 @router.get("/users/{user_id}", response_model=User)
 async def read_user(user_id: str, db: AsyncIOMotorDatabase = Depends(get_db)):
@@ -0,0 +1,137 @@
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+import asyncio
+import hashlib
+import os
+import time
+
+from .models import Bid, Slot, Project, User
+from .repository import get_project_by_id, get_user_by_id
+from .uploads import atomic_write
+from .workers import run_in_worker
+
+DEAL_MEMO_STATUSES = ("Accepted", "AwaitingFinalApproval", "Committed")
+# Outside the /static mount: memos are only served through the authenticated endpoint
+DEAL_MEMO_CACHE_DIR = os.getenv("DEAL_MEMO_CACHE_DIR", "cache/deal_memos")
+# Bump when the layout or content of the memo changes so cached renders are replaced
+DEAL_MEMO_TEMPLATE_VERSION = "1"
+# Renders untouched for this long are removed by sweep_deal_memos; a memo still in use is rendered again
+DEAL_MEMO_TTL_SECONDS = float(os.getenv("DEAL_MEMO_TTL_DAYS", "7")) * 24 * 3600
+
+# Renders in progress in this process, so concurrent downloads of one memo share a render
+_pending_renders: Dict[str, "asyncio.Future"] = {}
+
+def deal_memo_path(bid: Bid) -> str:
+    """Cache location for a bid's memo; changes whenever the bid (or the template) does."""
+    version = hashlib.sha256(f"{DEAL_MEMO_TEMPLATE_VERSION}:{bid.last_modified_date}".encode()).hexdigest()[:16]
+    return os.path.join(DEAL_MEMO_CACHE_DIR, f"{bid.id}-{version}.pdf")
+
+def _party(user: Optional[User], fallback_id: str) -> str:
+    return f"{user.name} <{user.email}>" if user else fallback_id
+
+def deal_memo_sections(bid: Bid, slot: Optional[Slot], project: Optional[Project], creator: Optional[User], buyer: Optional[User]) -> List[Tuple[str, List[Tuple[str, str]]]]:
+    """The memo's content as (heading, [(label, value)]) sections of plain strings."""
+    terms = [("Pricing model", bid.pricing_model), ("Terms", bid.amount_terms)]
+    if bid.amount:
+        terms.append(("Fixed amount", f"{bid.amount:,.2f} {bid.currency or ''}".strip()))
+    if bid.rev_share_percent:
+        terms.append(("Revenue share", f"{bid.rev_share_percent:g}%"))
+    return [
+        ("Deal", [
+            ("Deal ID", bid.id),
+            ("Status", bid.status),
+            ("Objective", bid.objective),
+            ("Flight window", bid.flight_window),
+            ("Submitted", bid.created_date or ""),
+            ("Last updated", bid.last_modified_date or ""),
+        ]),
+        ("Script", [
+            ("Title", project.title if project else "Unknown"),
+            ("Production window", project.production_window if project else "Unknown"),
+        ]),
+        ("Placement", [
+            ("Scene", slot.scene_ref if slot else "Unknown"),
+            ("Description", (slot.description if slot else None) or ""),
+            ("Modality", slot.modality if slot else "Unknown"),
+            ("Pricing floor", f"{slot.pricing_floor:,.2f}" if slot else "Unknown"),
+        ]),
+        ("Parties", [
+            ("Creator", _party(creator, slot.creator_id if slot else "Unknown")),
+            ("Buyer", _party(buyer, bid.counterparty_id)),
+        ]),
+        ("Commercial terms", terms),
+        ("Approvals", [
+            ("Creator final approval", "Yes" if bid.creator_final_approval else "No"),
+            ("Buyer final approval", "Yes" if bid.buyer_final_approval else "No"),
+        ]),
+    ]
+
+def _latin1(text) -> str:
+    # The built-in PDF fonts only cover Latin-1; enums render as their value
+    return str(getattr(text, "value", text)).encode("latin-1", "replace").decode("latin-1")
+
+def render_deal_memo(path: str, sections: list):
+    """Write the memo PDF to path; runs in a worker process."""
+    from fpdf import FPDF
+
+    pdf = FPDF()
+    pdf.set_title("Deal Memo")
+    pdf.add_page()
+    pdf.set_font("Helvetica", "B", 18)
+    pdf.cell(0, 12, "Deal Memo", new_x="LMARGIN", new_y="NEXT")
+    pdf.set_font("Helvetica", "", 9)
+    pdf.cell(0, 6, _latin1(f"Generated {datetime.utcnow().strftime('%Y-%m-%d %H:%M')} UTC"), new_x="LMARGIN", new_y="NEXT")
+    for heading, rows in sections:
+        pdf.ln(4)
+        pdf.set_font("Helvetica", "B", 12)
+        pdf.cell(0, 8, _latin1(heading), new_x="LMARGIN", new_y="NEXT")
+        for label, value in rows:
+            pdf.set_font("Helvetica", "B", 10)
+            pdf.cell(50, 6, _latin1(label))
+            pdf.set_font("Helvetica", "", 10)
+            pdf.multi_cell(0, 6, _latin1(value), new_x="LMARGIN", new_y="NEXT")
+
+    # Earlier versions of this bid's memo stay until sweep_deal_memos; a download may still be reading one
+    with atomic_write(path, prefix=".render-") as handle:
+        handle.write(pdf.output())
+
+def sweep_deal_memos(max_age_seconds: float = DEAL_MEMO_TTL_SECONDS, dry_run: bool = False) -> List[str]:
+    """Remove cached memo renders (and abandoned temp files) not modified for max_age_seconds."""
+    if not os.path.isdir(DEAL_MEMO_CACHE_DIR):
+        return []
+    cutoff = time.time() - max_age_seconds
+    removed = []
+    for name in os.listdir(DEAL_MEMO_CACHE_DIR):
+        path = os.path.join(DEAL_MEMO_CACHE_DIR, name)
+        try:
+            if os.path.getmtime(path) < cutoff:
+                if not dry_run:
+                    os.remove(path)
+                removed.append(path)
+        except FileNotFoundError:
+            pass
+    return removed
+
+async def ensure_deal_memo(bid: Bid, slot: Optional[Slot], project: Optional[Project], creator: Optional[User], buyer: Optional[User]) -> str:
+    """Return the path of the bid's memo PDF, rendering it in the worker pool if this version is not cached."""
+    path = deal_memo_path(bid)
+    if os.path.exists(path):
+        return path
+    pending = _pending_renders.get(path)
+    if pending is None:
+        os.makedirs(DEAL_MEMO_CACHE_DIR, exist_ok=True)
+        pending = asyncio.ensure_future(run_in_worker(render_deal_memo, path, deal_memo_sections(bid, slot, project, creator, buyer)))
+        _pending_renders[path] = pending
+        pending.add_done_callback(lambda _: _pending_renders.pop(path, None))
+    await asyncio.shield(pending)
+    return path
+
+async def get_deal_memo_file(db: AsyncIOMotorDatabase, bid: Bid, slot: Optional[Slot]) -> str:
+    path = deal_memo_path(bid)
+    if os.path.exists(path):
+        return path
+    project = await get_project_by_id(db, slot.project_id) if slot else None
+    creator = await get_user_by_id(db, slot.creator_id) if slot else None
+    buyer = await get_user_by_id(db, bid.counterparty_id)
+    return await ensure_deal_memo(bid, slot, project, creator, buyer)
@@ -0,0 +1,188 @@
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from bson import ObjectId
+from pymongo.errors import OperationFailure, PyMongoError
+from typing import Optional, Set
+import asyncio
+import json
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+EVENT_QUEUE_SIZE = int(os.getenv("EVENT_QUEUE_SIZE", "256"))
+EVENT_RETRY_SECONDS = float(os.getenv("EVENT_RETRY_SECONDS", "5"))
+# Comment line sent on idle streams so proxies keep the connection open
+EVENT_HEARTBEAT_SECONDS = float(os.getenv("EVENT_HEARTBEAT_SECONDS", "20"))
+SSE_MEDIA_TYPE = "text/event-stream"
+# Server error code for $changeStream on a standalone mongod
+_CHANGE_STREAMS_UNSUPPORTED = 40573
+
+class Subscription:
+    def __init__(self, user_id: str, role: str):
+        self.user_id = user_id
+        self.role = role
+        self.queue: "asyncio.Queue[Optional[dict]]" = asyncio.Queue(maxsize=EVENT_QUEUE_SIZE)
+        # Set when events were dropped; the client has to refetch instead of applying deltas
+        self.overflowed = False
+
+    def wants(self, audience: Set[str]) -> bool:
+        return self.role == "operator" or self.user_id in audience
+
+class BidEventBroker:
+    """Fans bid and comment changes out to subscribed users as small deltas.
+
+    With a replica set, changes come from a MongoDB change stream, so writes made by any API
+    worker (or script) reach every subscriber. Against a standalone mongod, change streams are
+    unavailable and the repository's write functions publish directly instead; those events
+    only reach subscribers connected to the same process.
+    """
+
+    def __init__(self):
+        self._subscriptions: Set[Subscription] = set()
+        self._watch_task: Optional[asyncio.Task] = None
+        self._resume_token = None
+        # True while no change stream is feeding the broker
+        self.local = True
+
+    def subscribe(self, user_id: str, role: str) -> Subscription:
+        subscription = Subscription(user_id, role)
+        self._subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        self._subscriptions.discard(subscription)
+
+    def publish(self, event: dict, audience: Set[str]):
+        for subscription in list(self._subscriptions):
+            if not subscription.wants(audience):
+                continue
+            try:
+                subscription.queue.put_nowait(event)
+            except asyncio.QueueFull:
+                # A stalled client must not hold events in memory forever
+                subscription.overflowed = True
+                self.unsubscribe(subscription)
+
+    async def publish_local(self, db: AsyncIOMotorDatabase, event: dict, bid: Optional[dict] = None, slot: Optional[dict] = None):
+        """Called by repository writes; a no-op while the change stream is delivering events.
+
+        Writers pass the bid and its slot when they have them, so no extra reads are needed.
+        """
+        if self.local and self._subscriptions:
+            self.publish(event, await self.audience(db, event["bid_id"], bid, slot))
+
+    async def audience(self, db: AsyncIOMotorDatabase, bid_id: str, bid: Optional[dict] = None, slot: Optional[dict] = None) -> Set[str]:
+        return await _audience(db, bid_id, bid, slot) if self._subscriptions else set()
+
+    def stats(self) -> dict:
+        return {"subscribers": len(self._subscriptions), "source": "local" if self.local else "change_stream"}
+
+    def start(self, db: AsyncIOMotorDatabase):
+        if self._watch_task is None:
+            self._watch_task = asyncio.create_task(self._watch(db))
+
+    async def stop(self):
+        if self._watch_task is not None:
+            self._watch_task.cancel()
+            try:
+                await self._watch_task
+            except asyncio.CancelledError:
+                pass
+            self._watch_task = None
+
+    async def _watch(self, db: AsyncIOMotorDatabase):
+        pipeline = [{"$match": {"ns.coll": {"$in": ["bids", "comments"]}, "operationType": {"$in": ["insert", "update", "replace", "delete"]}}}]
+        while True:
+            try:
+                async with db.watch(pipeline, full_document="updateLookup", resume_after=self._resume_token) as stream:
+                    self.local = False
+                    async for change in stream:
+                        self._resume_token = stream.resume_token
+                        event = _event_from_change(change)
+                        if event and self._subscriptions:
+                            self.publish(event, await self.audience(db, event["bid_id"], change.get("fullDocument")))
+            except OperationFailure as e:
+                self.local = True
+                if e.code == _CHANGE_STREAMS_UNSUPPORTED:
+                    logger.info("Change streams unavailable (standalone mongod); publishing bid events in-process")
+                    return
+                logger.warning("Bid change stream failed, retrying: %s", e)
+                self._resume_token = None
+            except PyMongoError as e:
+                self.local = True
+                logger.warning("Bid change stream interrupted, retrying: %s", e)
+            await asyncio.sleep(EVENT_RETRY_SECONDS)
+
+async def sse_events(subscription: Subscription):
+    """Render a subscription as Server-Sent Events until the client disconnects.
+
+    If the subscriber fell too far behind, a final `resync` event tells it to refetch
+    instead of applying deltas, and the stream ends; EventSource reconnects on its own.
+    """
+    try:
+        yield f"event: ready\ndata: {json.dumps({'retry_ms': int(EVENT_RETRY_SECONDS * 1000)})}\n\n"
+        while True:
+            try:
+                event = await asyncio.wait_for(subscription.queue.get(), EVENT_HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                if subscription.overflowed:
+                    yield "event: resync\ndata: {}\n\n"
+                    return
+                yield ": keepalive\n\n"
+                continue
+            yield f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+            if subscription.overflowed and subscription.queue.empty():
+                yield "event: resync\ndata: {}\n\n"
+                return
+    finally:
+        bid_events.unsubscribe(subscription)
+
+def _jsonable(doc: dict) -> dict:
+    return json.loads(json.dumps(doc, default=str))
+
+def bid_created(bid: dict) -> dict:
+    return {"type": "bid.created", "bid_id": str(bid["_id"]), "bid": _jsonable(bid)}
+
+def bid_updated(bid_id: str, changes: dict) -> dict:
+    return {"type": "bid.updated", "bid_id": bid_id, "changes": _jsonable(changes)}
+
+def bid_deleted(bid_id: str) -> dict:
+    return {"type": "bid.deleted", "bid_id": bid_id}
+
+def comment_created(comment: dict) -> dict:
+    return {"type": "comment.created", "bid_id": comment["bid_id"], "comment": _jsonable({**comment, "id": str(comment["_id"])})}
+
+def _event_from_change(change: dict) -> Optional[dict]:
+    collection = change["ns"]["coll"]
+    doc_id = str(change["documentKey"]["_id"])
+    operation = change["operationType"]
+    if collection == "comments":
+        return comment_created(change["fullDocument"]) if operation == "insert" else None
+    if operation == "insert":
+        return bid_created(change["fullDocument"])
+    if operation == "delete":
+        return bid_deleted(doc_id)
+    if operation == "update":
+        return bid_updated(doc_id, change["updateDescription"]["updatedFields"])
+    return bid_updated(doc_id, {k: v for k, v in (change.get("fullDocument") or {}).items() if k != "_id"})
+
+async def _audience(db: AsyncIOMotorDatabase, bid_id: str, bid: Optional[dict] = None, slot: Optional[dict] = None) -> Set[str]:
+    """The buyer and the slot's creator; operators receive everything regardless.
+
+    `slot` is the bid's slot if already known (an empty dict for a deleted one).
+    """
+    if bid is None or "slot_id" not in bid:
+        if not ObjectId.is_valid(bid_id):
+            return set()
+        bid = await db["bids"].find_one({"_id": ObjectId(bid_id)}, {"counterparty_id": 1, "slot_id": 1})
+        if bid is None:
+            return set()
+    audience = {bid.get("counterparty_id")}
+    slot_id = bid.get("slot_id")
+    if slot is None and slot_id and ObjectId.is_valid(slot_id):
+        slot = await db["slots"].find_one({"_id": ObjectId(slot_id)}, {"creator_id": 1})
+    if slot:
+        audience.add(slot.get("creator_id"))
+    return {user_id for user_id in audience if user_id}
+
+bid_events = BidEventBroker()
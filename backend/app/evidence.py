@@ -0,0 +1,156 @@
+from fastapi.concurrency import run_in_threadpool
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from datetime import datetime
+from typing import List, NamedTuple, Optional
+import asyncio
+import json
+import zipfile
+
+from .models import Bid, Slot, Project, User, Comment
+from .repository import iter_bid_batches, get_slots_by_ids, get_projects_by_ids, get_users_by_ids, get_comments_by_bids
+from .deal_memos import ensure_deal_memo, DEAL_MEMO_STATUSES
+
+EVIDENCE_BATCH_SIZE = 200
+EVIDENCE_FILE_CHUNK_SIZE = 64 * 1024
+
+class EvidenceDeal(NamedTuple):
+    bid: Bid
+    slot: Optional[Slot]
+    project: Optional[Project]
+    creator: Optional[User]
+    buyer: Optional[User]
+    comments: List[Comment] = []
+
+def _party(user: Optional[User], user_id: Optional[str]) -> dict:
+    return {"id": user_id, "name": user.name if user else None, "email": user.email if user else None}
+
+def evidence_pack(deal: EvidenceDeal) -> dict:
+    bid, slot, project = deal.bid, deal.slot, deal.project
+    return {
+        "dealId": bid.id,
+        "status": bid.status,
+        "script": {
+            "title": project.title if project else "Unknown",
+            "creator_id": project.creator_id if project else "Unknown",
+        },
+        "slot": {
+            "sceneRef": slot.scene_ref if slot else "Unknown",
+            "description": slot.description if slot else "Unknown",
+            "pricingFloor": slot.pricing_floor if slot else 0,
+        },
+        "bid": {
+            "counterparty_id": bid.counterparty_id,
+            "objective": bid.objective,
+            "pricingModel": bid.pricing_model,
+            "terms": bid.amount_terms,
+            "amount": bid.amount,
+            "currency": bid.currency,
+            "revSharePercent": bid.rev_share_percent,
+            "flightWindow": bid.flight_window,
+            "submittedDate": bid.created_date,
+            "lastModifiedDate": bid.last_modified_date,
+        },
+        "parties": {
+            "creator": _party(deal.creator, slot.creator_id if slot else None),
+            "buyer": _party(deal.buyer, bid.counterparty_id),
+        },
+        "approvals": {
+            "creator": bid.creator_final_approval,
+            "buyer": bid.buyer_final_approval,
+        },
+        "comments": [comment.dict() for comment in deal.comments],
+        "dealMemoLink": f"/api/v1/bids/{bid.id}/deal_memo",
+    }
+
+async def resolve_deals(db: AsyncIOMotorDatabase, bids: List[Bid]) -> List[EvidenceDeal]:
+    """Attach slot, project, both parties and the comment thread to each bid with one $in query per collection."""
+    slots = await get_slots_by_ids(db, [bid.slot_id for bid in bids])
+    projects, users, comments = await asyncio.gather(
+        get_projects_by_ids(db, [slot.project_id for slot in slots.values()]),
+        get_users_by_ids(db, [bid.counterparty_id for bid in bids] + [slot.creator_id for slot in slots.values()]),
+        get_comments_by_bids(db, [bid.id for bid in bids]),
+    )
+    deals = []
+    for bid in bids:
+        slot = slots.get(bid.slot_id)
+        deals.append(EvidenceDeal(
+            bid=bid,
+            slot=slot,
+            project=projects.get(slot.project_id) if slot else None,
+            creator=users.get(slot.creator_id) if slot else None,
+            buyer=users.get(bid.counterparty_id),
+            comments=comments.get(bid.id, []),
+        ))
+    return deals
+
+class _ChunkBuffer:
+    """Write-only sink for ZipFile; the stream drains it after every entry."""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data: bytes) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+def _write_json(archive: zipfile.ZipFile, name: str, payload):
+    archive.writestr(name, json.dumps(payload, indent=2, default=str))
+
+def _write_file(archive: zipfile.ZipFile, name: str, path: str):
+    with open(path, "rb") as source, archive.open(name, "w") as target:
+        while chunk := source.read(EVIDENCE_FILE_CHUNK_SIZE):
+            target.write(chunk)
+
+async def _memo_paths(deals: List[EvidenceDeal]) -> list:
+    # The worker pool bounds how many render at once; cached memos return immediately
+    return await asyncio.gather(
+        *(
+            ensure_deal_memo(deal.bid, deal.slot, deal.project, deal.creator, deal.buyer) if deal.bid.status in DEAL_MEMO_STATUSES else asyncio.sleep(0, None)
+            for deal in deals
+        ),
+        return_exceptions=True,
+    )
+
+async def stream_evidence_zip(db: AsyncIOMotorDatabase, query: dict, include_memos: bool = True, batch_size: int = EVIDENCE_BATCH_SIZE):
+    """Yield a ZIP with <deal id>/evidence.json (and deal_memo.pdf) per matching bid, plus the manifest.
+
+    Bids are read a batch at a time, each batch resolved with batched lookups, and the archive is
+    handed out entry by entry. The manifest is written per batch too (manifest/batch-NNNN.json lists
+    that batch's deals and errors; manifest.json only totals them), so memory stays bounded by one
+    batch. ZipFile itself still keeps one small directory record per entry until it closes.
+    """
+    buffer = _ChunkBuffer()
+    # The output is not seekable, so entries are written with trailing data descriptors
+    archive = zipfile.ZipFile(buffer, mode="w", compression=zipfile.ZIP_DEFLATED)
+    summary = {"generated": datetime.utcnow().isoformat(), "batches": 0, "deals": 0, "errors": 0}
+
+    async for bids in iter_bid_batches(db, query, batch_size):
+        deals = await resolve_deals(db, bids)
+        memos = await _memo_paths(deals) if include_memos else [None] * len(deals)
+        manifest = {"deals": [], "errors": []}
+        for deal, memo in zip(deals, memos):
+            bid_id = deal.bid.id
+            await run_in_threadpool(_write_json, archive, f"{bid_id}/evidence.json", evidence_pack(deal))
+            if isinstance(memo, BaseException):
+                manifest["errors"].append({"dealId": bid_id, "error": f"Deal memo could not be rendered: {memo}"})
+            elif memo:
+                await run_in_threadpool(_write_file, archive, f"{bid_id}/deal_memo.pdf", memo)
+            manifest["deals"].append({"dealId": bid_id, "status": deal.bid.status, "dealMemo": isinstance(memo, str)})
+            yield buffer.drain()
+        summary["batches"] += 1
+        summary["deals"] += len(manifest["deals"])
+        summary["errors"] += len(manifest["errors"])
+        await run_in_threadpool(_write_json, archive, f"manifest/batch-{summary['batches']:04d}.json", manifest)
+        yield buffer.drain()
+
+    await run_in_threadpool(_write_json, archive, "manifest.json", summary)
+    archive.close()
+    yield buffer.drain()
@@ -0,0 +1,38 @@
+from fastapi import HTTPException, Query, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+from typing import List, Optional, Tuple, Type
+
+def fields_param(model: Type[BaseModel], default_exclude: Tuple[str, ...] = ()):
+    """Build a dependency that turns ?fields=a,b into a Mongo projection for the given model.
+
+    Without ?fields= the projection drops default_exclude (e.g. embedded comment arrays on list views).
+    Field names are the API names; "id" maps to "_id".
+    """
+    allowed = {name: field.alias or name for name, field in model.model_fields.items()}
+
+    def dependency(
+        fields: Optional[str] = Query(None, description="Comma-separated list of fields to return")
+    ) -> Optional[dict]:
+        requested = [name.strip() for name in (fields or "").split(",") if name.strip()]
+        if not requested:
+            return {allowed.get(name, name): 0 for name in default_exclude} or None
+        unknown = [name for name in requested if name not in allowed]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+        return {allowed[name]: 1 for name in requested}
+
+    return dependency
+
+def is_sparse(projection: Optional[dict]) -> bool:
+    """True for a ?fields= projection; default exclusions alone still produce full models."""
+    return bool(projection) and any(projection.values())
+
+def sparse_response(response: Response, items: List[BaseModel], by_alias: bool = False) -> JSONResponse:
+    """Serialize partial models with only the requested fields, keeping headers already set on `response`.
+
+    List routes return full models through their response_model otherwise, so model defaults
+    (e.g. a bid's status) are always present when ?fields= is not given.
+    """
+    return JSONResponse(jsonable_encoder(items, by_alias=by_alias, exclude_unset=True), headers=dict(response.headers))
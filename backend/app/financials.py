@@ -0,0 +1,174 @@
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from bson import ObjectId
+from pymongo import ReplaceOne
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+# Read model behind the creator financing dashboard: one project_financials document per
+# project, keyed by the project's _id, with a running amount and bid count per bucket:
+#
+#   {_id, creator_id, pending: {amount, count}, accepted: {amount, count}, committed: {amount, count}}
+#
+# Bid writes in the repository call record_bid_change() with the bid before and after, which
+# $inc's the difference. The bid write and the counter write are separate operations, so a crash
+# between them can leave the counters off; rebuild_financials.py recomputes them from bids.
+# The API builds the read model on startup while the collection is empty (see
+# ensure_project_financials), so a fresh deployment does not show zeros until someone runs it.
+FINANCIALS_COLLECTION = "project_financials"
+FINANCIAL_BUCKETS = ("pending", "accepted", "committed")
+BUCKET_BY_STATUS = {
+    "Pending": "pending",
+    "Accepted": "accepted",
+    "AwaitingFinalApproval": "accepted",
+    "Committed": "committed",
+}
+
+# Bids inserted before status was stored have none; they are Pending
+_STATUS = {"$ifNull": ["$status", "Pending"]}
+_COUNTED_STATUSES = [*BUCKET_BY_STATUS, None]
+
+def empty_financials() -> dict:
+    return {bucket: {"amount": 0, "count": 0} for bucket in FINANCIAL_BUCKETS}
+
+def _bucket(bid: dict) -> Optional[str]:
+    status = bid.get("status")
+    return BUCKET_BY_STATUS.get(getattr(status, "value", status) or "Pending")
+
+async def bid_slots(db: AsyncIOMotorDatabase, *bids: Optional[dict], known: Optional[dict] = None) -> Dict[str, dict]:
+    """The slots of `bids` by slot_id, with project_id and creator_id; one query for those not in `known`."""
+    slots = dict(known or {})
+    missing = {bid.get("slot_id") for bid in bids if bid} - set(slots)
+    missing = [ObjectId(slot_id) for slot_id in missing if slot_id and ObjectId.is_valid(slot_id)]
+    if missing:
+        async for slot in db["slots"].find({"_id": {"$in": missing}}, {"project_id": 1, "creator_id": 1}):
+            slots[str(slot["_id"])] = slot
+    return slots
+
+async def record_bid_change(db: AsyncIOMotorDatabase, before: Optional[dict], after: Optional[dict], slots: Optional[Dict[str, dict]] = None):
+    """Move a bid's amount and count between buckets; `before` is None for a new bid, `after` for a deleted one.
+
+    Pass `slots` (from bid_slots) when the caller already resolved them; otherwise they are looked up here.
+    """
+    changes = [(doc, sign, _bucket(doc)) for doc, sign in ((before, -1), (after, 1)) if doc and _bucket(doc)]
+    if not changes:
+        return
+    if slots is None:
+        slots = await bid_slots(db, before, after)
+    deltas: Dict[Tuple[str, str], Dict[str, float]] = defaultdict(lambda: defaultdict(int))
+    for doc, sign, bucket in changes:
+        slot = slots.get(doc.get("slot_id"))
+        if not slot or not ObjectId.is_valid(slot.get("project_id") or ""):
+            # Bids on deleted slots no longer count towards any project
+            continue
+        owner = (slot["project_id"], slot.get("creator_id"))
+        deltas[owner][f"{bucket}.amount"] += sign * (doc.get("amount") or 0)
+        deltas[owner][f"{bucket}.count"] += sign
+    for (project_id, creator_id), inc in deltas.items():
+        inc = {field: value for field, value in inc.items() if value}
+        if inc:
+            await db[FINANCIALS_COLLECTION].update_one(
+                {"_id": ObjectId(project_id)},
+                {"$inc": inc, "$set": {"creator_id": creator_id, "last_modified_date": datetime.utcnow().isoformat()}},
+                upsert=True,
+            )
+
+async def remove_slot_financials(db: AsyncIOMotorDatabase, slot: dict):
+    """Take a deleted slot's bids out of its project's counters."""
+    if not ObjectId.is_valid(slot.get("project_id") or ""):
+        return
+    inc = {}
+    pipeline = [
+        {"$match": {"slot_id": str(slot["_id"]), "status": {"$in": _COUNTED_STATUSES}}},
+        {"$group": {"_id": _STATUS, "amount": {"$sum": "$amount"}, "count": {"$sum": 1}}},
+    ]
+    async for group in db["bids"].aggregate(pipeline):
+        bucket = BUCKET_BY_STATUS[group["_id"]]
+        inc[f"{bucket}.amount"] = inc.get(f"{bucket}.amount", 0) - group["amount"]
+        inc[f"{bucket}.count"] = inc.get(f"{bucket}.count", 0) - group["count"]
+    if inc:
+        await db[FINANCIALS_COLLECTION].update_one({"_id": ObjectId(slot["project_id"])}, {"$inc": inc})
+
+async def compute_project_financials(db: AsyncIOMotorDatabase) -> Dict[str, dict]:
+    """Recompute every project's counters from bids and slots, keyed by project id."""
+    pipeline = [
+        {"$match": {"status": {"$in": _COUNTED_STATUSES}}},
+        {"$addFields": {"slot_key": {"$convert": {"input": "$slot_id", "to": "objectId", "onError": None, "onNull": None}}}},
+        {"$lookup": {
+            "from": "slots",
+            "localField": "slot_key",
+            "foreignField": "_id",
+            "pipeline": [{"$project": {"project_id": 1, "creator_id": 1}}],
+            "as": "slot"
+        }},
+        {"$unwind": "$slot"},
+        {"$group": {
+            "_id": {"project_id": "$slot.project_id", "status": _STATUS},
+            "creator_id": {"$first": "$slot.creator_id"},
+            "amount": {"$sum": "$amount"},
+            "count": {"$sum": 1}
+        }},
+    ]
+    computed: Dict[str, dict] = {}
+    async for group in db["bids"].aggregate(pipeline):
+        project_id = group["_id"]["project_id"]
+        if not ObjectId.is_valid(project_id or ""):
+            continue
+        doc = computed.setdefault(project_id, {"creator_id": group["creator_id"], **empty_financials()})
+        bucket = doc[BUCKET_BY_STATUS[group["_id"]["status"]]]
+        bucket["amount"] += group["amount"]
+        bucket["count"] += group["count"]
+    # Slots whose project was deleted keep no read model
+    existing = {str(doc["_id"]) async for doc in db["projects"].find(
+        {"_id": {"$in": [ObjectId(project_id) for project_id in computed]}}, {"_id": 1})}
+    return {project_id: doc for project_id, doc in computed.items() if project_id in existing}
+
+def _counters(doc: Optional[dict]) -> dict:
+    doc = doc or {}
+    return {
+        bucket: {"amount": round((doc.get(bucket) or {}).get("amount", 0), 2), "count": (doc.get(bucket) or {}).get("count", 0)}
+        for bucket in FINANCIAL_BUCKETS
+    }
+
+async def verify_project_financials(db: AsyncIOMotorDatabase) -> List[str]:
+    """Compare stored counters against a recomputation; returns one line per mismatched project."""
+    computed = await compute_project_financials(db)
+    mismatches = []
+    seen = set()
+    async for doc in db[FINANCIALS_COLLECTION].find():
+        project_id = str(doc["_id"])
+        seen.add(project_id)
+        expected = _counters(computed.get(project_id))
+        if _counters(doc) != expected:
+            mismatches.append(f"{project_id}: stored {_counters(doc)}, expected {expected}")
+    for project_id in set(computed) - seen:
+        if _counters(computed[project_id]) != _counters(None):
+            mismatches.append(f"{project_id}: missing, expected {_counters(computed[project_id])}")
+    return mismatches
+
+async def rebuild_project_financials(db: AsyncIOMotorDatabase) -> int:
+    """Replace the read model with a recomputation; returns the number of project documents written.
+
+    Bid transitions that land while this runs may be counted twice or not at all, so run it
+    when writes are quiet (or run --verify afterwards).
+    """
+    computed = await compute_project_financials(db)
+    now = datetime.utcnow().isoformat()
+    requests = [
+        ReplaceOne({"_id": ObjectId(project_id)}, {**doc, "last_modified_date": now}, upsert=True)
+        for project_id, doc in computed.items()
+    ]
+    if requests:
+        await db[FINANCIALS_COLLECTION].bulk_write(requests, ordered=False)
+    await db[FINANCIALS_COLLECTION].delete_many({"_id": {"$nin": [ObjectId(project_id) for project_id in computed]}})
+    return len(requests)
+
+async def ensure_project_financials(db: AsyncIOMotorDatabase) -> Optional[int]:
+    """Build the read model if it has never been built; returns the projects written, or None if it existed.
+
+    Called on API startup. Incremental updates keep it current from then on; drift after a
+    crash is still repaired with rebuild_financials.py.
+    """
+    if await db[FINANCIALS_COLLECTION].find_one({}, {"_id": 1}) is not None:
+        return None
+    return await rebuild_project_financials(db)
@@ -0,0 +1,51 @@
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from typing import Dict, List
+import logging
+import os
+
+from .uploads import StoredUpload, atomic_write, variant_path
+from .repository import get_blob, set_blob_variants
+from .workers import run_in_worker
+
+logger = logging.getLogger(__name__)
+
+# Longest edge in pixels for each rendition; names match the ImageVariants model
+IMAGE_VARIANTS: Dict[str, int] = {"thumbnail": 256, "web": 1024}
+IMAGE_VARIANT_QUALITY = 80
+# Vector images scale on their own and are served as-is
+RASTER_EXTENSIONS = (".png", ".jpg", ".jpeg", ".gif", ".webp")
+
+def render_variants(path: str) -> List[str]:
+    """Write every missing variant of the image at path; runs in a worker process."""
+    from PIL import Image, ImageOps
+
+    with Image.open(path) as source:
+        # Lets JPEG decode at a reduced scale instead of full resolution
+        source.draft("RGB", (max(IMAGE_VARIANTS.values()),) * 2)
+        image = ImageOps.exif_transpose(source)
+        if image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGBA" if "transparency" in image.info or image.mode in ("LA", "PA") else "RGB")
+        for name, size in IMAGE_VARIANTS.items():
+            target = variant_path(path, name)
+            if os.path.exists(target):
+                continue
+            rendition = image.copy()
+            rendition.thumbnail((size, size), Image.LANCZOS)
+            with atomic_write(target) as handle:
+                rendition.save(handle, "WEBP", quality=IMAGE_VARIANT_QUALITY)
+    return list(IMAGE_VARIANTS)
+
+async def build_image_variants(db: AsyncIOMotorDatabase, stored: StoredUpload):
+    """Background task: render an uploaded image's variants and attach them to the blob and its SKUs."""
+    if os.path.splitext(stored.path)[1] not in RASTER_EXTENSIONS:
+        return
+    blob = await get_blob(db, stored.url)
+    if blob and blob.get("variants"):
+        return
+    try:
+        variants = await run_in_worker(render_variants, stored.path)
+    except Exception as e:
+        # SKUs fall back to the original image
+        logger.warning("Could not render variants for %s: %s", stored.path, e)
+        return
+    await set_blob_variants(db, stored.sha256, variants)
@@ -0,0 +1,215 @@
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from bson import ObjectId
+from pymongo import IndexModel, ASCENDING
+from pymongo.errors import OperationFailure
+from typing import Dict, List, Tuple
+import logging
+
+from .financials import FINANCIALS_COLLECTION
+from .models import SlotSort
+from .repository import COMMITTED_BID_STATUSES, SLOT_SORTS, bid_status_condition, _bids_by_creator_pipeline
+
+logger = logging.getLogger(__name__)
+
+# Indexes each repository query relies on, per collection. List queries are keyset-paginated
+# on _id, so their filter fields are paired with _id to serve the filter and the sort together.
+# ensure_indexes() creates anything missing; indexes not listed here are left alone.
+INDEXES: Dict[str, List[IndexModel]] = {
+    "users": [
+        IndexModel([("email", ASCENDING)], unique=True),
+    ],
+    "projects": [
+        IndexModel([("creator_id", ASCENDING), ("_id", ASCENDING)]),
+    ],
+    "slots": [
+        IndexModel([("project_id", ASCENDING), ("_id", ASCENDING)]),
+        IndexModel([("creator_id", ASCENDING), ("_id", ASCENDING)]),
+        # Discovery: equality on visibility/status (and modality), then the sort key, then the price range
+        IndexModel([("visibility", ASCENDING), ("status", ASCENDING), ("_id", ASCENDING)]),
+        IndexModel([("visibility", ASCENDING), ("status", ASCENDING), ("pricing_floor", ASCENDING), ("_id", ASCENDING)]),
+        IndexModel([("visibility", ASCENDING), ("status", ASCENDING), ("modality", ASCENDING), ("pricing_floor", ASCENDING), ("_id", ASCENDING)]),
+        # Price sorts without visibility/status filters (walked backwards for price_desc)
+        IndexModel([("pricing_floor", ASCENDING), ("_id", ASCENDING)]),
+        # Audience and schedule filters, copied onto slots from their project
+        IndexModel([("demographics.gender", ASCENDING), ("_id", ASCENDING)]),
+        IndexModel([("production_window", ASCENDING), ("_id", ASCENDING)]),
+    ],
+    "skus": [
+        IndexModel([("merchant_id", ASCENDING), ("_id", ASCENDING)]),
+    ],
+    "bids": [
+        IndexModel([("slot_id", ASCENDING), ("_id", ASCENDING)]),
+        IndexModel([("counterparty_id", ASCENDING), ("_id", ASCENDING)]),
+        IndexModel([("status", ASCENDING), ("_id", ASCENDING)]),
+    ],
+    "comments": [
+        IndexModel([("bid_id", ASCENDING), ("_id", ASCENDING)]),
+    ],
+}
+
+# Representative (collection, filter, sort) for every indexed repository query, used by
+# check_query_plans(). List queries are sorted as _find_page sorts them, so an index that serves
+# the filter but not the sort is reported too. Keep in sync with app/repository.py when adding a query.
+_BY_ID = [("_id", ASCENDING)]
+QUERY_SHAPES = [
+    ("users", {"email": "probe@example.com"}, None),
+    ("projects", {"creator_id": "probe"}, _BY_ID),
+    ("slots", {"project_id": "probe"}, _BY_ID),
+    ("slots", {"creator_id": "probe"}, _BY_ID),
+    ("slots", {"visibility": "Public", "status": "Available"}, SLOT_SORTS[None]),
+    ("slots", {"visibility": "Public", "status": "Available"}, SLOT_SORTS[SlotSort.RECENT]),
+    ("slots", {"visibility": "Public", "status": "Available", "pricing_floor": {"$gte": 0, "$lte": 1000}}, SLOT_SORTS[SlotSort.PRICE_ASC]),
+    ("slots", {"visibility": "Public", "status": "Available"}, SLOT_SORTS[SlotSort.PRICE_DESC]),
+    ("slots", {"visibility": "Public", "status": "Available", "modality": "Private Auction"}, SLOT_SORTS[SlotSort.PRICE_ASC]),
+    ("slots", {}, SLOT_SORTS[SlotSort.PRICE_ASC]),
+    ("slots", {}, SLOT_SORTS[SlotSort.PRICE_DESC]),
+    ("slots", {"pricing_floor": {"$gte": 0, "$lte": 1000}}, SLOT_SORTS[SlotSort.PRICE_ASC]),
+    ("slots", {"demographics.gender": "All", "demographics.ageStart": {"$lte": 35}, "demographics.ageEnd": {"$gte": 18}}, SLOT_SORTS[None]),
+    ("slots", {"production_window": "Q3"}, SLOT_SORTS[None]),
+    ("skus", {"merchant_id": "probe"}, _BY_ID),
+    ("bids", {"slot_id": "probe"}, _BY_ID),
+    ("bids", {"slot_id": "probe", "status": {"$in": COMMITTED_BID_STATUSES}}, None),
+    ("bids", {"counterparty_id": "probe"}, _BY_ID),
+    ("bids", {"counterparty_id": "probe", "status": bid_status_condition(["Pending"])}, _BY_ID),
+    ("bids", {"status": {"$in": COMMITTED_BID_STATUSES}}, _BY_ID),
+    ("comments", {"bid_id": "probe"}, _BY_ID),
+    ("comments", {"bid_id": {"$in": ["probe"]}}, [("bid_id", ASCENDING), ("_id", ASCENDING)]),
+]
+
+# Aggregations with a selective first stage, same purpose. Besides the plan of the first stage,
+# every $lookup must join on _id or on the leading field of an index declared in INDEXES.
+# The marketplace overview is left out: it is one deliberate pass over all bids (and cached).
+AGGREGATION_SHAPES = [
+    # Creator inbox
+    ("slots", _bids_by_creator_pipeline("probe", "Pending", limit=50)),
+    # get_bid_with_slot
+    ("bids", [
+        {"$match": {"_id": ObjectId()}},
+        {"$addFields": {"slot_key": {"$convert": {"input": "$slot_id", "to": "objectId", "onError": None, "onNull": None}}}},
+        {"$lookup": {"from": "slots", "localField": "slot_key", "foreignField": "_id", "as": "slot"}},
+    ]),
+    # Financing dashboard
+    ("projects", [
+        {"$match": {"creator_id": "probe"}},
+        {"$lookup": {"from": FINANCIALS_COLLECTION, "localField": "_id", "foreignField": "_id", "as": "financials"}},
+    ]),
+]
+
+def _index_options(spec: dict) -> dict:
+    return {key: value for key, value in spec.items() if key not in ("key", "name", "v", "ns")}
+
+# Duplicate values reported when a unique index cannot be built
+DUPLICATE_SAMPLE_SIZE = 20
+_DUPLICATE_KEY = 11000
+
+async def _duplicate_values(db: AsyncIOMotorDatabase, collection: str, model: IndexModel) -> List[dict]:
+    fields = list(model.document["key"])
+    pipeline = [
+        {"$group": {"_id": {field.replace(".", "_"): f"${field}" for field in fields}, "count": {"$sum": 1}}},
+        {"$match": {"count": {"$gt": 1}}},
+        {"$limit": DUPLICATE_SAMPLE_SIZE},
+    ]
+    return [doc["_id"] async for doc in db[collection].aggregate(pipeline)]
+
+async def ensure_indexes(db: AsyncIOMotorDatabase) -> Tuple[List[str], List[str]]:
+    """Create declared indexes that are missing, rebuilding any whose options drifted.
+
+    Each index is created on its own, so one that cannot be built (a unique index over existing
+    duplicates) does not keep the others from being created. Returns the names of indexes that
+    were created or rebuilt, and one line per index that failed.
+    """
+    changed, failures = [], []
+    for collection, models in INDEXES.items():
+        existing = await db[collection].index_information()
+        for model in models:
+            spec = model.document
+            current = existing.get(spec["name"])
+            if current is not None and _index_options(current) == _index_options(spec):
+                continue
+            try:
+                if current is not None:
+                    logger.info("Rebuilding index %s.%s with new options", collection, spec["name"])
+                    await db[collection].drop_index(spec["name"])
+                changed.extend(await db[collection].create_indexes([model]))
+            except OperationFailure as e:
+                if e.code == _DUPLICATE_KEY:
+                    duplicates = ", ".join(str(duplicate) for duplicate in await _duplicate_values(db, collection, model))
+                    failure = f"{collection}.{spec['name']}: duplicate values must be cleaned up first: {duplicates}"
+                else:
+                    failure = f"{collection}.{spec['name']}: {e}"
+                logger.error("Index not created: %s", failure)
+                failures.append(failure)
+    return changed, failures
+
+def _find_stages(plan) -> List[str]:
+    stages = []
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            stages.append(plan["stage"])
+        for value in plan.values():
+            stages.extend(_find_stages(value))
+    elif isinstance(plan, list):
+        for item in plan:
+            stages.extend(_find_stages(item))
+    return stages
+
+def _winning_plan_stages(explanation) -> List[str]:
+    # Aggregations nest the query planner under their $cursor stage, so look for it anywhere
+    stages = []
+    if isinstance(explanation, dict):
+        for key, value in explanation.items():
+            stages.extend(_find_stages(value) if key == "winningPlan" else _winning_plan_stages(value))
+    elif isinstance(explanation, list):
+        for item in explanation:
+            stages.extend(_winning_plan_stages(item))
+    return stages
+
+def _plan_problems(stages: List[str]) -> List[str]:
+    problems = []
+    if "COLLSCAN" in stages:
+        problems.append("COLLSCAN")
+    if "SORT" in stages:
+        problems.append("in-memory SORT")
+    return problems
+
+def _lookups(pipeline: list) -> List[dict]:
+    lookups = []
+    for stage in pipeline:
+        if "$lookup" in stage:
+            lookups.append(stage["$lookup"])
+            lookups.extend(_lookups(stage["$lookup"].get("pipeline", [])))
+        elif "$facet" in stage:
+            for branch in stage["$facet"].values():
+                lookups.extend(_lookups(branch))
+    return lookups
+
+def _unindexed_lookups(pipeline: list) -> List[str]:
+    unindexed = []
+    for lookup in _lookups(pipeline):
+        field = lookup.get("foreignField")
+        if field is None or field == "_id":
+            continue
+        leading = {next(iter(model.document["key"])) for model in INDEXES.get(lookup["from"], [])}
+        if field not in leading:
+            unindexed.append(f"$lookup {lookup['from']}.{field}")
+    return unindexed
+
+async def check_query_plans(db: AsyncIOMotorDatabase) -> List[str]:
+    """Explain every query in QUERY_SHAPES and AGGREGATION_SHAPES; returns the ones that scan
+    a collection, sort in memory, or join on a field without an index."""
+    failures = []
+    for collection, query, sort in QUERY_SHAPES:
+        cursor = db[collection].find(query)
+        if sort:
+            cursor = cursor.sort(sort)
+        problems = _plan_problems(_winning_plan_stages(await cursor.explain()))
+        if problems:
+            failures.append(f"{collection} {query} sort={sort}: {', '.join(problems)}")
+    for collection, pipeline in AGGREGATION_SHAPES:
+        explanation = await db.command("aggregate", collection, pipeline=pipeline, explain=True)
+        # A $sort after a $lookup/$unwind always runs in memory; only the first stage's plan is checked
+        problems = [problem for problem in _plan_problems(_winning_plan_stages(explanation)) if problem == "COLLSCAN"]
+        problems += _unindexed_lookups(pipeline)
+        if problems:
+            failures.append(f"{collection} aggregate {pipeline[0]}: {', '.join(problems)}")
+    return failures
@@ -1,4 +1,4 @@
-from pydantic import BaseModel, EmailStr, Field
+from pydantic import BaseModel, EmailStr, Field, create_model
 from typing import Optional, List
 from enum import Enum
 
@@ -57,10 +57,18 @@ class ProjectBase(BaseModel):
 class ProjectCreate(ProjectBase):
     pass
 
+class ScriptIndex(BaseModel):
+    page_count: int
+    # Bytes of each single-page PDF served by GET /projects/{id}/script/pages/{n}
+    page_sizes: List[int] = []
+    indexed_date: Optional[str] = None
+
 class Project(ProjectBase):
     id: Optional[str] = Field(None, alias="_id")
     creator_id: str
     doc_link: Optional[str] = None
+    # Filled in by a background task shortly after the script is uploaded
+    script_index: Optional[ScriptIndex] = None
     created_date: Optional[str] = None
     last_modified_date: Optional[str] = None
 
@@ -98,6 +106,24 @@ class Slot(SlotBase):
     created_date: Optional[str] = None
     last_modified_date: Optional[str] = None
 
+class SlotSort(str, Enum):
+    RECENT = "recent"
+    PRICE_ASC = "price_asc"
+    PRICE_DESC = "price_desc"
+
+class SlotSearch(BaseModel):
+    project_id: Optional[str] = None
+    modality: Optional[SlotModality] = None
+    status: Optional[SlotStatus] = None
+    visibility: Optional[SlotVisibility] = None
+    min_price: Optional[float] = None
+    max_price: Optional[float] = None
+    # Project audience filters; a project matches if its age range overlaps [age_min, age_max]
+    age_min: Optional[int] = None
+    age_max: Optional[int] = None
+    gender: Optional[str] = None
+    production_window: Optional[str] = None
+
 # SKU Models
 
 class SKUBase(BaseModel):
@@ -110,12 +136,28 @@ class SKUBase(BaseModel):
 class SKUCreate(SKUBase):
     pass
 
+class ImageVariants(BaseModel):
+    # Downscaled WebP renditions of imageUrl, filled in shortly after upload
+    thumbnail: Optional[str] = None
+    web: Optional[str] = None
+
 class SKU(SKUBase):
     id: Optional[str] = Field(None, alias="_id")
     merchant_id: str
+    imageVariants: Optional[ImageVariants] = None
     created_date: Optional[str] = None
     last_modified_date: Optional[str] = None
 
+class SKUImportError(BaseModel):
+    row: int
+    errors: List[str]
+
+class SKUImportResult(BaseModel):
+    count: int
+    error_count: int = 0
+    # Capped so the response stays small for badly broken files; error_count has the full total
+    errors: List[SKUImportError] = []
+
 # Bid/Reservation Models
 
 class BidObjective(str, Enum):
@@ -145,8 +187,13 @@ class BidBase(BaseModel):
 class BidCreate(BidBase):
     pass
 
+class CommentCreate(BaseModel):
+    text: str
+
+# Comments live in their own collection, ordered by _id, rather than embedded in the bid
 class Comment(BaseModel):
-    id: str
+    id: Optional[str] = Field(None, alias="_id")
+    bid_id: Optional[str] = None
     author_id: str
     text: str
     timestamp: str
@@ -154,9 +201,28 @@ class Comment(BaseModel):
 class Bid(BidBase):
     id: Optional[str] = Field(None, alias="_id")
     counterparty_id: str
+    # Always derived from amount_terms on write (see parse_amount_terms); clients cannot set them
+    amount: Optional[float] = None
+    currency: Optional[str] = None
+    rev_share_percent: Optional[float] = None
     status: BidStatus = BidStatus.PENDING
     created_date: Optional[str] = None
     last_modified_date: Optional[str] = None
-    comments: List[Comment] = []
     creator_final_approval: bool = False
-    buyer_final_approval: bool = False
\ No newline at end of file
+    buyer_final_approval: bool = False
+
+# Partial models for sparse fieldsets (?fields=): every field optional, aliases preserved,
+# so list endpoints can return projected documents with response_model_exclude_unset=True.
+
+def partial_model(model: type) -> type:
+    fields = {
+        name: (Optional[field.annotation], Field(None, alias=field.alias))
+        for name, field in model.model_fields.items()
+    }
+    return create_model(f"{model.__name__}Partial", __base__=BaseModel, **fields)
+
+UserPartial = partial_model(User)
+ProjectPartial = partial_model(Project)
+SlotPartial = partial_model(Slot)
+SKUPartial = partial_model(SKU)
+BidPartial = partial_model(Bid)
@@ -0,0 +1,68 @@
+from fastapi import HTTPException, Query, Response
+from pydantic import BaseModel
+from bson import ObjectId
+from typing import Optional, List
+import base64
+import binascii
+import json
+import os
+
+MAX_PAGE_SIZE = 500
+# Page size when the client sends no limit; lists are always paged, with X-Next-Cursor for the rest
+DEFAULT_PAGE_SIZE = min(int(os.getenv("DEFAULT_PAGE_SIZE", str(MAX_PAGE_SIZE))), MAX_PAGE_SIZE)
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+class PageParams(BaseModel):
+    limit: int = DEFAULT_PAGE_SIZE
+    # Decoded continuation token, e.g. {"id": "<last _id>"}
+    after: Optional[dict] = None
+    # False when limit is the default rather than the client's choice
+    limit_requested: bool = False
+
+    @property
+    def stream_limit(self) -> Optional[int]:
+        """Limit for NDJSON streams: they carry no cursor, so they return every row unless asked not to."""
+        return self.limit if self.limit_requested else None
+
+def encode_cursor(values: dict) -> str:
+    raw = json.dumps(values, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(token: str) -> dict:
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (binascii.Error, ValueError, UnicodeDecodeError):
+        raise ValueError("Malformed cursor")
+    if not isinstance(values, dict) or not ObjectId.is_valid(values.get("id")):
+        raise ValueError("Malformed cursor")
+    return values
+
+def page_params(
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE, description=f"Page size; defaults to {DEFAULT_PAGE_SIZE}"),
+    after: Optional[str] = Query(None, description=f"Continuation token from the {NEXT_CURSOR_HEADER} response header")
+) -> PageParams:
+    size = {"limit": limit, "limit_requested": True} if limit is not None else {}
+    if after is None:
+        return PageParams(**size)
+    try:
+        return PageParams(**size, after=decode_cursor(after))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid pagination cursor")
+
+def set_next_cursor(response: Response, items: List, page: PageParams, sort_field: Optional[str] = None, sort_name: Optional[str] = None):
+    # A full page means there may be more; the client follows the header until it disappears.
+    # Sorted listings also carry the last sort key and the sort name so a cursor cannot be replayed under another order.
+    if len(items) == page.limit:
+        values = {"id": items[-1].id}
+        if sort_field:
+            values["key"] = getattr(items[-1], sort_field)
+        if sort_name:
+            values["sort"] = sort_name
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(values)
+
+def check_cursor_sort(page: PageParams, sort_name: Optional[str], sort_field: Optional[str] = None):
+    if not page.after:
+        return
+    if page.after.get("sort") != sort_name or (sort_field and "key" not in page.after):
+        raise HTTPException(status_code=400, detail="Pagination cursor does not match the requested sort")
@@ -0,0 +1,78 @@
+from collections import OrderedDict
+from typing import Optional
+import os
+import time
+
+from .models import User
+
+PRINCIPAL_CACHE_SIZE = int(os.getenv("PRINCIPAL_CACHE_SIZE", "10000"))
+PRINCIPAL_CACHE_TTL_SECONDS = float(os.getenv("PRINCIPAL_CACHE_TTL_SECONDS", "60"))
+
+class PrincipalCache:
+    """Bounded LRU of authenticated users keyed by token subject (email), with a TTL.
+
+    Entries hold the public User (never the password hash). The TTL bounds how long a change
+    made outside this process (e.g. by the maintenance scripts) can go unnoticed.
+    """
+
+    def __init__(self, max_size: int, ttl_seconds: float):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._emails_by_id = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, email: str) -> Optional[User]:
+        entry = self._entries.get(email)
+        if entry is None:
+            self.misses += 1
+            return None
+        user, expires_at = entry
+        if expires_at <= time.monotonic():
+            self._remove(email)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(email)
+        self.hits += 1
+        return user
+
+    def set(self, email: str, user: User):
+        if self.max_size <= 0:
+            return
+        self._entries[email] = (user, time.monotonic() + self.ttl_seconds)
+        self._entries.move_to_end(email)
+        if user.id:
+            self._emails_by_id[user.id] = email
+        while len(self._entries) > self.max_size:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def invalidate(self, email: str):
+        self._remove(email)
+
+    def invalidate_user_id(self, user_id: str):
+        email = self._emails_by_id.get(user_id)
+        if email is not None:
+            self._remove(email)
+
+    def clear(self):
+        self._entries.clear()
+        self._emails_by_id.clear()
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+    def _remove(self, email: str):
+        entry = self._entries.pop(email, None)
+        if entry is not None and entry[0].id:
+            self._emails_by_id.pop(entry[0].id, None)
+
+principal_cache = PrincipalCache(PRINCIPAL_CACHE_SIZE, PRINCIPAL_CACHE_TTL_SECONDS)
@@ -1,9 +1,22 @@
 from motor.motor_asyncio import AsyncIOMotorDatabase
-from .models import UserCreate, UserInDB, User, Project, ProjectCreate, Slot, SlotCreate, SKU, SKUCreate, Bid, BidCreate
+from .models import UserCreate, UserInDB, User, Project, ProjectCreate, ScriptIndex, Slot, SlotCreate, SKU, SKUCreate, Bid, BidCreate, BidStatus, Comment, PricingModel, SlotSearch, SlotSort
+from .models import UserPartial, ProjectPartial, SlotPartial, SKUPartial, BidPartial
+from .principal_cache import principal_cache
+from .fields import is_sparse
+from .response_cache import slot_cache
+from .uploads import StoredUpload, blob_id_from_url, variant_url
+from .events import bid_events, bid_created, bid_updated, bid_deleted, comment_created
+from .financials import FINANCIALS_COLLECTION, FINANCIAL_BUCKETS, record_bid_change, remove_slot_financials, empty_financials, bid_slots
 from passlib.context import CryptContext
 from bson import ObjectId
-from typing import List, Optional
-from datetime import datetime
+from pymongo import ASCENDING, DESCENDING, UpdateOne, ReturnDocument
+from pymongo.errors import BulkWriteError
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+from datetime import datetime, timedelta
+import asyncio
+import os
+import re
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
@@ -13,6 +26,93 @@ def verify_password(plain_password, hashed_password):
 def get_password_hash(password):
     return pwd_context.hash(password)
 
+# bcrypt is deliberately slow and releases the GIL, so it runs on a small dedicated thread pool
+# instead of the event loop. Beyond PASSWORD_HASH_MAX_PENDING queued calls we refuse fast
+# rather than let a login storm build an unbounded backlog.
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "4"))
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", "64"))
+
+_password_executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="password-hash")
+_pending_password_tasks = 0
+
+class PasswordHashingBusy(Exception):
+    pass
+
+def _password_task_done(future: asyncio.Future):
+    global _pending_password_tasks
+    _pending_password_tasks -= 1
+    if not future.cancelled():
+        # Marks a failure as retrieved when the caller already went away
+        future.exception()
+
+async def _run_password_task(fn, *args):
+    global _pending_password_tasks
+    if _pending_password_tasks >= PASSWORD_HASH_MAX_PENDING:
+        raise PasswordHashingBusy()
+    _pending_password_tasks += 1
+    future = asyncio.get_running_loop().run_in_executor(_password_executor, fn, *args)
+    # The slot is released when the hash finishes, not when the caller stops waiting: a client
+    # that disconnects mid-login cancels this coroutine, but its bcrypt job still occupies the pool
+    future.add_done_callback(_password_task_done)
+    return await asyncio.shield(future)
+
+async def verify_password_async(plain_password, hashed_password) -> bool:
+    return await _run_password_task(verify_password, plain_password, hashed_password)
+
+async def get_password_hash_async(password) -> str:
+    return await _run_password_task(get_password_hash, password)
+
+def shutdown_password_executor():
+    _password_executor.shutdown(wait=False, cancel_futures=True)
+
+def _keyset_condition(sort: list, after: dict) -> dict:
+    # Resume strictly after the last row of the previous page under the given (key, _id) ordering
+    key_field, direction = sort[0]
+    op = "$gt" if direction == ASCENDING else "$lt"
+    last_id = ObjectId(after["id"])
+    if key_field == "_id":
+        return {"_id": {op: last_id}}
+    return {"$or": [
+        {key_field: {op: after["key"]}},
+        {key_field: after["key"], "_id": {op: last_id}},
+    ]}
+
+def _find_page(db: AsyncIOMotorDatabase, collection: str, query: dict, limit: Optional[int] = None, after: Optional[dict] = None, projection: Optional[dict] = None, sort: list = [("_id", ASCENDING)]):
+    # Keyset pagination: stable ordering, and skipping ahead costs an index seek rather than a scan
+    if after:
+        condition = _keyset_condition(sort, after)
+        query = {"$and": [query, condition]} if query else condition
+    cursor = db[collection].find(query, projection).sort(sort)
+    if limit:
+        cursor = cursor.limit(limit)
+    return cursor
+
+async def _update_one(db: AsyncIOMotorDatabase, collection: str, doc_id: str, update, model: type, query: Optional[dict] = None, projection: Optional[dict] = None):
+    """Apply `update` to one document and return it as stored afterwards, in a single round trip.
+
+    `query` adds preconditions (ownership, status) to the _id match, so routers can authorize
+    and write in one round trip and read the document only to explain a miss (404 vs 403).
+    None when nothing matched; a write that leaves the document unchanged still returns it.
+    """
+    if not ObjectId.is_valid(doc_id):
+        return None
+    doc = await db[collection].find_one_and_update(
+        {"_id": ObjectId(doc_id), **(query or {})},
+        update,
+        projection=projection,
+        return_document=ReturnDocument.AFTER,
+    )
+    if doc is None:
+        return None
+    doc["_id"] = str(doc["_id"])
+    return model(**doc)
+
+async def iter_documents(db: AsyncIOMotorDatabase, collection: str, query: dict, limit: Optional[int] = None, after: Optional[dict] = None, projection: Optional[dict] = None):
+    # Yields raw documents straight off the cursor, for streaming responses that skip model validation
+    async for doc in _find_page(db, collection, query, limit, after, projection):
+        doc["_id"] = str(doc["_id"])
+        yield doc
+
 async def get_user_by_email(db: AsyncIOMotorDatabase, email: str):
     user_doc = await db["users"].find_one({"email": email})
     if user_doc:
@@ -21,12 +121,12 @@ async def get_user_by_email(db: AsyncIOMotorDatabase, email: str):
         return UserInDB(**user_doc)
     return None
 
-async def get_all_users(db: AsyncIOMotorDatabase) -> List[User]:
+async def get_all_users(db: AsyncIOMotorDatabase, limit: Optional[int] = None, after: Optional[dict] = None, projection: Optional[dict] = None) -> List[User]:
     users = []
-    cursor = db["users"].find({})
+    cursor = _find_page(db, "users", {}, limit, after, projection)
     async for doc in cursor:
         doc["_id"] = str(doc["_id"])
-        users.append(User(**doc))
+        users.append((UserPartial if is_sparse(projection) else User)(**doc))
     return users
 
 async def get_user_by_id(db: AsyncIOMotorDatabase, user_id: str) -> Optional[User]:
@@ -39,22 +139,16 @@ async def get_user_by_id(db: AsyncIOMotorDatabase, user_id: str) -> Optional[Use
         return None
     return None
 
-async def update_user(db: AsyncIOMotorDatabase, user_id: str, user_data: dict) -> bool:
-    try:
-        # Convert _id to ObjectId if it's not already
-        if "_id" in user_data:
-            del user_data["_id"]
-            
-        result = await db["users"].update_one(
-            {"_id": ObjectId(user_id)},
-            {"$set": user_data}
-        )
-        return result.modified_count > 0
-    except:
-        return False
+async def update_user(db: AsyncIOMotorDatabase, user_id: str, user_data: dict) -> Optional[User]:
+    # _id is immutable; never let it into the $set
+    user_data.pop("_id", None)
+    user = await _update_one(db, "users", user_id, {"$set": user_data}, User, projection={"hashed_password": 0})
+    # Authenticated requests read users through the principal cache; drop the stale copy
+    principal_cache.invalidate_user_id(user_id)
+    return user
 
 async def create_user(db: AsyncIOMotorDatabase, user: UserCreate):
-    hashed_password = get_password_hash(user.password)
+    hashed_password = await get_password_hash_async(user.password)
     # Create UserInDB instance to ensure correct structure
     user_in_db = UserInDB(
         **user.dict(exclude={"password"}),
@@ -65,11 +159,10 @@ async def create_user(db: AsyncIOMotorDatabase, user: UserCreate):
     
     result = await db["users"].insert_one(user_dict)
     
-    # Return User model (without hashed password)
-    return User(
-        **user.dict(exclude={"password"}),
-        _id=str(result.inserted_id)
-    )
+    # Return the stored document as a User model (without hashed password)
+    user_dict["_id"] = str(result.inserted_id)
+    user_dict.pop("hashed_password")
+    return User(**user_dict)
 
 async def create_project(db: AsyncIOMotorDatabase, project: ProjectCreate, creator_id: str, doc_link: Optional[str] = None):
     project_dict = project.dict()
@@ -83,22 +176,23 @@ async def create_project(db: AsyncIOMotorDatabase, project: ProjectCreate, creat
     result = await db["projects"].insert_one(project_dict)
     
     project_dict["_id"] = str(result.inserted_id)
+    await add_blob_refs(db, [(doc_link, f"project:{project_dict['_id']}")])
     return Project(**project_dict)
 
-async def get_projects_by_creator(db: AsyncIOMotorDatabase, creator_id: str) -> List[Project]:
+async def get_projects_by_creator(db: AsyncIOMotorDatabase, creator_id: str, limit: Optional[int] = None, after: Optional[dict] = None, projection: Optional[dict] = None) -> List[Project]:
     projects = []
-    cursor = db["projects"].find({"creator_id": creator_id})
+    cursor = _find_page(db, "projects", {"creator_id": creator_id}, limit, after, projection)
     async for doc in cursor:
         doc["_id"] = str(doc["_id"])
-        projects.append(Project(**doc))
+        projects.append((ProjectPartial if is_sparse(projection) else Project)(**doc))
     return projects
 
-async def get_all_projects(db: AsyncIOMotorDatabase) -> List[Project]:
+async def get_all_projects(db: AsyncIOMotorDatabase, limit: Optional[int] = None, after: Optional[dict] = None, projection: Optional[dict] = None) -> List[Project]:
     projects = []
-    cursor = db["projects"].find({})
+    cursor = _find_page(db, "projects", {}, limit, after, projection)
     async for doc in cursor:
         doc["_id"] = str(doc["_id"])
-        projects.append(Project(**doc))
+        projects.append((ProjectPartial if is_sparse(projection) else Project)(**doc))
     return projects
 
 async def get_project_by_id(db: AsyncIOMotorDatabase, project_id: str) -> Optional[Project]:
@@ -111,54 +205,147 @@ async def get_project_by_id(db: AsyncIOMotorDatabase, project_id: str) -> Option
         return None
     return None
 
-async def update_project(db: AsyncIOMotorDatabase, project_id: str, project_data: dict) -> bool:
-    try:
-        project_data["last_modified_date"] = datetime.utcnow().isoformat()
-        result = await db["projects"].update_one(
-            {"_id": ObjectId(project_id)},
-            {"$set": project_data}
-        )
-        return result.modified_count > 0
-    except:
-        return False
+# Slots carry a copy of their project's audience and schedule, so discovery filters on them
+# within the slots collection; update_project keeps the copies in step (backfill_slot_audience.py
+# fills in slots created before).
+SLOT_PROJECT_FIELDS = ("demographics", "production_window")
+
+def slot_project_fields(project: Project) -> dict:
+    return project.dict(include=set(SLOT_PROJECT_FIELDS))
+
+async def update_project(db: AsyncIOMotorDatabase, project_id: str, project_data: dict, query: Optional[dict] = None) -> Optional[Project]:
+    project_data["last_modified_date"] = datetime.utcnow().isoformat()
+    project = await _update_one(db, "projects", project_id, {"$set": project_data}, Project, query)
+    if project is not None and any(field in project_data for field in SLOT_PROJECT_FIELDS):
+        await db["slots"].update_many({"project_id": project_id}, {"$set": slot_project_fields(project)})
+    slot_cache.clear()
+    return project
+
+async def set_project_script_index(db: AsyncIOMotorDatabase, project_id: str, index: ScriptIndex) -> bool:
+    # Derived from the uploaded file, so last_modified_date is left alone
+    result = await db["projects"].update_one({"_id": ObjectId(project_id)}, {"$set": {"script_index": index.dict()}})
+    return result.matched_count > 0
 
 async def delete_project(db: AsyncIOMotorDatabase, project_id: str) -> bool:
     try:
-        result = await db["projects"].delete_one({"_id": ObjectId(project_id)})
-        # Also delete associated slots
+        doc = await db["projects"].find_one_and_delete({"_id": ObjectId(project_id)}, projection={"doc_link": 1})
+        # Also delete associated slots, and the project's financing counters with them
         await db["slots"].delete_many({"project_id": project_id})
-        return result.deleted_count > 0
+        await db[FINANCIALS_COLLECTION].delete_one({"_id": ObjectId(project_id)})
+        slot_cache.clear()
+        if doc:
+            await remove_blob_ref(db, doc.get("doc_link"), f"project:{project_id}")
+        return doc is not None
     except:
         return False
 
-async def create_slot(db: AsyncIOMotorDatabase, slot: SlotCreate, creator_id: str, project_id: str):
+async def create_slot(db: AsyncIOMotorDatabase, slot: SlotCreate, creator_id: str, project: Project):
     slot_dict = slot.dict()
     slot_dict["creator_id"] = creator_id
-    slot_dict["project_id"] = project_id
+    slot_dict["project_id"] = project.id
+    slot_dict.update(slot_project_fields(project))
     slot_dict["created_date"] = datetime.utcnow().isoformat()
     slot_dict["last_modified_date"] = datetime.utcnow().isoformat()
     
     result = await db["slots"].insert_one(slot_dict)
     
+    slot_cache.clear()
     slot_dict["_id"] = str(result.inserted_id)
     return Slot(**slot_dict)
 
-async def get_slots_by_project(db: AsyncIOMotorDatabase, project_id: str) -> List[Slot]:
+async def create_slots(db: AsyncIOMotorDatabase, slots: List[SlotCreate], creator_id: str, project: Project) -> List[Slot]:
+    # One insert_many for a whole script's worth of slots
+    if not slots:
+        return []
+    now = datetime.utcnow().isoformat()
+    slot_dicts = []
+    for slot in slots:
+        slot_dict = slot.dict()
+        slot_dict["creator_id"] = creator_id
+        slot_dict["project_id"] = project.id
+        slot_dict.update(slot_project_fields(project))
+        slot_dict["created_date"] = now
+        slot_dict["last_modified_date"] = now
+        slot_dicts.append(slot_dict)
+
+    result = await db["slots"].insert_many(slot_dicts)
+
+    slot_cache.clear()
+    created = []
+    for slot_dict, inserted_id in zip(slot_dicts, result.inserted_ids):
+        slot_dict["_id"] = str(inserted_id)
+        created.append(Slot(**slot_dict))
+    return created
+
+async def get_slots_by_project(db: AsyncIOMotorDatabase, project_id: str, limit: Optional[int] = None, after: Optional[dict] = None, projection: Optional[dict] = None) -> List[Slot]:
     slots = []
-    cursor = db["slots"].find({"project_id": project_id})
+    cursor = _find_page(db, "slots", {"project_id": project_id}, limit, after, projection)
     async for doc in cursor:
         doc["_id"] = str(doc["_id"])
-        slots.append(Slot(**doc))
+        slots.append((SlotPartial if is_sparse(projection) else Slot)(**doc))
     return slots
 
-async def get_all_slots(db: AsyncIOMotorDatabase, filters: dict = {}) -> List[Slot]:
+async def get_all_slots(db: AsyncIOMotorDatabase, filters: dict = {}, limit: Optional[int] = None, after: Optional[dict] = None, projection: Optional[dict] = None) -> List[Slot]:
     slots = []
-    cursor = db["slots"].find(filters)
+    cursor = _find_page(db, "slots", filters, limit, after, projection)
     async for doc in cursor:
         doc["_id"] = str(doc["_id"])
-        slots.append(Slot(**doc))
+        slots.append((SlotPartial if is_sparse(projection) else Slot)(**doc))
     return slots
 
+# Sort orders for slot discovery; each ends on _id so keyset pagination has a unique tie-breaker
+SLOT_SORTS = {
+    None: [("_id", ASCENDING)],
+    SlotSort.RECENT: [("_id", DESCENDING)],
+    SlotSort.PRICE_ASC: [("pricing_floor", ASCENDING), ("_id", ASCENDING)],
+    SlotSort.PRICE_DESC: [("pricing_floor", DESCENDING), ("_id", DESCENDING)],
+}
+
+def _slot_search_query(search: SlotSearch) -> dict:
+    query = {}
+    if search.project_id:
+        query["project_id"] = search.project_id
+    for field in ("modality", "status", "visibility"):
+        value = getattr(search, field)
+        if value is not None:
+            query[field] = value.value
+    price_range = {}
+    if search.min_price is not None:
+        price_range["$gte"] = search.min_price
+    if search.max_price is not None:
+        price_range["$lte"] = search.max_price
+    if price_range:
+        query["pricing_floor"] = price_range
+    # Audience and schedule, copied from the project onto each slot (see SLOT_PROJECT_FIELDS)
+    if search.gender:
+        query["demographics.gender"] = search.gender
+    if search.age_max is not None:
+        query["demographics.ageStart"] = {"$lte": search.age_max}
+    if search.age_min is not None:
+        query["demographics.ageEnd"] = {"$gte": search.age_min}
+    if search.production_window:
+        query["production_window"] = search.production_window
+    return query
+
+def _with_sort_key(projection: Optional[dict], sort: list) -> Optional[dict]:
+    # The continuation token needs the sort key, so keep it in inclusion projections
+    if projection and 1 in projection.values():
+        return {**projection, sort[0][0]: 1}
+    return projection
+
+async def search_slots(db: AsyncIOMotorDatabase, search: SlotSearch, sort: Optional[SlotSort] = None, limit: Optional[int] = None, after: Optional[dict] = None, projection: Optional[dict] = None) -> List[Slot]:
+    slots = []
+    async for doc in iter_search_slots(db, search, sort, limit, after, projection):
+        slots.append((SlotPartial if is_sparse(projection) else Slot)(**doc))
+    return slots
+
+async def iter_search_slots(db: AsyncIOMotorDatabase, search: SlotSearch, sort: Optional[SlotSort] = None, limit: Optional[int] = None, after: Optional[dict] = None, projection: Optional[dict] = None):
+    query = _slot_search_query(search)
+    sort_spec = SLOT_SORTS[sort]
+    async for doc in _find_page(db, "slots", query, limit, after, _with_sort_key(projection, sort_spec), sort_spec):
+        doc["_id"] = str(doc["_id"])
+        yield doc
+
 async def get_slot_by_id(db: AsyncIOMotorDatabase, slot_id: str) -> Optional[Slot]:
     try:
         doc = await db["slots"].find_one({"_id": ObjectId(slot_id)})
@@ -169,21 +356,19 @@ async def get_slot_by_id(db: AsyncIOMotorDatabase, slot_id: str) -> Optional[Slo
         return None
     return None
 
-async def update_slot(db: AsyncIOMotorDatabase, slot_id: str, slot_data: dict) -> bool:
-    try:
-        slot_data["last_modified_date"] = datetime.utcnow().isoformat()
-        result = await db["slots"].update_one(
-            {"_id": ObjectId(slot_id)},
-            {"$set": slot_data}
-        )
-        return result.modified_count > 0
-    except:
-        return False
+async def update_slot(db: AsyncIOMotorDatabase, slot_id: str, slot_data: dict, query: Optional[dict] = None) -> Optional[Slot]:
+    slot_data["last_modified_date"] = datetime.utcnow().isoformat()
+    slot = await _update_one(db, "slots", slot_id, {"$set": slot_data}, Slot, query)
+    slot_cache.clear()
+    return slot
 
 async def delete_slot(db: AsyncIOMotorDatabase, slot_id: str) -> bool:
     try:
-        result = await db["slots"].delete_one({"_id": ObjectId(slot_id)})
-        return result.deleted_count > 0
+        slot = await db["slots"].find_one_and_delete({"_id": ObjectId(slot_id)}, projection={"project_id": 1})
+        slot_cache.clear()
+        if slot:
+            await remove_slot_financials(db, slot)
+        return slot is not None
     except:
         return False
 
@@ -196,14 +381,44 @@ async def create_sku(db: AsyncIOMotorDatabase, sku: SKUCreate, merchant_id: str)
     result = await db["skus"].insert_one(sku_dict)
     
     sku_dict["_id"] = str(result.inserted_id)
+    await add_blob_refs(db, [(sku_dict.get("imageUrl"), f"sku:{sku_dict['_id']}")])
+    variants = await _sync_image_variants(db, [(result.inserted_id, sku_dict.get("imageUrl"))])
+    sku_dict["imageVariants"] = variants.get(result.inserted_id)
     return SKU(**sku_dict)
 
-async def get_skus_by_merchant(db: AsyncIOMotorDatabase, merchant_id: str) -> List[SKU]:
+async def insert_skus(db: AsyncIOMotorDatabase, skus: List[SKUCreate], merchant_id: str) -> Tuple[int, Dict[int, str]]:
+    """Insert a batch of SKUs in one unordered insert_many.
+
+    Returns the number inserted and a map of batch index -> error message for rows the server rejected.
+    """
+    if not skus:
+        return 0, {}
+    now = datetime.utcnow().isoformat()
+    docs = []
+    for sku in skus:
+        sku_dict = sku.dict()
+        sku_dict["merchant_id"] = merchant_id
+        sku_dict["created_date"] = now
+        sku_dict["last_modified_date"] = now
+        docs.append(sku_dict)
+    try:
+        result = await db["skus"].insert_many(docs, ordered=False)
+        inserted, failures = len(result.inserted_ids), {}
+    except BulkWriteError as e:
+        failures = {err["index"]: err.get("errmsg", "Write failed") for err in e.details.get("writeErrors", [])}
+        inserted = e.details.get("nInserted", 0)
+    # insert_many fills in each document's _id before sending it
+    stored = [doc for index, doc in enumerate(docs) if index not in failures]
+    await add_blob_refs(db, [(doc.get("imageUrl"), f"sku:{doc['_id']}") for doc in stored])
+    await _sync_image_variants(db, [(doc["_id"], doc.get("imageUrl")) for doc in stored])
+    return inserted, failures
+
+async def get_skus_by_merchant(db: AsyncIOMotorDatabase, merchant_id: str, limit: Optional[int] = None, after: Optional[dict] = None, projection: Optional[dict] = None) -> List[SKU]:
     skus = []
-    cursor = db["skus"].find({"merchant_id": merchant_id})
+    cursor = _find_page(db, "skus", {"merchant_id": merchant_id}, limit, after, projection)
     async for doc in cursor:
         doc["_id"] = str(doc["_id"])
-        skus.append(SKU(**doc))
+        skus.append((SKUPartial if is_sparse(projection) else SKU)(**doc))
     return skus
 
 async def get_sku_by_id(db: AsyncIOMotorDatabase, sku_id: str) -> Optional[SKU]:
@@ -216,52 +431,375 @@ async def get_sku_by_id(db: AsyncIOMotorDatabase, sku_id: str) -> Optional[SKU]:
         return None
     return None
 
-async def update_sku(db: AsyncIOMotorDatabase, sku_id: str, sku_data: dict) -> bool:
-    try:
-        sku_data["last_modified_date"] = datetime.utcnow().isoformat()
-        result = await db["skus"].update_one(
-            {"_id": ObjectId(sku_id)},
-            {"$set": sku_data}
-        )
-        return result.modified_count > 0
-    except:
-        return False
+async def update_sku(db: AsyncIOMotorDatabase, sku_id: str, sku_data: dict, query: Optional[dict] = None) -> Optional[SKU]:
+    if not ObjectId.is_valid(sku_id):
+        return None
+    sku_data["last_modified_date"] = datetime.utcnow().isoformat()
+    update = {"$set": sku_data}
+    if "imageUrl" in sku_data:
+        # Re-derived below from the new image's blob
+        update["$unset"] = {"imageVariants": ""}
+    # The previous imageUrl is needed to move the blob reference, so fetch the document as it
+    # was and apply the $set/$unset to it locally rather than reading it back
+    doc = await db["skus"].find_one_and_update({"_id": ObjectId(sku_id), **(query or {})}, update)
+    if doc is None:
+        return None
+    previous_url = doc.get("imageUrl")
+    doc.update(sku_data)
+    if "imageUrl" in sku_data:
+        doc.pop("imageVariants", None)
+        if previous_url != sku_data["imageUrl"]:
+            await add_blob_refs(db, [(sku_data["imageUrl"], f"sku:{sku_id}")])
+            await remove_blob_ref(db, previous_url, f"sku:{sku_id}")
+        variants = await _sync_image_variants(db, [(doc["_id"], sku_data["imageUrl"])])
+        doc["imageVariants"] = variants.get(doc["_id"])
+    doc["_id"] = str(doc["_id"])
+    return SKU(**doc)
+
+DEFAULT_CURRENCY = "USD"
+
+_NUMBER = r"\d[\d.,]*\d|\d"
+_SCALE = r"(?:\s*(?P<{0}>[kKmM])(?![a-zA-Z]))?"
+_CURRENCY = r"[$€£]|\b(?:USD|EUR|GBP|CAD|AUD)\b"
+# A number must stand on its own: "Q3" or "2x" are not amounts
+_STANDALONE = r"(?<![\w.,])(?P<number>{0})(?![\d])(?![.,]\d)".format(_NUMBER)
+# "$5,000", "€ 3.000", "USD 7.5k", "5000 EUR", "3.000€"
+_MONEY_PATTERN = re.compile(
+    rf"(?P<before>{_CURRENCY})\s*(?P<number>{_NUMBER}){_SCALE.format('scale')}"
+    rf"|(?<![\w.,])(?P<number_after>{_NUMBER}){_SCALE.format('scale_after')}\s*(?P<after>{_CURRENCY})"
+)
+_PERCENT_PATTERN = re.compile(_STANDALONE + r"\s*%")
+_BARE_NUMBER_PATTERN = re.compile(_STANDALONE + _SCALE.format("scale") + r"(?!\s*%)")
+_CURRENCY_SYMBOLS = {"$": "USD", "€": "EUR", "£": "GBP"}
+_MULTIPLIERS = {"k": 1_000, "m": 1_000_000}
+
+def _parse_number(text: str) -> float:
+    """Read "5,000", "3.000", "1.234,56" or "7.5".
+
+    With both separators the last one is the decimal point; a single separator followed by
+    exactly three digits (or repeated) groups thousands.
+    """
+    if "," in text and "." in text:
+        decimal = "," if text.rfind(",") > text.rfind(".") else "."
+    elif "," in text or "." in text:
+        separator = "," if "," in text else "."
+        groups = text.split(separator)
+        decimal = None if len(groups) > 2 or len(groups[-1]) == 3 else separator
+    else:
+        decimal = None
+    for separator in {",", "."} - {decimal}:
+        text = text.replace(separator, "")
+    return float(text.replace(decimal, ".") if decimal else text)
+
+def _currency_code(token: str) -> str:
+    return _CURRENCY_SYMBOLS.get(token, token.upper())
+
+def parse_amount_terms(amount_terms: str, pricing_model: str) -> dict:
+    """Split free-text terms like "$5000 + 10% GMV" into amount, currency and rev_share_percent.
+
+    The fixed amount is the first number written next to a currency symbol or code; only if
+    there is none does a standalone number count ("7.5k"), so "Q3 flight: $5000" reads 5000.
+    Raises ValueError if the terms lack the component the pricing model needs
+    (a fixed amount for Fixed/Hybrid, a percentage for Rev-Share).
+    """
+    pricing_model = PricingModel(pricing_model)
+    amount_terms = amount_terms or ""
+
+    percent = _PERCENT_PATTERN.search(amount_terms)
+    rev_share_percent = _parse_number(percent.group("number")) if percent else None
+
+    fixed_amount = None
+    currency = None
+    money = _MONEY_PATTERN.search(amount_terms)
+    if money:
+        number = money.group("number") or money.group("number_after")
+        scale = money.group("scale") or money.group("scale_after") or ""
+        fixed_amount = _parse_number(number) * _MULTIPLIERS.get(scale.lower(), 1)
+        currency = _currency_code(money.group("before") or money.group("after"))
+    else:
+        bare = _BARE_NUMBER_PATTERN.search(amount_terms)
+        if bare:
+            fixed_amount = _parse_number(bare.group("number")) * _MULTIPLIERS.get((bare.group("scale") or "").lower(), 1)
+
+    if pricing_model == PricingModel.REV_SHARE:
+        # Any other figure in rev-share terms describes the base ("15% of $200k GMV"), not money committed
+        fixed_amount = None
+    if pricing_model in (PricingModel.FIXED, PricingModel.HYBRID) and fixed_amount is None:
+        raise ValueError(f"Could not find a fixed amount in terms '{amount_terms}'")
+    if pricing_model == PricingModel.REV_SHARE and rev_share_percent is None:
+        raise ValueError(f"Could not find a revenue share percentage in terms '{amount_terms}'")
+
+    if currency is None:
+        mentioned = re.search(_CURRENCY, amount_terms)
+        currency = _currency_code(mentioned.group(0)) if mentioned else DEFAULT_CURRENCY
+
+    return {
+        # Committed money is the fixed component only; pure rev-share deals commit nothing up front
+        "amount": fixed_amount or 0.0,
+        "currency": currency,
+        "rev_share_percent": rev_share_percent,
+    }
+
+def _normalize_bid_amount(bid_data: dict):
+    # The amount fields are always derived from amount_terms, never taken from the client
+    if "amount_terms" not in bid_data:
+        return
+    bid_data.update(parse_amount_terms(bid_data["amount_terms"], bid_data["pricing_model"]))
 
 async def create_bid(db: AsyncIOMotorDatabase, bid: BidCreate, counterparty_id: str):
     bid_dict = bid.dict()
+    _normalize_bid_amount(bid_dict)
     bid_dict["counterparty_id"] = counterparty_id
+    # Stored explicitly: workflow transitions and status filters match on these fields
+    bid_dict["status"] = BidStatus.PENDING.value
+    bid_dict["creator_final_approval"] = False
+    bid_dict["buyer_final_approval"] = False
     bid_dict["created_date"] = datetime.utcnow().isoformat()
     bid_dict["last_modified_date"] = datetime.utcnow().isoformat()
     
     result = await db["bids"].insert_one(bid_dict)
     
+    slots = await bid_slots(db, bid_dict)
+    await record_bid_change(db, None, bid_dict, slots)
     bid_dict["_id"] = str(result.inserted_id)
+    await bid_events.publish_local(db, bid_created(bid_dict), bid_dict, slots.get(bid_dict.get("slot_id"), {}))
     return Bid(**bid_dict)
 
-async def get_all_bids(db: AsyncIOMotorDatabase) -> List[Bid]:
+async def create_comment(db: AsyncIOMotorDatabase, bid_id: str, author_id: str, text: str) -> Comment:
+    comment_dict = {
+        "bid_id": bid_id,
+        "author_id": author_id,
+        "text": text,
+        "timestamp": datetime.utcnow().isoformat(),
+    }
+    result = await db["comments"].insert_one(comment_dict)
+    comment_dict["_id"] = str(result.inserted_id)
+    await bid_events.publish_local(db, comment_created(comment_dict))
+    return Comment(**comment_dict)
+
+async def get_comments_by_bid(db: AsyncIOMotorDatabase, bid_id: str, limit: Optional[int] = None, after: Optional[str] = None) -> List[Comment]:
+    """A bid's comments in posting order, optionally only those after the comment with id `after`."""
+    comments = []
+    cursor = _find_page(db, "comments", {"bid_id": bid_id}, limit, {"id": after} if after else None)
+    async for doc in cursor:
+        doc["_id"] = str(doc["_id"])
+        comments.append(Comment(**doc))
+    return comments
+
+async def get_comments_by_bids(db: AsyncIOMotorDatabase, bid_ids: List[str]) -> Dict[str, List[Comment]]:
+    comments: Dict[str, List[Comment]] = {}
+    async for doc in db["comments"].find({"bid_id": {"$in": list(bid_ids)}}).sort([("bid_id", ASCENDING), ("_id", ASCENDING)]):
+        doc["_id"] = str(doc["_id"])
+        comments.setdefault(doc["bid_id"], []).append(Comment(**doc))
+    return comments
+
+def bid_status_condition(statuses) -> dict:
+    """Filter on bid status. Bids created before status was written on insert have no status
+    field and are Pending; backfill_bid_status.py fills it in, after which None matches nothing."""
+    values = [getattr(status, "value", status) for status in statuses]
+    if BidStatus.PENDING.value in values:
+        values.append(None)
+    return {"$in": values}
+
+def _bid_query(status: Optional[str] = None, **fields) -> dict:
+    query = dict(fields)
+    if status:
+        query["status"] = bid_status_condition([status])
+    return query
+
+async def get_all_bids(db: AsyncIOMotorDatabase, status: Optional[str] = None, limit: Optional[int] = None, after: Optional[dict] = None, projection: Optional[dict] = None) -> List[Bid]:
     bids = []
-    cursor = db["bids"].find({})
+    cursor = _find_page(db, "bids", _bid_query(status), limit, after, projection)
     async for doc in cursor:
         doc["_id"] = str(doc["_id"])
-        bids.append(Bid(**doc))
+        bids.append((BidPartial if is_sparse(projection) else Bid)(**doc))
     return bids
 
-async def get_bids_by_counterparty(db: AsyncIOMotorDatabase, counterparty_id: str) -> List[Bid]:
+async def get_bids_by_counterparty(db: AsyncIOMotorDatabase, counterparty_id: str, status: Optional[str] = None, limit: Optional[int] = None, after: Optional[dict] = None, projection: Optional[dict] = None) -> List[Bid]:
     bids = []
-    cursor = db["bids"].find({"counterparty_id": counterparty_id})
+    cursor = _find_page(db, "bids", _bid_query(status, counterparty_id=counterparty_id), limit, after, projection)
     async for doc in cursor:
         doc["_id"] = str(doc["_id"])
-        bids.append(Bid(**doc))
+        bids.append((BidPartial if is_sparse(projection) else Bid)(**doc))
     return bids
 
-async def get_bids_by_slot(db: AsyncIOMotorDatabase, slot_id: str) -> List[Bid]:
+async def get_bids_by_slot(db: AsyncIOMotorDatabase, slot_id: str, limit: Optional[int] = None, after: Optional[dict] = None, projection: Optional[dict] = None) -> List[Bid]:
     bids = []
-    cursor = db["bids"].find({"slot_id": slot_id})
+    cursor = _find_page(db, "bids", {"slot_id": slot_id}, limit, after, projection)
     async for doc in cursor:
         doc["_id"] = str(doc["_id"])
-        bids.append(Bid(**doc))
+        bids.append((BidPartial if is_sparse(projection) else Bid)(**doc))
+    return bids
+
+def iter_all_bids(db: AsyncIOMotorDatabase, status: Optional[str] = None, limit: Optional[int] = None, after: Optional[dict] = None, projection: Optional[dict] = None):
+    return iter_documents(db, "bids", _bid_query(status), limit, after, projection)
+
+def iter_bids_by_counterparty(db: AsyncIOMotorDatabase, counterparty_id: str, status: Optional[str] = None, limit: Optional[int] = None, after: Optional[dict] = None, projection: Optional[dict] = None):
+    return iter_documents(db, "bids", _bid_query(status, counterparty_id=counterparty_id), limit, after, projection)
+
+def _bids_by_creator_pipeline(creator_id: str, status: Optional[str] = None, limit: Optional[int] = None, after: Optional[dict] = None, projection: Optional[dict] = None) -> list:
+    # Single aggregation instead of project -> slot -> bid round trips.
+    # Slots carry creator_id, so we start there and join bids on the stringified slot _id.
+    pipeline = [
+        {"$match": {"creator_id": creator_id}},
+        {"$project": {"slot_id": {"$toString": "$_id"}}},
+        {"$lookup": {
+            "from": "bids",
+            "localField": "slot_id",
+            "foreignField": "slot_id",
+            "pipeline": [{"$match": _bid_query(status)}],
+            "as": "bids"
+        }},
+        {"$unwind": "$bids"},
+        {"$replaceRoot": {"newRoot": "$bids"}},
+    ]
+    if after:
+        pipeline.append({"$match": {"_id": {"$gt": ObjectId(after["id"])}}})
+    pipeline.append({"$sort": {"_id": 1}})
+    if limit:
+        pipeline.append({"$limit": limit})
+    if projection:
+        pipeline.append({"$project": projection})
+    return pipeline
+
+async def get_bids_by_creator(db: AsyncIOMotorDatabase, creator_id: str, status: Optional[str] = None, limit: Optional[int] = None, after: Optional[dict] = None, projection: Optional[dict] = None) -> List[Bid]:
+    bids = []
+    async for doc in iter_bids_by_creator(db, creator_id, status, limit, after, projection):
+        bids.append((BidPartial if is_sparse(projection) else Bid)(**doc))
     return bids
 
+async def iter_bids_by_creator(db: AsyncIOMotorDatabase, creator_id: str, status: Optional[str] = None, limit: Optional[int] = None, after: Optional[dict] = None, projection: Optional[dict] = None):
+    async for doc in db["slots"].aggregate(_bids_by_creator_pipeline(creator_id, status, limit, after, projection)):
+        doc["_id"] = str(doc["_id"])
+        yield doc
+
+# Bids in these states count towards a project's financing
+COMMITTED_BID_STATUSES = ["Committed", "Accepted", "AwaitingFinalApproval"]
+
+async def get_creator_financing_summary(db: AsyncIOMotorDatabase, creator_id: str) -> dict:
+    """The financing dashboard, read from the project_financials counters (see app/financials.py).
+
+    One aggregate: the creator's projects via the creator_id index, each joined to its counters
+    by _id. committed_amount keeps its meaning of everything in COMMITTED_BID_STATUSES.
+    """
+    pipeline = [
+        {"$match": {"creator_id": creator_id}},
+        {"$lookup": {
+            "from": FINANCIALS_COLLECTION,
+            "localField": "_id",
+            "foreignField": "_id",
+            "as": "financials"
+        }},
+    ]
+    projects = []
+    total_budget = 0
+    totals = empty_financials()
+    async for doc in db["projects"].aggregate(pipeline):
+        doc["_id"] = str(doc["_id"])
+        # Projects without any counted bid have no counters document yet
+        stored = (doc.pop("financials") or [{}])[0]
+        financials = empty_financials()
+        for bucket in FINANCIAL_BUCKETS:
+            financials[bucket].update(stored.get(bucket, {}))
+            totals[bucket]["amount"] += financials[bucket]["amount"]
+            totals[bucket]["count"] += financials[bucket]["count"]
+        project_data = Project(**doc).dict()
+        project_data["committed_amount"] = financials["committed"]["amount"] + financials["accepted"]["amount"]
+        project_data["financials"] = financials
+        projects.append(project_data)
+        total_budget += project_data["budget_target"]
+
+    total_committed = totals["committed"]["amount"] + totals["accepted"]["amount"]
+    return {
+        "projects": projects,
+        "total_budget_target": total_budget,
+        "total_committed_amount": total_committed,
+        "percentage_covered": total_committed / total_budget * 100 if total_budget > 0 else 0,
+        "financials": totals,
+    }
+
+def _breakdown(groups: List[dict]) -> Dict[str, dict]:
+    return {str(group["_id"]): {"amount": group["amount"], "count": group["count"]} for group in groups}
+
+async def get_marketplace_overview(db: AsyncIOMotorDatabase) -> dict:
+    """Marketplace totals for the operator console, grouped server-side in one pass over bids.
+
+    Modality and pricing-model breakdowns cover bids in COMMITTED_BID_STATUSES, matching
+    total_committed; bids are grouped per slot before the slot lookup, so it runs once per slot.
+    """
+    committed = {"$match": {"status": {"$in": COMMITTED_BID_STATUSES}}}
+    totals = {"amount": {"$sum": "$amount"}, "count": {"$sum": 1}}
+    pipeline = [{"$facet": {
+        # Bids from before status was stored on insert are Pending
+        "by_status": [{"$group": {"_id": {"$ifNull": ["$status", BidStatus.PENDING.value]}, **totals}}],
+        "by_pricing_model": [committed, {"$group": {"_id": "$pricing_model", **totals}}],
+        "by_modality": [
+            committed,
+            {"$group": {"_id": "$slot_id", **totals}},
+            {"$addFields": {"slot_key": {"$convert": {"input": "$_id", "to": "objectId", "onError": None, "onNull": None}}}},
+            {"$lookup": {
+                "from": "slots",
+                "localField": "slot_key",
+                "foreignField": "_id",
+                "pipeline": [{"$project": {"modality": 1}}],
+                "as": "slot"
+            }},
+            {"$group": {
+                "_id": {"$ifNull": [{"$first": "$slot.modality"}, "Unknown"]},
+                "amount": {"$sum": "$amount"},
+                "count": {"$sum": "$count"}
+            }},
+        ],
+    }}]
+    facets, total_budget = await asyncio.gather(
+        db["bids"].aggregate(pipeline).to_list(1),
+        get_total_budget_target(db),
+    )
+    facet = facets[0] if facets else {"by_status": [], "by_pricing_model": [], "by_modality": []}
+    by_status = _breakdown(facet["by_status"])
+    return {
+        "total_committed": sum(by_status.get(status, {}).get("amount", 0) for status in COMMITTED_BID_STATUSES),
+        "total_budgets": total_budget,
+        "by_status": by_status,
+        "by_modality": _breakdown(facet["by_modality"]),
+        "by_pricing_model": _breakdown(facet["by_pricing_model"]),
+    }
+
+async def get_total_budget_target(db: AsyncIOMotorDatabase) -> float:
+    pipeline = [{"$group": {"_id": None, "total": {"$sum": "$budget_target"}}}]
+    result = await db["projects"].aggregate(pipeline).to_list(1)
+    return result[0]["total"] if result else 0
+
+async def _get_by_ids(db: AsyncIOMotorDatabase, collection: str, ids, model: type, projection: Optional[dict] = None) -> dict:
+    object_ids = [ObjectId(doc_id) for doc_id in set(ids) if doc_id and ObjectId.is_valid(doc_id)]
+    found = {}
+    if object_ids:
+        async for doc in db[collection].find({"_id": {"$in": object_ids}}, projection):
+            doc["_id"] = str(doc["_id"])
+            found[doc["_id"]] = model(**doc)
+    return found
+
+async def get_slots_by_ids(db: AsyncIOMotorDatabase, slot_ids) -> Dict[str, Slot]:
+    return await _get_by_ids(db, "slots", slot_ids, Slot)
+
+async def get_projects_by_ids(db: AsyncIOMotorDatabase, project_ids) -> Dict[str, Project]:
+    return await _get_by_ids(db, "projects", project_ids, Project)
+
+async def get_users_by_ids(db: AsyncIOMotorDatabase, user_ids) -> Dict[str, User]:
+    return await _get_by_ids(db, "users", user_ids, User, {"hashed_password": 0})
+
+async def iter_bid_batches(db: AsyncIOMotorDatabase, query: dict, batch_size: int):
+    """Yield lists of up to batch_size bids matching query, in _id order."""
+    batch = []
+    async for doc in db["bids"].find(query).sort("_id", ASCENDING).batch_size(batch_size):
+        doc["_id"] = str(doc["_id"])
+        batch.append(Bid(**doc))
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
 async def get_bid_by_id(db: AsyncIOMotorDatabase, bid_id: str) -> Optional[Bid]:
     try:
         doc = await db["bids"].find_one({"_id": ObjectId(bid_id)})
@@ -272,27 +810,263 @@ async def get_bid_by_id(db: AsyncIOMotorDatabase, bid_id: str) -> Optional[Bid]:
         return None
     return None
 
-async def update_bid(db: AsyncIOMotorDatabase, bid_id: str, bid_data: dict) -> bool:
-    try:
-        bid_data["last_modified_date"] = datetime.utcnow().isoformat()
-        result = await db["bids"].update_one(
-            {"_id": ObjectId(bid_id)},
-            {"$set": bid_data}
-        )
-        return result.modified_count > 0
-    except:
-        return False
+async def update_bid(db: AsyncIOMotorDatabase, bid_id: str, bid_data: dict, query: Optional[dict] = None) -> Optional[Bid]:
+    # Unparsable terms surface as ValueError before anything is written
+    _normalize_bid_amount(bid_data)
+    bid_data["last_modified_date"] = datetime.utcnow().isoformat()
+    if not ObjectId.is_valid(bid_id):
+        return None
+    # The pre-image is kept so an amount or slot change moves the financing counters
+    before = await db["bids"].find_one_and_update({"_id": ObjectId(bid_id), **(query or {})}, {"$set": bid_data})
+    if before is None:
+        return None
+    return await _bid_written(db, before, {**before, **bid_data})
 
 async def delete_bid(db: AsyncIOMotorDatabase, bid_id: str) -> bool:
     try:
-        result = await db["bids"].delete_one({"_id": ObjectId(bid_id)})
-        return result.deleted_count > 0
+        doc = await db["bids"].find_one_and_delete({"_id": ObjectId(bid_id)})
+        if doc is None:
+            return False
+        slots = await bid_slots(db, doc)
+        await record_bid_change(db, doc, None, slots)
+        await bid_events.publish_local(db, bid_deleted(bid_id), doc, slots.get(doc.get("slot_id"), {}))
+        return True
     except:
         return False
 
+# Bid workflow. Each action is one conditional find_one_and_update whose filter names the
+# statuses it may start from, so of two racing requests only one can match. The update returns
+# the bid as it was, which says which financing bucket it leaves (see app/financials.py); the
+# bid as it is afterwards is derived from that by applying the same change.
+BID_TRANSITIONS = {
+    "accept": ((BidStatus.PENDING,), BidStatus.ACCEPTED),
+    "decline": ((BidStatus.PENDING, BidStatus.ACCEPTED, BidStatus.AWAITING_FINAL_APPROVAL), BidStatus.DECLINED),
+    "cancel": ((BidStatus.PENDING,), BidStatus.CANCELLED),
+}
+APPROVABLE_BID_STATUSES = (BidStatus.ACCEPTED, BidStatus.AWAITING_FINAL_APPROVAL)
+BID_APPROVAL_FIELDS = ("creator_final_approval", "buyer_final_approval")
+
+async def get_bid_with_slot(db: AsyncIOMotorDatabase, bid_id: str) -> Tuple[Optional[Bid], Optional[dict]]:
+    """A bid and its slot's project_id and creator_id, in one round trip.
+
+    (None, None) if the bid does not exist; the slot is None if it was deleted. Pass the slot on
+    to transition_bid/approve_bid so the write does not look it up again.
+    """
+    if not ObjectId.is_valid(bid_id):
+        return None, None
+    pipeline = [
+        {"$match": {"_id": ObjectId(bid_id)}},
+        {"$addFields": {"slot_key": {"$convert": {"input": "$slot_id", "to": "objectId", "onError": None, "onNull": None}}}},
+        {"$lookup": {
+            "from": "slots",
+            "localField": "slot_key",
+            "foreignField": "_id",
+            "pipeline": [{"$project": {"project_id": 1, "creator_id": 1}}],
+            "as": "slot"
+        }},
+    ]
+    async for doc in db["bids"].aggregate(pipeline):
+        slots = doc.pop("slot")
+        doc.pop("slot_key", None)
+        doc["_id"] = str(doc["_id"])
+        return Bid(**doc), (slots[0] if slots else None)
+    return None, None
+
+async def _bid_written(db: AsyncIOMotorDatabase, before: dict, after: dict, slot: Optional[dict] = None) -> Bid:
+    """Bookkeeping shared by every bid write: financing counters, change events, the returned model.
+
+    The slots involved are resolved once (not at all if the caller passed the bid's slot) and
+    shared by the counters and the event audience, so a write costs itself plus one counter update.
+    """
+    slots = await bid_slots(db, before, after, known={str(slot["_id"]): slot} if slot else None)
+    await record_bid_change(db, before, after, slots)
+    bid_id = str(after["_id"])
+    await bid_events.publish_local(
+        db, bid_updated(bid_id, {k: v for k, v in after.items() if before.get(k) != v}), after, slots.get(after.get("slot_id"), {}),
+    )
+    return Bid(**{**after, "_id": bid_id})
+
+async def _transition_bid(db: AsyncIOMotorDatabase, bid_id: str, from_statuses, update, apply, slot: Optional[dict] = None) -> Optional[Bid]:
+    if not ObjectId.is_valid(bid_id):
+        return None
+    before = await db["bids"].find_one_and_update(
+        {"_id": ObjectId(bid_id), "status": bid_status_condition(from_statuses)},
+        update,
+    )
+    if before is None:
+        return None
+    return await _bid_written(db, before, apply(dict(before)), slot)
+
+async def transition_bid(db: AsyncIOMotorDatabase, bid_id: str, action: str, slot: Optional[dict] = None) -> Optional[Bid]:
+    """Apply a BID_TRANSITIONS action; None if the bid is no longer in a status it applies to.
+
+    `slot` is the bid's slot as returned by get_bid_with_slot, if the caller already read it.
+    """
+    from_statuses, to_status = BID_TRANSITIONS[action]
+    changes = {"status": to_status.value, "last_modified_date": datetime.utcnow().isoformat()}
+    return await _transition_bid(db, bid_id, from_statuses, {"$set": changes}, lambda doc: {**doc, **changes}, slot)
+
+async def approve_bid(db: AsyncIOMotorDatabase, bid_id: str, approval_field: str, slot: Optional[dict] = None) -> Optional[Bid]:
+    """Record one party's final approval, committing the bid in the same update once both have approved.
+
+    Runs as a pipeline update so the Committed check reads the approvals as written by this
+    update; two concurrent approvals cannot both miss it. None if the bid is not approvable.
+    """
+    if approval_field not in BID_APPROVAL_FIELDS:
+        raise ValueError(f"Unknown approval field {approval_field}")
+    now = datetime.utcnow().isoformat()
+    update = [
+        {"$set": {approval_field: True, "last_modified_date": now}},
+        {"$set": {"status": {"$cond": [
+            {"$and": ["$creator_final_approval", "$buyer_final_approval"]},
+            BidStatus.COMMITTED.value,
+            "$status",
+        ]}}},
+    ]
+
+    def apply(doc: dict) -> dict:
+        doc.update({approval_field: True, "last_modified_date": now})
+        if all(doc.get(field) for field in BID_APPROVAL_FIELDS):
+            doc["status"] = BidStatus.COMMITTED.value
+        return doc
+
+    return await _transition_bid(db, bid_id, APPROVABLE_BID_STATUSES, update, apply, slot)
+
 async def delete_sku(db: AsyncIOMotorDatabase, sku_id: str) -> bool:
     try:
-        result = await db["skus"].delete_one({"_id": ObjectId(sku_id)})
-        return result.deleted_count > 0
+        doc = await db["skus"].find_one_and_delete({"_id": ObjectId(sku_id)}, projection={"imageUrl": 1})
+        if doc:
+            await remove_blob_ref(db, doc.get("imageUrl"), f"sku:{sku_id}")
+        return doc is not None
     except:
-        return False
\ No newline at end of file
+        return False
+
+# Content-addressed uploads. Each blob document is keyed by the file's sha256 and lists the
+# projects/SKUs that link to it in `refs` ("project:<id>", "sku:<id>"); its reference count is
+# the size of that set. Blobs nobody references are removed by gc_uploads.py once they have
+# been unreferenced for a grace period, which also covers uploads never attached to anything.
+
+async def register_blob(db: AsyncIOMotorDatabase, stored: StoredUpload):
+    now = datetime.utcnow().isoformat()
+    await db["blobs"].update_one(
+        {"_id": stored.sha256},
+        {
+            "$setOnInsert": {
+                "path": stored.path,
+                "url": stored.url,
+                "size": stored.size,
+                "content_type": stored.content_type,
+                "refs": [],
+                "created_date": now,
+            },
+            # Restarts the grace period for a re-upload of an orphaned blob
+            "$set": {"last_uploaded_date": now},
+        },
+        upsert=True,
+    )
+
+async def get_blob(db: AsyncIOMotorDatabase, url: Optional[str]) -> Optional[dict]:
+    blob_id = blob_id_from_url(url)
+    if not blob_id:
+        return None
+    return await db["blobs"].find_one({"_id": blob_id})
+
+async def add_blob_refs(db: AsyncIOMotorDatabase, links: List[Tuple[Optional[str], str]]):
+    """Record (url, owner) references; URLs that are not blob URLs are ignored."""
+    updates = [
+        UpdateOne({"_id": blob_id}, {"$addToSet": {"refs": owner}})
+        for blob_id, owner in ((blob_id_from_url(url), owner) for url, owner in links)
+        if blob_id
+    ]
+    if updates:
+        await db["blobs"].bulk_write(updates, ordered=False)
+
+async def remove_blob_ref(db: AsyncIOMotorDatabase, url: Optional[str], owner: str):
+    blob_id = blob_id_from_url(url)
+    if not blob_id:
+        return
+    await db["blobs"].update_one({"_id": blob_id}, {"$pull": {"refs": owner}})
+    await db["blobs"].update_one(
+        {"_id": blob_id, "refs": {"$size": 0}},
+        {"$set": {"released_date": datetime.utcnow().isoformat()}},
+    )
+
+def _image_variants(image_url: str, variants: List[str]) -> dict:
+    return {name: variant_url(image_url, name) for name in variants}
+
+async def _sync_image_variants(db: AsyncIOMotorDatabase, skus: List[Tuple[ObjectId, Optional[str]]]) -> Dict[ObjectId, dict]:
+    """Copy ready image variants onto SKUs whose imageUrl is a blob; returns them by SKU _id.
+
+    Runs after the SKU's blob reference is recorded, so whichever of this and set_blob_variants()
+    runs second fills in the variants.
+    """
+    blob_ids = {blob_id_from_url(url) for _, url in skus} - {None}
+    if not blob_ids:
+        return {}
+    ready = {
+        doc["_id"]: doc["variants"]
+        async for doc in db["blobs"].find({"_id": {"$in": list(blob_ids)}, "variants.0": {"$exists": True}}, {"variants": 1})
+    }
+    found = {
+        sku_id: _image_variants(url, ready[blob_id_from_url(url)])
+        for sku_id, url in skus if blob_id_from_url(url) in ready
+    }
+    if found:
+        await db["skus"].bulk_write(
+            [UpdateOne({"_id": sku_id}, {"$set": {"imageVariants": variants}}) for sku_id, variants in found.items()],
+            ordered=False,
+        )
+    return found
+
+async def set_blob_variants(db: AsyncIOMotorDatabase, blob_id: str, variants: List[str]):
+    """Mark a blob's variants as rendered and copy them onto every SKU already using it."""
+    blob = await db["blobs"].find_one_and_update(
+        {"_id": blob_id},
+        {"$set": {"variants": variants}},
+        projection={"refs": 1},
+        return_document=ReturnDocument.AFTER,
+    )
+    if not blob:
+        return
+    sku_ids = [ObjectId(ref.split(":", 1)[1]) for ref in blob.get("refs", []) if ref.startswith("sku:")]
+    if sku_ids:
+        skus = [(doc["_id"], doc.get("imageUrl")) async for doc in db["skus"].find({"_id": {"$in": sku_ids}}, {"imageUrl": 1})]
+        await _sync_image_variants(db, skus)
+
+def _orphan_blob_query(grace: timedelta) -> dict:
+    cutoff = (datetime.utcnow() - grace).isoformat()
+    return {
+        "refs": {"$size": 0},
+        "last_uploaded_date": {"$lt": cutoff},
+        "$or": [{"released_date": {"$exists": False}}, {"released_date": {"$lt": cutoff}}],
+    }
+
+async def iter_orphan_blobs(db: AsyncIOMotorDatabase, grace: timedelta):
+    async for doc in db["blobs"].find(_orphan_blob_query(grace)):
+        yield doc
+
+async def delete_orphan_blob(db: AsyncIOMotorDatabase, blob_id: str, grace: timedelta) -> Optional[dict]:
+    """Delete a blob document if it is still an orphan; returns it so the caller can remove the file."""
+    return await db["blobs"].find_one_and_delete({"_id": blob_id, **_orphan_blob_query(grace)})
+
+async def rebuild_blob_refs(db: AsyncIOMotorDatabase) -> int:
+    """Recompute every blob's refs from projects.doc_link and skus.imageUrl; returns blobs corrected."""
+    refs: Dict[str, set] = {}
+    for collection, field, kind in (("projects", "doc_link", "project"), ("skus", "imageUrl", "sku")):
+        async for doc in db[collection].find({field: {"$regex": "/blobs/"}}, {field: 1}):
+            blob_id = blob_id_from_url(doc.get(field))
+            if blob_id:
+                refs.setdefault(blob_id, set()).add(f"{kind}:{doc['_id']}")
+
+    now = datetime.utcnow().isoformat()
+    updates = []
+    async for blob in db["blobs"].find({}, {"refs": 1}):
+        expected = refs.get(blob["_id"], set())
+        if set(blob.get("refs", [])) != expected:
+            update = {"$set": {"refs": sorted(expected)}}
+            if not expected:
+                update["$set"]["released_date"] = now
+            updates.append(UpdateOne({"_id": blob["_id"]}, update))
+    if updates:
+        await db["blobs"].bulk_write(updates, ordered=False)
+    return len(updates)
@@ -0,0 +1,99 @@
+from collections import OrderedDict
+from fastapi import Request, Response
+from typing import NamedTuple, Optional
+import hashlib
+import json
+import os
+import time
+
+SLOT_CACHE_SIZE = int(os.getenv("SLOT_CACHE_SIZE", "1000"))
+# Total size of the cached bodies; the least recently used are evicted beyond it
+SLOT_CACHE_MAX_BYTES = int(os.getenv("SLOT_CACHE_MAX_MB", "64")) * 1024 * 1024
+SLOT_CACHE_TTL_SECONDS = float(os.getenv("SLOT_CACHE_TTL_SECONDS", "30"))
+# How long browsers/CDNs may reuse a discovery response before revalidating with If-None-Match
+SLOT_CACHE_MAX_AGE = int(os.getenv("SLOT_CACHE_MAX_AGE", "5"))
+# Operator overview: a marketplace-wide aggregate, so staleness is bounded by TTL alone
+OVERVIEW_CACHE_TTL_SECONDS = float(os.getenv("OVERVIEW_CACHE_TTL_SECONDS", "15"))
+
+class CachedResponse(NamedTuple):
+    body: bytes
+    etag: str
+    headers: dict
+    expires_at: float
+
+class ResponseCache:
+    """LRU of serialized JSON responses, bounded by entry count and total body size.
+
+    Keys are built from the request path and the endpoint's validated inputs (see key_for), never
+    the raw query string, so unknown parameters cannot create extra entries. Writes in this process
+    call clear() through the repository; the TTL bounds staleness for writes handled by other workers.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float, max_age: int, private: bool = False, max_bytes: Optional[int] = None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.size_bytes = 0
+        self.ttl_seconds = ttl_seconds
+        # Private responses may be reused by the caller's browser but never by shared caches
+        self.cache_control = f"{'private' if private else 'public'}, max-age={max_age}"
+        self._entries: "OrderedDict[str, CachedResponse]" = OrderedDict()
+        # Bumped by clear(); a read that started before a write must not repopulate the cache
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key_for(request: Request, **inputs) -> str:
+        """Key for the request's path plus the inputs the response depends on, as the endpoint parsed them."""
+        return request.url.path + "?" + json.dumps(inputs, sort_keys=True, separators=(",", ":"), default=str)
+
+    def _evict(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.size_bytes -= len(entry.body)
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        entry = self._entries.get(key)
+        if entry is None or entry.expires_at <= time.monotonic():
+            self._evict(key)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    def set(self, key: str, body: bytes, headers: Optional[dict] = None, generation: Optional[int] = None) -> CachedResponse:
+        entry = CachedResponse(
+            body=body,
+            etag='"' + hashlib.sha256(body).hexdigest()[:32] + '"',
+            headers=headers or {},
+            expires_at=time.monotonic() + self.ttl_seconds,
+        )
+        fits = self.max_bytes is None or len(body) <= self.max_bytes
+        if self.max_entries > 0 and fits and (generation is None or generation == self.generation):
+            self._evict(key)
+            self._entries[key] = entry
+            self.size_bytes += len(body)
+            while len(self._entries) > self.max_entries or (self.max_bytes is not None and self.size_bytes > self.max_bytes):
+                self._evict(next(iter(self._entries)))
+        return entry
+
+    def clear(self):
+        self.generation += 1
+        self._entries.clear()
+        self.size_bytes = 0
+
+    def stats(self) -> dict:
+        return {"size": len(self._entries), "bytes": self.size_bytes, "hits": self.hits, "misses": self.misses}
+
+    def respond(self, request: Request, entry: CachedResponse) -> Response:
+        headers = {**entry.headers, "ETag": entry.etag, "Cache-Control": self.cache_control}
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match:
+            candidates = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+            if "*" in candidates or entry.etag in candidates:
+                return Response(status_code=304, headers=headers)
+        return Response(content=entry.body, media_type="application/json", headers=headers)
+
+slot_cache = ResponseCache(SLOT_CACHE_SIZE, SLOT_CACHE_TTL_SECONDS, SLOT_CACHE_MAX_AGE, max_bytes=SLOT_CACHE_MAX_BYTES)
+overview_cache = ResponseCache(1, OVERVIEW_CACHE_TTL_SECONDS, 0, private=True)
@@ -1,50 +1,102 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Response, Request
+from fastapi.responses import FileResponse, StreamingResponse
 from motor.motor_asyncio import AsyncIOMotorDatabase
-from typing import List
+from typing import List, Optional
 
 from ..database import get_db
-from ..auth import get_current_user
-from ..models import Bid, BidCreate, User, Slot, Comment
-from ..repository import create_bid, get_bids_by_counterparty, get_bid_by_id, update_bid, delete_bid, get_slot_by_id, get_bids_by_slot, get_project_by_id, get_all_bids
-from pydantic import BaseModel
-import uuid
+from ..pagination import PageParams, page_params, set_next_cursor, MAX_PAGE_SIZE
+from ..streaming import wants_ndjson, ndjson_response
+from ..fields import fields_param, is_sparse, sparse_response
+from ..deal_memos import get_deal_memo_file, DEAL_MEMO_STATUSES
+from ..evidence import resolve_deals, evidence_pack, stream_evidence_zip
+from ..auth import get_current_user, get_stream_user
+from ..events import bid_events, sse_events, SSE_MEDIA_TYPE
+from ..models import Bid, BidCreate, User, Slot, Comment, CommentCreate, BidStatus
+from ..repository import create_bid, get_bids_by_counterparty, get_bid_by_id, update_bid, delete_bid, get_slot_by_id, get_bids_by_slot, get_all_bids, get_bids_by_creator, iter_all_bids, iter_bids_by_counterparty, iter_bids_by_creator, create_comment, get_comments_by_bid, get_bid_with_slot, transition_bid, approve_bid, bid_status_condition
+from bson import ObjectId
 from datetime import datetime
 
 router = APIRouter()
 
-class CommentCreate(BaseModel):
-    text: str
+# Bids written before comments moved to their own collection may still embed them; lists leave them out
+bid_list_fields = fields_param(Bid, default_exclude=("comments",))
 
 @router.get("/", response_model=List[Bid], response_model_by_alias=False)
 async def read_bids(
+    request: Request,
+    response: Response,
+    status: Optional[BidStatus] = Query(None, description="Only return bids in this status"),
+    page: PageParams = Depends(page_params),
+    projection: Optional[dict] = Depends(bid_list_fields),
     current_user: User = Depends(get_current_user),
     db: AsyncIOMotorDatabase = Depends(get_db)
 ):
+    status_value = status.value if status else None
+
+    # Opt-in streaming: rows go out as the cursor yields them instead of being collected first
+    if wants_ndjson(request):
+        if current_user.role in ["advertiser", "merchant"]:
+            return ndjson_response(iter_bids_by_counterparty(db, current_user.id, status_value, page.stream_limit, page.after, projection))
+        if current_user.role == "operator":
+            return ndjson_response(iter_all_bids(db, status_value, page.stream_limit, page.after, projection))
+        if current_user.role == "creator":
+            return ndjson_response(iter_bids_by_creator(db, current_user.id, status_value, page.stream_limit, page.after, projection))
+
     # Advertisers/Merchants see their own bids
     if current_user.role in ["advertiser", "merchant"]:
-        return await get_bids_by_counterparty(db, current_user.id)
+        bids = await get_bids_by_counterparty(db, current_user.id, status_value, page.limit, page.after, projection)
     
-    if current_user.role == "operator":
-        return await get_all_bids(db)
-
-    # Creators can see all bids relevant to their slots
-    if current_user.role == "creator":
-        # Get all slots by creator
-        # Then get all bids for those slots
-        # This is inefficient but works for now. Better to have get_bids_by_creator in repo.
-        from ..repository import get_slots_by_project, get_projects_by_creator
-        projects = await get_projects_by_creator(db, current_user.id)
-        all_bids = []
-        for project in projects:
-            # We need slots for this project
-            # This is getting heavy, we need a repository optimization later
-            slots = await get_slots_by_project(db, project.id)
-            for slot in slots:
-                bids = await get_bids_by_slot(db, slot.id)
-                all_bids.extend(bids)
-        return all_bids
+    elif current_user.role == "operator":
+        bids = await get_all_bids(db, status_value, page.limit, page.after, projection)
+
+    # Creators can see all bids relevant to their slots (one aggregation over slots -> bids)
+    elif current_user.role == "creator":
+        bids = await get_bids_by_creator(db, current_user.id, status_value, page.limit, page.after, projection)
         
-    return []
+    else:
+        bids = []
+
+    set_next_cursor(response, bids, page)
+    return sparse_response(response, bids) if is_sparse(projection) else bids
+
+@router.get("/evidence_packs")
+async def export_evidence_packs(
+    status: Optional[BidStatus] = None,
+    ids: Optional[List[str]] = Query(None, description="Export only these bids"),
+    include_memos: bool = True,
+    current_user: User = Depends(get_current_user),
+    db: AsyncIOMotorDatabase = Depends(get_db)
+):
+    if current_user.role != "operator":
+        raise HTTPException(status_code=403, detail="Only operators can generate evidence packs")
+
+    # Deals by default: bids that reached a memo-bearing status
+    query = {"status": bid_status_condition([status] if status else DEAL_MEMO_STATUSES)}
+    if ids:
+        if not all(ObjectId.is_valid(bid_id) for bid_id in ids):
+            raise HTTPException(status_code=400, detail="Invalid bid id")
+        query = {"_id": {"$in": [ObjectId(bid_id) for bid_id in ids]}, **({"status": bid_status_condition([status])} if status else {})}
+
+    filename = f"evidence-packs-{datetime.utcnow().strftime('%Y%m%d-%H%M%S')}.zip"
+    return StreamingResponse(
+        stream_evidence_zip(db, query, include_memos),
+        media_type="application/zip",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+@router.get("/events")
+async def subscribe_bid_events(current_user: User = Depends(get_stream_user)):
+    """Server-Sent Events stream of changes to the caller's bids and their comments.
+
+    Events are `bid.created`, `bid.updated` (only the changed fields), `bid.deleted` and
+    `comment.created`; operators receive every bid's events.
+    """
+    subscription = bid_events.subscribe(current_user.id, current_user.role)
+    return StreamingResponse(
+        sse_events(subscription),
+        media_type=SSE_MEDIA_TYPE,
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 @router.get("/{bid_id}", response_model=Bid, response_model_by_alias=False)
 async def read_bid(
@@ -72,6 +124,9 @@ async def read_bid(
 @router.get("/slot/{slot_id}", response_model=List[Bid], response_model_by_alias=False)
 async def read_bids_for_slot(
     slot_id: str,
+    response: Response,
+    page: PageParams = Depends(page_params),
+    projection: Optional[dict] = Depends(bid_list_fields),
     current_user: User = Depends(get_current_user),
     db: AsyncIOMotorDatabase = Depends(get_db)
 ):
@@ -79,13 +134,11 @@ async def read_bids_for_slot(
     if not slot:
         raise HTTPException(status_code=404, detail="Slot not found")
         
-    # Creator of the slot can see all bids
-    if current_user.role == "creator" and slot.creator_id == current_user.id:
-        return await get_bids_by_slot(db, slot_id)
-    
-    # Operators can see everything
-    if current_user.role == "operator":
-        return await get_bids_by_slot(db, slot_id)
+    # Creator of the slot can see all bids; operators can see everything
+    if (current_user.role == "creator" and slot.creator_id == current_user.id) or current_user.role == "operator":
+        bids = await get_bids_by_slot(db, slot_id, page.limit, page.after, projection)
+        set_next_cursor(response, bids, page)
+        return sparse_response(response, bids) if is_sparse(projection) else bids
     
     raise HTTPException(status_code=403, detail="Not authorized to view bids for this slot")
 
@@ -104,7 +157,10 @@ async def create_new_bid(
     if not slot:
          raise HTTPException(status_code=404, detail="Slot not found")
          
-    return await create_bid(db, bid, current_user.id)
+    try:
+        return await create_bid(db, bid, current_user.id)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=f"Invalid amount terms: {str(e)}")
 
 @router.put("/{bid_id}", response_model=Bid, response_model_by_alias=False)
 async def update_existing_bid(
@@ -113,22 +169,24 @@ async def update_existing_bid(
     current_user: User = Depends(get_current_user),
     db: AsyncIOMotorDatabase = Depends(get_db)
 ):
-    bid = await get_bid_by_id(db, bid_id)
-    if not bid:
-        raise HTTPException(status_code=404, detail="Bid not found")
-        
-    # Only the bidder can update the bid details, and only if it's pending
-    if current_user.id == bid.counterparty_id:
-        if bid.status != "Pending":
-             raise HTTPException(status_code=400, detail="Cannot edit a bid that is not Pending")
-    else:
-         raise HTTPException(status_code=403, detail="Not authorized to update this bid")
-    
-    success = await update_bid(db, bid_id, bid_update.dict(exclude_unset=True))
-    if not success:
-        raise HTTPException(status_code=500, detail="Failed to update bid")
+    # Only the bidder can update the bid details, and only if it's pending. Both are part of
+    # the update's filter, so an edit cannot land after the bid was accepted.
+    try:
+        updated = await update_bid(
+            db, bid_id, bid_update.dict(exclude_unset=True),
+            {"counterparty_id": current_user.id, "status": bid_status_condition([BidStatus.PENDING])},
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=f"Invalid amount terms: {str(e)}")
+    if updated is None:
+        bid = await get_bid_by_id(db, bid_id)
+        if not bid:
+            raise HTTPException(status_code=404, detail="Bid not found")
+        if current_user.id != bid.counterparty_id:
+            raise HTTPException(status_code=403, detail="Not authorized to update this bid")
+        raise HTTPException(status_code=400, detail="Cannot edit a bid that is not Pending")
         
-    return await get_bid_by_id(db, bid_id)
+    return updated
 
 @router.delete("/{bid_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def cancel_bid(
@@ -143,42 +201,37 @@ async def cancel_bid(
     if current_user.id != bid.counterparty_id:
         raise HTTPException(status_code=403, detail="Not authorized to cancel this bid")
         
-    if bid.status != "Pending":
-         raise HTTPException(status_code=400, detail="Cannot cancel a bid that is not Pending")
-    
     # Instead of deleting, we set status to Cancelled (Soft Delete / Status Change)
     # per PRD requirement: "Delete: User can cancel an unaccepted bid/reservation."
     # and "Retention: Retain for audit purposes even if cancelled/declined."
-    
-    success = await update_bid(db, bid_id, {"status": "Cancelled"})
-    if not success:
-        raise HTTPException(status_code=500, detail="Failed to cancel bid")
+    # The transition only matches a Pending bid, so it cannot race an accept.
+    if await transition_bid(db, bid_id, "cancel") is None:
+        raise HTTPException(status_code=400, detail="Cannot cancel a bid that is not Pending")
     
     return None
 
+async def _creator_transition(bid_id: str, action: str, current_user: User, db: AsyncIOMotorDatabase) -> Bid:
+    bid, slot = await get_bid_with_slot(db, bid_id)
+    if not bid:
+        raise HTTPException(status_code=404, detail="Bid not found")
+    if slot is None:
+         raise HTTPException(status_code=404, detail="Associated slot not found")
+
+    if current_user.role != "creator" or slot.get("creator_id") != current_user.id:
+         raise HTTPException(status_code=403, detail=f"Only the slot owner can {action} bids")
+
+    updated = await transition_bid(db, bid_id, action, slot)
+    if updated is None:
+         raise HTTPException(status_code=400, detail=f"Cannot {action} a bid that is {bid.status.value}")
+    return updated
+
 @router.post("/{bid_id}/accept", response_model=Bid, response_model_by_alias=False)
 async def accept_bid(
     bid_id: str,
     current_user: User = Depends(get_current_user),
     db: AsyncIOMotorDatabase = Depends(get_db)
 ):
-    bid = await get_bid_by_id(db, bid_id)
-    if not bid:
-        raise HTTPException(status_code=404, detail="Bid not found")
-    
-    slot = await get_slot_by_id(db, bid.slot_id)
-    if not slot:
-         raise HTTPException(status_code=404, detail="Associated slot not found")
-
-    if current_user.role != "creator" or slot.creator_id != current_user.id:
-         raise HTTPException(status_code=403, detail="Only the slot owner can accept bids")
-
-    # Update bid status
-    success = await update_bid(db, bid_id, {"status": "Accepted"}) # Or AwaitingFinalApproval per PRD
-    if not success:
-         raise HTTPException(status_code=500, detail="Failed to accept bid")
-         
-    return await get_bid_by_id(db, bid_id)
+    return await _creator_transition(bid_id, "accept", current_user, db)
 
 @router.post("/{bid_id}/decline", response_model=Bid, response_model_by_alias=False)
 async def decline_bid(
@@ -186,68 +239,47 @@ async def decline_bid(
     current_user: User = Depends(get_current_user),
     db: AsyncIOMotorDatabase = Depends(get_db)
 ):
+    return await _creator_transition(bid_id, "decline", current_user, db)
+
+async def _get_discussable_bid(bid_id: str, current_user: User, db: AsyncIOMotorDatabase, allow_operator: bool = False) -> Bid:
     bid = await get_bid_by_id(db, bid_id)
     if not bid:
         raise HTTPException(status_code=404, detail="Bid not found")
     
+    # Check access
+    if current_user.id == bid.counterparty_id or (allow_operator and current_user.role == "operator"):
+        return bid
     slot = await get_slot_by_id(db, bid.slot_id)
-    if not slot:
-         raise HTTPException(status_code=404, detail="Associated slot not found")
-
-    if current_user.role != "creator" or slot.creator_id != current_user.id:
-         raise HTTPException(status_code=403, detail="Only the slot owner can decline bids")
+    if slot and slot.creator_id == current_user.id:
+        return bid
+    raise HTTPException(status_code=403, detail="Not authorized to access comments on this bid")
 
-    # Update bid status
-    success = await update_bid(db, bid_id, {"status": "Declined"})
-    if not success:
-         raise HTTPException(status_code=500, detail="Failed to decline bid")
-         
-    return await get_bid_by_id(db, bid_id)
+@router.get("/{bid_id}/comments", response_model=List[Comment], response_model_by_alias=False)
+async def read_comments(
+    bid_id: str,
+    after: Optional[str] = Query(None, description="Only return comments posted after the comment with this id"),
+    limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE),
+    current_user: User = Depends(get_current_user),
+    db: AsyncIOMotorDatabase = Depends(get_db)
+):
+    await _get_discussable_bid(bid_id, current_user, db, allow_operator=True)
+    if after is not None and not ObjectId.is_valid(after):
+        raise HTTPException(status_code=400, detail="Invalid comment id")
+    # Clients poll with the id of the last comment they hold and only receive what is new
+    return await get_comments_by_bid(db, bid_id, limit, after)
 
-@router.post("/{bid_id}/comments", response_model=Bid, response_model_by_alias=False)
+@router.post("/{bid_id}/comments", response_model=Comment, response_model_by_alias=False)
 async def add_comment(
     bid_id: str,
     comment: CommentCreate,
     current_user: User = Depends(get_current_user),
     db: AsyncIOMotorDatabase = Depends(get_db)
 ):
-    bid = await get_bid_by_id(db, bid_id)
-    if not bid:
-        raise HTTPException(status_code=404, detail="Bid not found")
-    
-    # Check access
-    has_access = False
-    if current_user.id == bid.counterparty_id:
-        has_access = True
-    else:
-        slot = await get_slot_by_id(db, bid.slot_id)
-        if slot and slot.creator_id == current_user.id:
-             has_access = True
-             
-    if not has_access:
-         raise HTTPException(status_code=403, detail="Not authorized to comment on this bid")
-         
-    new_comment = {
-        "id": str(uuid.uuid4()),
-        "author_id": current_user.id,
-        "text": comment.text,
-        "timestamp": datetime.utcnow().isoformat()
-    }
-    
-    # Append comment
-    # In MongoDB we can use $push
+    await _get_discussable_bid(bid_id, current_user, db)
     try:
-        await db["bids"].update_one(
-            {"_id": bid.id}, # bid.id is already objectid if from model? No it's str in model
-            # wait, get_bid_by_id converts _id to str. update_bid uses ObjectId conversion.
-            # let's use the repository update method logic but specifically for push if possible
-            # or just reload, append, save. Reload/append is safer for simple logic now.
-            {"$push": {"comments": new_comment}}
-        )
+        return await create_comment(db, bid_id, current_user.id, comment.text)
     except Exception as e:
          raise HTTPException(status_code=500, detail=f"Failed to add comment: {str(e)}")
-         
-    return await get_bid_by_id(db, bid_id)
 
 @router.post("/{bid_id}/approve", response_model=Bid, response_model_by_alias=False)
 async def final_approval(
@@ -255,37 +287,29 @@ async def final_approval(
     current_user: User = Depends(get_current_user),
     db: AsyncIOMotorDatabase = Depends(get_db)
 ):
-    bid = await get_bid_by_id(db, bid_id)
+    bid, slot = await get_bid_with_slot(db, bid_id)
     if not bid:
         raise HTTPException(status_code=404, detail="Bid not found")
         
-    updates = {}
-    
-    # Check if Creator
-    slot = await get_slot_by_id(db, bid.slot_id)
-    if slot and slot.creator_id == current_user.id:
-        updates["creator_final_approval"] = True
+    if slot and slot.get("creator_id") == current_user.id:
+        approval_field = "creator_final_approval"
     elif current_user.id == bid.counterparty_id:
-        updates["buyer_final_approval"] = True
+        approval_field = "buyer_final_approval"
     else:
         raise HTTPException(status_code=403, detail="Not authorized to approve this deal")
-        
-    # Apply update
-    await update_bid(db, bid_id, updates)
-    
-    # Check if both approved to set Committed
-    updated_bid = await get_bid_by_id(db, bid_id)
-    if updated_bid.creator_final_approval and updated_bid.buyer_final_approval and updated_bid.status != "Committed":
-        await update_bid(db, bid_id, {"status": "Committed"})
-        # TODO: Create FinancingCommitment record here
-        
-    return await get_bid_by_id(db, bid_id)
-@router.get("/{bid_id}/deal_memo", response_model=dict)
-async def get_deal_memo(
-    bid_id: str,
-    current_user: User = Depends(get_current_user),
-    db: AsyncIOMotorDatabase = Depends(get_db)
-):
+
+    # Approving an already committed deal again is a no-op
+    if bid.status == BidStatus.COMMITTED:
+        return bid
+
+    # Sets the approval and, if the other party has approved too, flips to Committed atomically
+    updated = await approve_bid(db, bid_id, approval_field, slot)
+    if updated is None:
+        raise HTTPException(status_code=400, detail=f"Cannot approve a bid that is {bid.status.value}")
+    # TODO: Create FinancingCommitment record here
+    return updated
+
+async def _get_deal_memo_bid(bid_id: str, current_user: User, db: AsyncIOMotorDatabase):
     bid = await get_bid_by_id(db, bid_id)
     if not bid:
         raise HTTPException(status_code=404, detail="Bid not found")
@@ -300,16 +324,34 @@ async def get_deal_memo(
     if not (is_creator or is_buyer or is_operator):
         raise HTTPException(status_code=403, detail="Not authorized to access deal memo")
         
-    if bid.status not in ["Accepted", "AwaitingFinalApproval", "Committed"]:
+    if bid.status not in DEAL_MEMO_STATUSES:
          raise HTTPException(status_code=400, detail="Deal memo not available for this bid status")
+    return bid, slot
 
-    # Mock Deal Memo Generation
+@router.get("/{bid_id}/deal_memo", response_model=dict)
+async def get_deal_memo(
+    bid_id: str,
+    current_user: User = Depends(get_current_user),
+    db: AsyncIOMotorDatabase = Depends(get_db)
+):
+    await _get_deal_memo_bid(bid_id, current_user, db)
     return {
         "deal_id": bid_id,
-        "content": "This is a placeholder for the Deal Memo PDF.",
-        "download_link": f"/static/uploads/deal_memos/{bid_id}.pdf" # Mock link
+        "content": "Deal Memo PDF",
+        "download_link": f"/api/v1/bids/{bid_id}/deal_memo/pdf"
     }
 
+@router.get("/{bid_id}/deal_memo/pdf")
+async def download_deal_memo(
+    bid_id: str,
+    current_user: User = Depends(get_current_user),
+    db: AsyncIOMotorDatabase = Depends(get_db)
+):
+    bid, slot = await _get_deal_memo_bid(bid_id, current_user, db)
+    # Rendered once per version of the bid; later downloads are a file read
+    path = await get_deal_memo_file(db, bid, slot)
+    return FileResponse(path, media_type="application/pdf", filename=f"deal-memo-{bid_id}.pdf", headers={"Cache-Control": "private, no-cache"})
+
 @router.get("/{bid_id}/evidence_pack", response_model=dict)
 async def get_evidence_pack(
     bid_id: str,
@@ -323,31 +365,5 @@ async def get_evidence_pack(
     if not bid:
         raise HTTPException(status_code=404, detail="Bid not found")
         
-    slot = await get_slot_by_id(db, bid.slot_id)
-    project = await get_project_by_id(db, slot.project_id) if slot else None
-    
-    # In a real app, fetch user details for names
-    # For now, returning raw IDs or minimal info
-    
-    return {
-        "dealId": bid.id,
-        "status": bid.status,
-        "script": {
-            "title": project.title if project else "Unknown",
-            "creator_id": project.creator_id if project else "Unknown",
-        },
-        "slot": {
-            "sceneRef": slot.scene_ref if slot else "Unknown",
-            "description": slot.description if slot else "Unknown",
-            "pricingFloor": slot.pricing_floor if slot else 0,
-        },
-        "bid": {
-            "counterparty_id": bid.counterparty_id,
-            "objective": bid.objective,
-            "pricingModel": bid.pricing_model,
-            "terms": bid.amount_terms,
-            "flightWindow": bid.flight_window,
-            "submittedDate": bid.created_date,
-        },
-        "dealMemoLink": f"/api/v1/bids/{bid.id}/deal_memo"
-    }
\ No newline at end of file
+    deal, = await resolve_deals(db, [bid])
+    return evidence_pack(deal)
@@ -1,21 +1,29 @@
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Path, status, UploadFile, File, Form, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse
 from motor.motor_asyncio import AsyncIOMotorDatabase
 from typing import List, Optional
-import shutil
 import os
 import json
 from pydantic import ValidationError
 
 from ..database import get_db
+from ..pagination import PageParams, page_params, set_next_cursor
+from ..fields import fields_param, is_sparse, sparse_response
+from ..uploads import store_upload, local_path, blob_id_from_url, SCRIPT_UPLOAD_POLICY
+from ..script_index import index_project_script, page_path
 from ..auth import get_current_user
 from ..models import Project, ProjectCreate, User
-from ..repository import create_project, get_projects_by_creator, get_project_by_id, update_project, delete_project, get_all_projects
+from ..repository import create_project, get_projects_by_creator, get_project_by_id, update_project, delete_project, get_all_projects, register_blob
 from ..models import ProjectCreate
 
 router = APIRouter()
 
 @router.get("/", response_model=List[Project], response_model_by_alias=False)
 async def read_projects(
+    response: Response,
+    page: PageParams = Depends(page_params),
+    projection: Optional[dict] = Depends(fields_param(Project)),
     current_user: User = Depends(get_current_user),
     db: AsyncIOMotorDatabase = Depends(get_db)
 ):
@@ -24,16 +32,21 @@ async def read_projects(
     # Based on "MyScriptsPage", this should return the current user's projects.
     
     if current_user.role == "operator":
-        return await get_all_projects(db)
+        projects = await get_all_projects(db, page.limit, page.after, projection)
     
     # Allow merchants and advertisers to see projects for discovery
-    if current_user.role in ["merchant", "advertiser"]:
-        return await get_all_projects(db)
+    elif current_user.role in ["merchant", "advertiser"]:
+        projects = await get_all_projects(db, page.limit, page.after, projection)
         
-    return await get_projects_by_creator(db, current_user.id)
+    else:
+        projects = await get_projects_by_creator(db, current_user.id, page.limit, page.after, projection)
+
+    set_next_cursor(response, projects, page)
+    return sparse_response(response, projects) if is_sparse(projection) else projects
 
 @router.post("/", response_model=Project, response_model_by_alias=False)
 async def create_new_project(
+    background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
     metadata: str = Form(...),
     current_user: User = Depends(get_current_user),
@@ -47,28 +60,18 @@ async def create_new_project(
     except ValidationError as e:
         raise HTTPException(status_code=422, detail=f"Invalid metadata: {str(e)}")
 
-    # Save file
-    # Ensure directory exists just in case
-    os.makedirs("static/uploads", exist_ok=True)
-    
-    # Generate a safe filename or use original (risky but okay for demo)
-    # For better safety in production, we'd UUID this.
-    file_path = f"static/uploads/{file.filename}"
-    
-    with open(file_path, "wb+") as file_object:
-        shutil.copyfileobj(file.file, file_object)
+    # Stored by content hash: re-uploading the same script reuses the existing file
+    stored = await store_upload(file, SCRIPT_UPLOAD_POLICY)
+    await register_blob(db, stored)
     
     # Create project in DB
-    # Note: doc_link is stored as relative path or full URL. relative is fine for now.
-    new_project = await create_project(db, project_data, current_user.id, doc_link=file_path)
+    # Note: doc_link is the blob's server-relative URL; it is immutable, so clients may cache it indefinitely.
+    new_project = await create_project(db, project_data, current_user.id, doc_link=stored.url)
+    # Split into single-page PDFs after the response is sent; see read_project_script_page
+    background_tasks.add_task(index_project_script, db, new_project.id, stored.path)
     return new_project
 
-@router.get("/{project_id}", response_model=Project, response_model_by_alias=False)
-async def read_project(
-    project_id: str,
-    current_user: User = Depends(get_current_user),
-    db: AsyncIOMotorDatabase = Depends(get_db)
-):
+async def _get_readable_project(project_id: str, current_user: User, db: AsyncIOMotorDatabase) -> Project:
     project = await get_project_by_id(db, project_id)
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
@@ -76,6 +79,15 @@ async def read_project(
     # Access control
     if current_user.role == "creator" and project.creator_id != current_user.id:
          raise HTTPException(status_code=403, detail="Not authorized to view this project")
+    return project
+
+@router.get("/{project_id}", response_model=Project, response_model_by_alias=False)
+async def read_project(
+    project_id: str,
+    current_user: User = Depends(get_current_user),
+    db: AsyncIOMotorDatabase = Depends(get_db)
+):
+    project = await _get_readable_project(project_id, current_user, db)
     
     # Operators can see everything
     if current_user.role == "operator":
@@ -86,6 +98,42 @@ async def read_project(
          
     return project
 
+# Blob-backed scripts (and their pages) never change under the same URL
+SCRIPT_CACHE_CONTROL = "private, max-age=31536000, immutable"
+
+def _script_headers(project: Project) -> dict:
+    return {"Cache-Control": SCRIPT_CACHE_CONTROL} if blob_id_from_url(project.doc_link) else {}
+
+@router.get("/{project_id}/script")
+async def read_project_script(
+    project_id: str,
+    current_user: User = Depends(get_current_user),
+    db: AsyncIOMotorDatabase = Depends(get_db)
+):
+    project = await _get_readable_project(project_id, current_user, db)
+    path = local_path(project.doc_link)
+    if not path or not await run_in_threadpool(os.path.exists, path):
+        raise HTTPException(status_code=404, detail="Script file not found")
+    # FileResponse honours Range headers, so viewers can fetch the original in byte ranges
+    return FileResponse(path, media_type="application/pdf", headers=_script_headers(project))
+
+@router.get("/{project_id}/script/pages/{page}")
+async def read_project_script_page(
+    project_id: str,
+    page: int = Path(..., ge=1),
+    current_user: User = Depends(get_current_user),
+    db: AsyncIOMotorDatabase = Depends(get_db)
+):
+    project = await _get_readable_project(project_id, current_user, db)
+    if not project.script_index:
+        raise HTTPException(status_code=404, detail="Script pages are not available yet")
+    if page > project.script_index.page_count:
+        raise HTTPException(status_code=404, detail=f"Script has {project.script_index.page_count} pages")
+    path = local_path(project.doc_link)
+    if not path or not await run_in_threadpool(os.path.exists, page_path(path, page)):
+        raise HTTPException(status_code=404, detail="Script page not found")
+    return FileResponse(page_path(path, page), media_type="application/pdf", headers=_script_headers(project))
+
 @router.put("/{project_id}", response_model=Project, response_model_by_alias=False)
 async def update_existing_project(
     project_id: str,
@@ -93,18 +141,16 @@ async def update_existing_project(
     current_user: User = Depends(get_current_user),
     db: AsyncIOMotorDatabase = Depends(get_db)
 ):
-    project = await get_project_by_id(db, project_id)
-    if not project:
-        raise HTTPException(status_code=404, detail="Project not found")
-        
-    if current_user.role != "creator" or project.creator_id != current_user.id:
+    if current_user.role != "creator":
+        raise HTTPException(status_code=403, detail="Not authorized to update this project")
+
+    project = await update_project(db, project_id, project_update.dict(exclude_unset=True), {"creator_id": current_user.id})
+    if project is None:
+        if await get_project_by_id(db, project_id) is None:
+            raise HTTPException(status_code=404, detail="Project not found")
         raise HTTPException(status_code=403, detail="Not authorized to update this project")
-    
-    success = await update_project(db, project_id, project_update.dict(exclude_unset=True))
-    if not success:
-        raise HTTPException(status_code=500, detail="Failed to update project")
         
-    return await get_project_by_id(db, project_id)
+    return project
 
 @router.delete("/{project_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_existing_project(
@@ -1,19 +1,29 @@
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Request, status, UploadFile, File, Response
+from fastapi.concurrency import run_in_threadpool
 from motor.motor_asyncio import AsyncIOMotorDatabase
-from typing import List
-import os
-import shutil
-import uuid
+from pydantic import ValidationError
+from typing import List, Optional
+from itertools import islice
+import csv
+import io
+import re
 
 from ..database import get_db
+from ..pagination import PageParams, page_params, set_next_cursor
+from ..fields import fields_param, is_sparse, sparse_response
+from ..uploads import store_upload, public_url, IMAGE_UPLOAD_POLICY
+from ..images import build_image_variants
 from ..auth import get_current_user
-from ..models import SKU, SKUCreate, User
-from ..repository import create_sku, get_skus_by_merchant, get_sku_by_id, update_sku, delete_sku
+from ..models import SKU, SKUCreate, User, SKUImportResult, SKUImportError
+from ..repository import create_sku, get_skus_by_merchant, get_sku_by_id, update_sku, delete_sku, insert_skus, register_blob
 
 router = APIRouter()
 
 @router.get("/", response_model=List[SKU], response_model_by_alias=False)
 async def read_skus(
+    response: Response,
+    page: PageParams = Depends(page_params),
+    projection: Optional[dict] = Depends(fields_param(SKU)),
     current_user: User = Depends(get_current_user),
     db: AsyncIOMotorDatabase = Depends(get_db)
 ):
@@ -21,35 +31,111 @@ async def read_skus(
         # In a real app, maybe admins/operators can see them too, but for now strict check
         raise HTTPException(status_code=403, detail="Only merchants can view their SKUs")
         
-    return await get_skus_by_merchant(db, current_user.id)
+    skus = await get_skus_by_merchant(db, current_user.id, page.limit, page.after, projection)
+    set_next_cursor(response, skus, page)
+    return sparse_response(response, skus) if is_sparse(projection) else skus
 
 @router.post("/upload-image")
 async def upload_sku_image(
+    request: Request,
+    background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    db: AsyncIOMotorDatabase = Depends(get_db)
 ):
     if current_user.role != "merchant":
         raise HTTPException(status_code=403, detail="Only merchants can upload SKU images")
     
-    # Create upload directory if it doesn't exist
-    upload_dir = "static/uploads"
-    os.makedirs(upload_dir, exist_ok=True)
-    
-    # Generate unique filename
-    file_extension = os.path.splitext(file.filename)[1]
-    unique_filename = f"{uuid.uuid4()}{file_extension}"
-    file_path = os.path.join(upload_dir, unique_filename)
-    
+    # Stored by content hash, so the same image uploaded twice is kept once. The blob stays
+    # unreferenced until a SKU links to it; gc_uploads.py removes it if none ever does.
     try:
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-            
-        # Return the URL relative to the server root (assuming static files are served from /static)
-        # In production this might be an S3 URL
-        return {"url": f"http://localhost:8000/static/uploads/{unique_filename}"}
+        stored = await store_upload(file, IMAGE_UPLOAD_POLICY)
+        await register_blob(db, stored)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Could not upload file: {str(e)}")
 
+    # Thumbnail/web renditions are rendered after the response is sent and show up on the
+    # SKU as imageVariants once ready
+    background_tasks.add_task(build_image_variants, db, stored)
+
+    # In production this might be an S3 URL
+    return {"url": public_url(request, stored.url)}
+
+SKU_IMPORT_BATCH_SIZE = 1000
+SKU_IMPORT_MAX_REPORTED_ERRORS = 1000
+SKU_IMPORT_REQUIRED_COLUMNS = {"title", "price", "margin"}
+
+def _read_rows(reader: csv.DictReader, count: int) -> list:
+    return list(islice(reader, count))
+
+def _sku_from_row(row: dict) -> SKUCreate:
+    tags = [tag.strip() for tag in re.split(r"[;|,]", row.get("tags") or "") if tag.strip()]
+    return SKUCreate(
+        title=(row.get("title") or "").strip(),
+        price=row.get("price"),
+        margin=row.get("margin"),
+        tags=tags,
+        imageUrl=(row.get("imageUrl") or "").strip() or None,
+    )
+
+@router.post("/bulk", response_model=SKUImportResult)
+async def bulk_import_skus(
+    file: UploadFile = File(...),
+    current_user: User = Depends(get_current_user),
+    db: AsyncIOMotorDatabase = Depends(get_db)
+):
+    if current_user.role != "merchant":
+        raise HTTPException(status_code=403, detail="Only merchants can import SKUs")
+    if not (file.filename or "").lower().endswith(".csv") and file.content_type not in ("text/csv", "application/vnd.ms-excel"):
+        raise HTTPException(status_code=400, detail="Bulk import expects a CSV file")
+
+    # Rows are pulled off the spooled upload a batch at a time (in a worker thread, since the
+    # spool may be on disk) and written with one unordered insert_many per batch, so memory
+    # stays flat no matter how large the catalogue is.
+    reader = csv.DictReader(io.TextIOWrapper(file.file, encoding="utf-8-sig", newline=""))
+    try:
+        columns = set(await run_in_threadpool(lambda: reader.fieldnames) or [])
+    except (csv.Error, UnicodeDecodeError) as e:
+        raise HTTPException(status_code=400, detail=f"Could not read CSV header: {str(e)}")
+    missing = SKU_IMPORT_REQUIRED_COLUMNS - columns
+    if missing:
+        raise HTTPException(status_code=400, detail=f"CSV is missing columns: {', '.join(sorted(missing))}")
+
+    result = SKUImportResult(count=0)
+
+    def record_error(row_number: int, messages: List[str]):
+        result.error_count += 1
+        if len(result.errors) < SKU_IMPORT_MAX_REPORTED_ERRORS:
+            result.errors.append(SKUImportError(row=row_number, errors=messages))
+
+    row_number = 0
+    while True:
+        try:
+            rows = await run_in_threadpool(_read_rows, reader, SKU_IMPORT_BATCH_SIZE)
+        except (csv.Error, UnicodeDecodeError) as e:
+            record_error(row_number + 1, [f"Unreadable CSV, import stopped here: {str(e)}"])
+            break
+        if not rows:
+            break
+
+        batch, batch_rows = [], []
+        for row in rows:
+            row_number += 1
+            try:
+                batch.append(_sku_from_row(row))
+                batch_rows.append(row_number)
+            except ValidationError as e:
+                record_error(row_number, [f"{'.'.join(str(part) for part in err['loc'])}: {err['msg']}" for err in e.errors()])
+
+        inserted, failures = await insert_skus(db, batch, current_user.id)
+        result.count += inserted
+        for index, message in failures.items():
+            record_error(batch_rows[index], [message])
+
+    return result
+
 @router.post("/", response_model=SKU, response_model_by_alias=False)
 async def create_new_sku(
     sku: SKUCreate,
@@ -68,18 +154,16 @@ async def update_existing_sku(
     current_user: User = Depends(get_current_user),
     db: AsyncIOMotorDatabase = Depends(get_db)
 ):
-    sku = await get_sku_by_id(db, sku_id)
-    if not sku:
-        raise HTTPException(status_code=404, detail="SKU not found")
-        
-    if current_user.role != "merchant" or sku.merchant_id != current_user.id:
+    if current_user.role != "merchant":
+        raise HTTPException(status_code=403, detail="Not authorized to update this SKU")
+
+    sku = await update_sku(db, sku_id, sku_update.dict(exclude_unset=True), {"merchant_id": current_user.id})
+    if sku is None:
+        if await get_sku_by_id(db, sku_id) is None:
+            raise HTTPException(status_code=404, detail="SKU not found")
         raise HTTPException(status_code=403, detail="Not authorized to update this SKU")
-    
-    success = await update_sku(db, sku_id, sku_update.dict(exclude_unset=True))
-    if not success:
-        raise HTTPException(status_code=500, detail="Failed to update SKU")
         
-    return await get_sku_by_id(db, sku_id)
+    return sku
 
 @router.delete("/{sku_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_existing_sku(
@@ -1,35 +1,85 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Response, Request
 from motor.motor_asyncio import AsyncIOMotorDatabase
+from fastapi.encoders import jsonable_encoder
 from typing import List, Optional
+import json
 
 from ..database import get_db
+from ..pagination import PageParams, page_params, set_next_cursor, check_cursor_sort, NEXT_CURSOR_HEADER
+from ..response_cache import slot_cache
+from ..streaming import wants_ndjson, ndjson_response
+from ..fields import fields_param, is_sparse
 from ..auth import get_current_user
-from ..models import Slot, SlotCreate, User
-from ..repository import create_slot, get_slots_by_project, get_all_slots, get_project_by_id, update_slot, delete_slot, get_slot_by_id
+from ..models import Slot, SlotCreate, User, SlotSearch, SlotSort, SlotModality, SlotStatus, SlotVisibility
+from ..repository import create_slot, create_slots, get_project_by_id, update_slot, delete_slot, get_slot_by_id, search_slots, iter_search_slots
 
 router = APIRouter()
 
+def slot_search_params(
+    project_id: Optional[str] = Query(None),
+    modality: Optional[SlotModality] = Query(None),
+    status: Optional[SlotStatus] = Query(None),
+    visibility: Optional[SlotVisibility] = Query(None),
+    min_price: Optional[float] = Query(None, ge=0, description="Minimum pricing floor"),
+    max_price: Optional[float] = Query(None, ge=0, description="Maximum pricing floor"),
+    age_min: Optional[int] = Query(None, ge=0, description="Audience age range start; matches overlapping projects"),
+    age_max: Optional[int] = Query(None, ge=0, description="Audience age range end; matches overlapping projects"),
+    gender: Optional[str] = Query(None, description="Project audience gender"),
+    production_window: Optional[str] = Query(None, description="Project production window")
+) -> SlotSearch:
+    return SlotSearch(
+        project_id=project_id, modality=modality, status=status, visibility=visibility,
+        min_price=min_price, max_price=max_price, age_min=age_min, age_max=age_max,
+        gender=gender, production_window=production_window
+    )
+
 @router.get("/", response_model=List[Slot], response_model_by_alias=False)
 async def read_slots(
-    project_id: Optional[str] = Query(None),
+    request: Request,
+    response: Response,
+    search: SlotSearch = Depends(slot_search_params),
+    sort: Optional[SlotSort] = Query(None, description="recent, price_asc or price_desc; defaults to insertion order"),
+    page: PageParams = Depends(page_params),
+    projection: Optional[dict] = Depends(fields_param(Slot)),
     db: AsyncIOMotorDatabase = Depends(get_db)
 ):
-    if project_id:
-        return await get_slots_by_project(db, project_id)
-    
-    # Discovery mode: Return all slots (filtering can be added later)
-    # For S2/S4, we just need to list them.
-    return await get_all_slots(db)
+    # Discovery: filtering and sorting run in Mongo against the slot discovery indexes
+    sort_field = "pricing_floor" if sort in (SlotSort.PRICE_ASC, SlotSort.PRICE_DESC) else None
+    sort_name = sort.value if sort else None
+    check_cursor_sort(page, sort_name, sort_field)
+
+    if wants_ndjson(request):
+        return ndjson_response(iter_search_slots(db, search, sort, page.stream_limit, page.after, projection))
+
+    # Public and identical for every caller, so the serialized body is cached and served with an ETag
+    cache_key = slot_cache.key_for(
+        request, search=search.dict(exclude_none=True), sort=sort_name, limit=page.limit, after=page.after, fields=projection,
+    )
+    cached = slot_cache.get(cache_key)
+    if cached is None:
+        generation = slot_cache.generation
+        slots = await search_slots(db, search, sort, page.limit, page.after, projection)
+        set_next_cursor(response, slots, page, sort_field, sort_name)
+        body = json.dumps(jsonable_encoder(slots, by_alias=False, exclude_unset=is_sparse(projection))).encode()
+        headers = {NEXT_CURSOR_HEADER: response.headers[NEXT_CURSOR_HEADER]} if NEXT_CURSOR_HEADER in response.headers else {}
+        cached = slot_cache.set(cache_key, body, headers, generation)
+    return slot_cache.respond(request, cached)
 
 @router.get("/{slot_id}", response_model=Slot, response_model_by_alias=False)
 async def read_slot(
     slot_id: str,
+    request: Request,
     db: AsyncIOMotorDatabase = Depends(get_db)
 ):
-    slot = await get_slot_by_id(db, slot_id)
-    if not slot:
-        raise HTTPException(status_code=404, detail="Slot not found")
-    return slot
+    cache_key = slot_cache.key_for(request)
+    cached = slot_cache.get(cache_key)
+    if cached is None:
+        generation = slot_cache.generation
+        slot = await get_slot_by_id(db, slot_id)
+        if not slot:
+            raise HTTPException(status_code=404, detail="Slot not found")
+        cached = slot_cache.set(cache_key, json.dumps(jsonable_encoder(slot, by_alias=False)).encode(), generation=generation)
+    return slot_cache.respond(request, cached)
 
 @router.post("/", response_model=Slot, response_model_by_alias=False)
 async def create_new_slot(
@@ -48,7 +98,32 @@ async def create_new_slot(
     if project.creator_id != current_user.id:
          raise HTTPException(status_code=403, detail="Not authorized to add slots to this project")
 
-    return await create_slot(db, slot, current_user.id, project_id)
+    return await create_slot(db, slot, current_user.id, project)
+
+MAX_SLOT_BATCH_SIZE = 500
+
+@router.post("/batch", response_model=List[Slot], response_model_by_alias=False)
+async def create_slot_batch(
+    slots: List[SlotCreate],
+    project_id: str = Query(..., description="The ID of the project to add these slots to"),
+    current_user: User = Depends(get_current_user),
+    db: AsyncIOMotorDatabase = Depends(get_db)
+):
+    if current_user.role != "creator":
+        raise HTTPException(status_code=403, detail="Only creators can create slots")
+    if not slots:
+        raise HTTPException(status_code=400, detail="No slots provided")
+    if len(slots) > MAX_SLOT_BATCH_SIZE:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_SLOT_BATCH_SIZE} slots can be created per request")
+
+    # Ownership is checked once for the whole batch
+    project = await get_project_by_id(db, project_id)
+    if not project:
+         raise HTTPException(status_code=404, detail="Project not found")
+    if project.creator_id != current_user.id:
+         raise HTTPException(status_code=403, detail="Not authorized to add slots to this project")
+
+    return await create_slots(db, slots, current_user.id, project)
 
 @router.put("/{slot_id}", response_model=Slot, response_model_by_alias=False)
 async def update_existing_slot(
@@ -57,18 +132,16 @@ async def update_existing_slot(
     current_user: User = Depends(get_current_user),
     db: AsyncIOMotorDatabase = Depends(get_db)
 ):
-    slot = await get_slot_by_id(db, slot_id)
-    if not slot:
-        raise HTTPException(status_code=404, detail="Slot not found")
-        
-    if current_user.role != "creator" or slot.creator_id != current_user.id:
+    if current_user.role != "creator":
+        raise HTTPException(status_code=403, detail="Not authorized to update this slot")
+
+    slot = await update_slot(db, slot_id, slot_update.dict(exclude_unset=True), {"creator_id": current_user.id})
+    if slot is None:
+        if await get_slot_by_id(db, slot_id) is None:
+            raise HTTPException(status_code=404, detail="Slot not found")
         raise HTTPException(status_code=403, detail="Not authorized to update this slot")
-    
-    success = await update_slot(db, slot_id, slot_update.dict(exclude_unset=True))
-    if not success:
-        raise HTTPException(status_code=500, detail="Failed to update slot")
         
-    return await get_slot_by_id(db, slot_id)
+    return slot
 
 @router.delete("/{slot_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_existing_slot(
@@ -0,0 +1,47 @@
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from datetime import datetime
+from typing import Optional
+import logging
+import os
+
+from .models import ScriptIndex
+from .uploads import atomic_write, variant_path
+from .repository import set_project_script_index
+from .workers import run_in_worker
+
+logger = logging.getLogger(__name__)
+
+def page_path(path: str, number: int) -> str:
+    """Single-page PDF for page `number` (1-based), stored next to the script as <sha256>@page-0001.pdf."""
+    return variant_path(path, f"page-{number:04d}", ".pdf")
+
+def split_pages(path: str) -> dict:
+    """Write every missing single-page PDF of the script at path; runs in a worker process."""
+    from pypdf import PdfReader, PdfWriter
+
+    reader = PdfReader(path)
+    if reader.is_encrypted:
+        # Password-less encryption (permissions only) still opens with an empty password
+        reader.decrypt("")
+    page_sizes = []
+    for number, page in enumerate(reader.pages, start=1):
+        target = page_path(path, number)
+        if not os.path.exists(target):
+            writer = PdfWriter()
+            writer.add_page(page)
+            with atomic_write(target) as handle:
+                writer.write(handle)
+        page_sizes.append(os.path.getsize(target))
+    return {"page_count": len(page_sizes), "page_sizes": page_sizes}
+
+async def index_project_script(db: AsyncIOMotorDatabase, project_id: str, path: str) -> Optional[ScriptIndex]:
+    """Background task: split a project's script into pages and record the index on the project."""
+    try:
+        result = await run_in_worker(split_pages, path)
+    except Exception as e:
+        # The whole script stays available; only per-page delivery is missing
+        logger.warning("Could not index script %s for project %s: %s", path, project_id, e)
+        return None
+    index = ScriptIndex(**result, indexed_date=datetime.utcnow().isoformat())
+    await set_project_script_index(db, project_id, index)
+    return index
@@ -0,0 +1,35 @@
+from fastapi import Request
+from fastapi.responses import StreamingResponse
+from typing import AsyncIterator
+import json
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+# Flush once this many bytes are buffered, so we neither hold the whole result nor send one frame per row
+STREAM_CHUNK_SIZE = 64 * 1024
+
+def wants_ndjson(request: Request) -> bool:
+    return NDJSON_MEDIA_TYPE in request.headers.get("accept", "")
+
+async def _ndjson_chunks(docs: AsyncIterator[dict]):
+    buffer = []
+    size = 0
+    async for doc in docs:
+        # Match the list endpoints' response_model_by_alias=False output
+        doc["id"] = doc.pop("_id")
+        line = json.dumps(doc, default=str) + "\n"
+        buffer.append(line)
+        size += len(line)
+        if size >= STREAM_CHUNK_SIZE:
+            yield "".join(buffer)
+            buffer = []
+            size = 0
+    if buffer:
+        yield "".join(buffer)
+
+def ndjson_response(docs: AsyncIterator[dict]) -> StreamingResponse:
+    """Stream repository documents as newline-delimited JSON, one object per line.
+
+    Pagination cursors are not emitted in this mode since headers are sent before the last row is known.
+    """
+    return StreamingResponse(_ndjson_chunks(docs), media_type=NDJSON_MEDIA_TYPE)
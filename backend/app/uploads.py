@@ -0,0 +1,225 @@
+from fastapi import HTTPException, Request, UploadFile
+from fastapi.concurrency import run_in_threadpool
+from fastapi.staticfiles import StaticFiles
+from contextlib import contextmanager
+from pydantic import BaseModel
+from typing import BinaryIO, Iterator, Optional, Tuple
+import glob
+import hashlib
+import json
+import os
+import re
+import tempfile
+
+UPLOAD_DIR = os.getenv("UPLOAD_DIR", "static/uploads")
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+# Content-addressed store: every upload lives at blobs/<aa>/<bb>/<sha256><ext>, so identical
+# files share one copy and a blob URL never changes meaning. Mounted separately with a
+# far-future Cache-Control (see main.py).
+BLOB_DIR = os.path.join(UPLOAD_DIR, "blobs")
+BLOB_URL_PREFIX = "/static/uploads/blobs"
+BLOB_CACHE_CONTROL = "public, max-age=31536000, immutable"
+# Derived files sit next to their original as <sha256>@<variant><ext> (image renditions are .webp)
+VARIANT_EXTENSION = ".webp"
+# Absolute URLs handed to clients; falls back to the request's own base URL
+PUBLIC_BASE_URL = os.getenv("PUBLIC_BASE_URL", "").rstrip("/")
+_BLOB_URL_PATTERN = re.compile(r"/blobs/[0-9a-f]{2}/[0-9a-f]{2}/([0-9a-f]{64})(\.[a-z0-9]+)(?:[?#]|$)")
+
+MAX_SCRIPT_UPLOAD_BYTES = int(os.getenv("MAX_SCRIPT_UPLOAD_MB", "100")) * 1024 * 1024
+MAX_IMAGE_UPLOAD_BYTES = int(os.getenv("MAX_IMAGE_UPLOAD_MB", "10")) * 1024 * 1024
+# Whole multipart request cap, checked from Content-Length before the body is read
+MAX_REQUEST_BYTES = MAX_SCRIPT_UPLOAD_BYTES + 1024 * 1024
+
+class UploadPolicy(BaseModel):
+    max_bytes: int
+    content_types: Tuple[str, ...]
+    extensions: Tuple[str, ...]
+    # Leading bytes the file must start with, if any
+    signature: Optional[bytes] = None
+
+SCRIPT_UPLOAD_POLICY = UploadPolicy(
+    max_bytes=MAX_SCRIPT_UPLOAD_BYTES,
+    content_types=("application/pdf",),
+    extensions=(".pdf",),
+    signature=b"%PDF-",
+)
+
+IMAGE_UPLOAD_POLICY = UploadPolicy(
+    max_bytes=MAX_IMAGE_UPLOAD_BYTES,
+    content_types=("image/png", "image/jpeg", "image/gif", "image/webp", "image/svg+xml"),
+    extensions=(".png", ".jpg", ".jpeg", ".gif", ".webp", ".svg"),
+)
+
+class StoredUpload(BaseModel):
+    path: str
+    url: str
+    size: int
+    sha256: str
+    content_type: Optional[str] = None
+    # False when identical content was already stored and the upload was discarded
+    created: bool = True
+
+def blob_relpath(sha256: str, extension: str) -> str:
+    return f"{sha256[:2]}/{sha256[2:4]}/{sha256}{extension}"
+
+def variant_path(path: str, variant: str, extension: str = VARIANT_EXTENSION) -> str:
+    return f"{os.path.splitext(path)[0]}@{variant}{extension}"
+
+def variant_url(url: str, variant: str) -> str:
+    return variant_path(url, variant)
+
+def public_url(request: Request, path: str) -> str:
+    return (PUBLIC_BASE_URL or str(request.base_url).rstrip("/")) + path
+
+def blob_id_from_url(url: Optional[str]) -> Optional[str]:
+    """Return the sha256 of a blob URL (absolute or relative), or None for anything else."""
+    match = _BLOB_URL_PATTERN.search(url or "")
+    return match.group(1) if match else None
+
+def local_path(link: Optional[str]) -> Optional[str]:
+    """Map a stored link (blob URL, or a pre-blob path under UPLOAD_DIR) to its file on disk."""
+    match = _BLOB_URL_PATTERN.search(link or "")
+    if match:
+        return os.path.join(BLOB_DIR, blob_relpath(match.group(1), match.group(2)))
+    if link and os.path.realpath(link).startswith(os.path.realpath(UPLOAD_DIR) + os.sep):
+        return link
+    return None
+
+def _check_policy(file: UploadFile, policy: UploadPolicy):
+    extension = os.path.splitext(file.filename or "")[1].lower()
+    # Some clients send a generic type; the extension (and signature, where set) still has to match
+    declared_type = file.content_type or "application/octet-stream"
+    if extension not in policy.extensions or declared_type not in policy.content_types + ("application/octet-stream",):
+        raise HTTPException(status_code=415, detail=f"Unsupported file type; expected one of {', '.join(policy.extensions)}")
+    if file.size is not None and file.size > policy.max_bytes:
+        raise HTTPException(status_code=413, detail=f"File exceeds the {policy.max_bytes // (1024 * 1024)} MB limit")
+
+def _write_chunk(handle, hasher, chunk: bytes):
+    hasher.update(chunk)
+    handle.write(chunk)
+
+def _publish(temp_path: str, final_path: str) -> bool:
+    """Move a finished temp file to its content address; returns False if it was already there."""
+    if os.path.exists(final_path):
+        os.remove(temp_path)
+        return False
+    os.makedirs(os.path.dirname(final_path), exist_ok=True)
+    # mkstemp creates owner-only files; uploads are served by the static mount
+    os.chmod(temp_path, 0o644)
+    os.replace(temp_path, final_path)
+    return True
+
+@contextmanager
+def atomic_write(path: str, prefix: str = ".upload-") -> Iterator[BinaryIO]:
+    """Open a temp file next to path for writing and move it into place once the block succeeds.
+
+    Readers see either no file or the complete one; on error the temp file is removed. Temp
+    files left by a crash carry `prefix`, which gc_uploads.py sweeps.
+    """
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=prefix)
+    try:
+        with os.fdopen(fd, "wb") as handle:
+            yield handle
+        # mkstemp creates owner-only files; uploads are served by the static mount
+        os.chmod(temp_path, 0o644)
+        os.replace(temp_path, path)
+    except BaseException:
+        _discard(temp_path)
+        raise
+
+def _discard(path: str):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+async def store_upload(file: UploadFile, policy: UploadPolicy, directory: str = BLOB_DIR) -> StoredUpload:
+    """Stream an upload into the content-addressed store without blocking the event loop.
+
+    Type and size are checked before any bytes are copied, the size again while streaming.
+    Chunks are hashed and written on a worker thread into a temp file, which is renamed to
+    its hash-derived path only once complete, so readers never see a partial file. Content
+    that is already stored is not written again.
+    """
+    _check_policy(file, policy)
+    await run_in_threadpool(os.makedirs, directory, exist_ok=True)
+
+    extension = os.path.splitext(file.filename or "")[1].lower()
+    fd, temp_path = await run_in_threadpool(tempfile.mkstemp, dir=directory, prefix=".upload-")
+    handle = os.fdopen(fd, "wb")
+    hasher = hashlib.sha256()
+    size = 0
+    try:
+        while True:
+            chunk = await file.read(UPLOAD_CHUNK_SIZE)
+            if not chunk:
+                break
+            if size == 0 and policy.signature and not chunk.startswith(policy.signature):
+                raise HTTPException(status_code=415, detail="File content does not match its type")
+            size += len(chunk)
+            if size > policy.max_bytes:
+                raise HTTPException(status_code=413, detail=f"File exceeds the {policy.max_bytes // (1024 * 1024)} MB limit")
+            await run_in_threadpool(_write_chunk, handle, hasher, chunk)
+        if size == 0:
+            raise HTTPException(status_code=400, detail="Uploaded file is empty")
+        await run_in_threadpool(handle.close)
+        relpath = blob_relpath(hasher.hexdigest(), extension)
+        final_path = os.path.join(directory, relpath)
+        created = await run_in_threadpool(_publish, temp_path, final_path)
+    except BaseException:
+        handle.close()
+        await run_in_threadpool(_discard, temp_path)
+        raise
+
+    return StoredUpload(
+        path=final_path,
+        url=f"{BLOB_URL_PREFIX}/{relpath}",
+        size=size,
+        sha256=hasher.hexdigest(),
+        content_type=file.content_type,
+        created=created,
+    )
+
+def remove_blob_file(path: str):
+    """Delete a stored blob, its derived variants and any shard directories it leaves empty."""
+    _discard(path)
+    for derived in glob.glob(glob.escape(os.path.splitext(path)[0]) + "@*"):
+        _discard(derived)
+    for directory in (os.path.dirname(path), os.path.dirname(os.path.dirname(path))):
+        try:
+            os.rmdir(directory)
+        except OSError:
+            break
+
+class ImmutableStaticFiles(StaticFiles):
+    """StaticFiles for content-addressed blobs: a URL's bytes never change, so caches may keep them forever."""
+
+    def file_response(self, *args, **kwargs):
+        response = super().file_response(*args, **kwargs)
+        response.headers["Cache-Control"] = BLOB_CACHE_CONTROL
+        return response
+
+class UploadSizeLimitMiddleware:
+    """Reject oversized multipart requests from their Content-Length before the body is read."""
+
+    def __init__(self, app, max_bytes: int = MAX_REQUEST_BYTES):
+        self.app = app
+        self.max_bytes = max_bytes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http":
+            headers = dict(scope.get("headers") or [])
+            content_type = headers.get(b"content-type", b"")
+            content_length = headers.get(b"content-length")
+            if content_type.startswith(b"multipart/form-data") and content_length and content_length.isdigit() \
+                    and int(content_length) > self.max_bytes:
+                body = json.dumps({"detail": "Upload too large"}).encode()
+                await send({
+                    "type": "http.response.start",
+                    "status": 413,
+                    "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+                })
+                await send({"type": "http.response.body", "body": body})
+                return
+        await self.app(scope, receive, send)
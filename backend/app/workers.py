@@ -0,0 +1,27 @@
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+import asyncio
+import multiprocessing
+import os
+
+WORKER_PROCESSES = int(os.getenv("WORKER_PROCESSES", "2"))
+
+# CPU-bound file processing (image renditions, PDF pages) holds the GIL, so it runs in separate
+# processes. Spawned rather than forked so workers do not inherit the server's event loop and
+# driver threads; created on first use so importing the app never starts processes.
+_worker_pool: Optional[ProcessPoolExecutor] = None
+
+def _get_worker_pool() -> ProcessPoolExecutor:
+    global _worker_pool
+    if _worker_pool is None:
+        _worker_pool = ProcessPoolExecutor(max_workers=WORKER_PROCESSES, mp_context=multiprocessing.get_context("spawn"))
+    return _worker_pool
+
+async def run_in_worker(fn, *args):
+    """Run a module-level function in the worker pool; arguments and result must be picklable."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_worker_pool(), fn, *args)
+
+def shutdown_worker_pool():
+    if _worker_pool is not None:
+        _worker_pool.shutdown(wait=False, cancel_futures=True)
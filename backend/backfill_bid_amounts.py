@@ -0,0 +1,58 @@
+import asyncio
+import os
+import sys
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import UpdateOne
+
+from app.repository import parse_amount_terms
+
+load_dotenv()
+
+MONGODB_URI = os.getenv("MONGODB_URI")
+if not MONGODB_URI:
+    print("MONGODB_URI not found in .env")
+    exit(1)
+
+BATCH_SIZE = 500
+
+async def backfill_bid_amounts(recompute: bool):
+    client = AsyncIOMotorClient(MONGODB_URI)
+    db = client.get_database("backdrop_db")
+
+    # Only bids written before amounts were parsed at write time, or with --recompute every bid
+    # (amounts once accepted from clients, or parsed by an older parse_amount_terms)
+    cursor = db["bids"].find(
+        {} if recompute else {"amount": {"$exists": False}},
+        {"amount_terms": 1, "pricing_model": 1}
+    )
+
+    updated = 0
+    unparsable = []
+    batch = []
+    async for doc in cursor:
+        try:
+            parsed = parse_amount_terms(doc.get("amount_terms", ""), doc.get("pricing_model", "Fixed"))
+        except ValueError as e:
+            unparsable.append((doc["_id"], str(e)))
+            continue
+        batch.append(UpdateOne({"_id": doc["_id"]}, {"$set": parsed}))
+        if len(batch) >= BATCH_SIZE:
+            result = await db["bids"].bulk_write(batch, ordered=False)
+            updated += result.modified_count
+            batch = []
+
+    if batch:
+        result = await db["bids"].bulk_write(batch, ordered=False)
+        updated += result.modified_count
+
+    print(f"Backfilled amount on {updated} bids.")
+    if unparsable:
+        print(f"{len(unparsable)} bids could not be parsed and were left untouched:")
+        for bid_id, reason in unparsable:
+            print(f"  {bid_id}: {reason}")
+
+if __name__ == "__main__":
+    # Usage: python backfill_bid_amounts.py [--recompute]
+    # Run rebuild_financials.py afterwards if amounts changed
+    asyncio.run(backfill_bid_amounts("--recompute" in sys.argv[1:]))
@@ -0,0 +1,30 @@
+import asyncio
+import os
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from app.models import BidStatus
+
+load_dotenv()
+
+MONGODB_URI = os.getenv("MONGODB_URI")
+if not MONGODB_URI:
+    print("MONGODB_URI not found in .env")
+    exit(1)
+
+async def backfill_bid_status():
+    client = AsyncIOMotorClient(MONGODB_URI)
+    db = client.get_database("backdrop_db")
+
+    # Bids created before create_bid stored these fields relied on the model defaults
+    status = await db["bids"].update_many({"status": None}, {"$set": {"status": BidStatus.PENDING.value}})
+    approvals = 0
+    for field in ("creator_final_approval", "buyer_final_approval"):
+        result = await db["bids"].update_many({field: None}, {"$set": {field: False}})
+        approvals += result.modified_count
+
+    print(f"Set status on {status.modified_count} bids and {approvals} missing approval flags.")
+
+if __name__ == "__main__":
+    # Usage: python backfill_bid_status.py
+    asyncio.run(backfill_bid_status())
@@ -0,0 +1,40 @@
+import asyncio
+import os
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import UpdateMany
+
+from app.repository import SLOT_PROJECT_FIELDS
+
+load_dotenv()
+
+MONGODB_URI = os.getenv("MONGODB_URI")
+if not MONGODB_URI:
+    print("MONGODB_URI not found in .env")
+    exit(1)
+
+BATCH_SIZE = 500
+
+async def backfill_slot_audience():
+    client = AsyncIOMotorClient(MONGODB_URI)
+    db = client.get_database("backdrop_db")
+
+    # Copy every project's audience and schedule onto its slots; safe to run repeatedly
+    projection = {field: 1 for field in SLOT_PROJECT_FIELDS}
+    requests, projects, updated = [], 0, 0
+    async for project in db["projects"].find({}, projection):
+        fields = {field: project.get(field) for field in SLOT_PROJECT_FIELDS}
+        requests.append(UpdateMany({"project_id": str(project["_id"])}, {"$set": fields}))
+        projects += 1
+        if len(requests) >= BATCH_SIZE:
+            updated += (await db["slots"].bulk_write(requests, ordered=False)).modified_count
+            requests = []
+    if requests:
+        updated += (await db["slots"].bulk_write(requests, ordered=False)).modified_count
+
+    print(f"Copied audience fields from {projects} project(s); updated {updated} slot(s).")
+
+if __name__ == "__main__":
+    # Usage: python backfill_slot_audience.py
+    # Run once after deploying slot-level discovery filters; until then audience filters miss older slots
+    asyncio.run(backfill_slot_audience())
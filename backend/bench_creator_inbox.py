@@ -0,0 +1,111 @@
+import asyncio
+import os
+import time
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+from datetime import datetime
+
+from app.repository import get_projects_by_creator, get_slots_by_project, get_bids_by_slot, get_bids_by_creator
+
+load_dotenv()
+
+MONGODB_URI = os.getenv("MONGODB_URI")
+if not MONGODB_URI:
+    print("MONGODB_URI not found in .env")
+    exit(1)
+
+# Runs against a throwaway database so the real backdrop_db is never touched
+BENCH_DB = "backdrop_bench"
+CREATOR_ID = "bench-creator"
+SLOT_COUNTS = [10, 50, 200, 500]
+BIDS_PER_SLOT = 3
+ROUNDS = 5
+
+async def seed(db, slot_count):
+    await db["projects"].delete_many({})
+    await db["slots"].delete_many({})
+    await db["bids"].delete_many({})
+
+    now = datetime.utcnow().isoformat()
+    projects = [
+        {
+            "title": f"Bench Script {i}",
+            "budget_target": 100000,
+            "production_window": "Q1",
+            "demographics": {"ageStart": 18, "ageEnd": 35, "gender": "Any"},
+            "creator_id": CREATOR_ID,
+            "created_date": now,
+            "last_modified_date": now,
+        }
+        for i in range(max(1, slot_count // 10))
+    ]
+    project_ids = [str(pid) for pid in (await db["projects"].insert_many(projects)).inserted_ids]
+
+    slots = [
+        {
+            "scene_ref": f"Scene {i}",
+            "pricing_floor": 1000,
+            "modality": "Private Auction",
+            "status": "Available",
+            "visibility": "Public",
+            "project_id": project_ids[i % len(project_ids)],
+            "creator_id": CREATOR_ID,
+            "created_date": now,
+            "last_modified_date": now,
+        }
+        for i in range(slot_count)
+    ]
+    slot_ids = [str(sid) for sid in (await db["slots"].insert_many(slots)).inserted_ids]
+
+    bids = [
+        {
+            "slot_id": slot_id,
+            "objective": "Reach",
+            "pricing_model": "Fixed",
+            "amount_terms": "$5000",
+            "flight_window": "Q2",
+            "counterparty_id": "bench-buyer",
+            "status": "Pending",
+            "created_date": now,
+            "last_modified_date": now,
+        }
+        for slot_id in slot_ids
+        for _ in range(BIDS_PER_SLOT)
+    ]
+    await db["bids"].insert_many(bids)
+    await db["bids"].create_index("slot_id")
+
+async def nested_loop(db):
+    all_bids = []
+    for project in await get_projects_by_creator(db, CREATOR_ID):
+        for slot in await get_slots_by_project(db, project.id):
+            all_bids.extend(await get_bids_by_slot(db, slot.id))
+    return all_bids
+
+async def timed(fn, db):
+    best = None
+    count = 0
+    for _ in range(ROUNDS):
+        start = time.perf_counter()
+        count = len(await fn(db))
+        elapsed = (time.perf_counter() - start) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return best, count
+
+async def run_benchmark():
+    client = AsyncIOMotorClient(MONGODB_URI)
+    db = client.get_database(BENCH_DB)
+
+    print(f"{'slots':>6} {'bids':>6} {'nested loop (ms)':>18} {'aggregation (ms)':>18}")
+    for slot_count in SLOT_COUNTS:
+        await seed(db, slot_count)
+        loop_ms, loop_count = await timed(nested_loop, db)
+        agg_ms, agg_count = await timed(lambda d: get_bids_by_creator(d, CREATOR_ID), db)
+        if loop_count != agg_count:
+            print(f"Result mismatch: nested loop returned {loop_count}, aggregation returned {agg_count}")
+        print(f"{slot_count:>6} {agg_count:>6} {loop_ms:>18.1f} {agg_ms:>18.1f}")
+
+    await client.drop_database(BENCH_DB)
+
+if __name__ == "__main__":
+    asyncio.run(run_benchmark())
@@ -0,0 +1,160 @@
+import asyncio
+import os
+import tempfile
+import time
+import tracemalloc
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+from datetime import datetime
+
+load_dotenv()
+
+# Memos render into a scratch directory, not the server's cache
+os.environ.setdefault("DEAL_MEMO_CACHE_DIR", tempfile.mkdtemp(prefix="bench-memos-"))
+
+from app.repository import get_bid_by_id, get_slot_by_id, get_project_by_id, get_user_by_id, get_comments_by_bid, iter_bid_batches
+from app.evidence import EvidenceDeal, evidence_pack, resolve_deals, stream_evidence_zip
+from app.workers import shutdown_worker_pool
+
+MONGODB_URI = os.getenv("MONGODB_URI")
+if not MONGODB_URI:
+    print("MONGODB_URI not found in .env")
+    exit(1)
+
+# Runs against a throwaway database so the real backdrop_db is never touched
+BENCH_DB = "backdrop_bench"
+DEAL_COUNTS = [100, 500, 2000]
+SLOTS_PER_PROJECT = 10
+USERS = 50
+COMMENTS_PER_DEAL = 5
+
+async def seed(db, deal_count):
+    for collection in ("users", "projects", "slots", "bids", "comments"):
+        await db[collection].delete_many({})
+
+    now = datetime.utcnow().isoformat()
+    users = [
+        {"email": f"bench{i}@example.com", "name": f"Bench User {i}", "role": "creator" if i % 2 else "advertiser", "hashed_password": "x"}
+        for i in range(USERS)
+    ]
+    user_ids = [str(uid) for uid in (await db["users"].insert_many(users)).inserted_ids]
+    creators, buyers = user_ids[1::2], user_ids[0::2]
+
+    projects = [
+        {
+            "title": f"Bench Script {i}",
+            "budget_target": 100000,
+            "production_window": "Q1",
+            "demographics": {"ageStart": 18, "ageEnd": 35, "gender": "Any"},
+            "creator_id": creators[i % len(creators)],
+            "created_date": now,
+            "last_modified_date": now,
+        }
+        for i in range(max(1, deal_count // SLOTS_PER_PROJECT))
+    ]
+    project_ids = [str(pid) for pid in (await db["projects"].insert_many(projects)).inserted_ids]
+
+    slots = [
+        {
+            "scene_ref": f"Scene {i}",
+            "pricing_floor": 1000,
+            "modality": "Private Auction",
+            "status": "Reserved",
+            "visibility": "Public",
+            "project_id": project_ids[i % len(project_ids)],
+            "creator_id": projects[i % len(project_ids)]["creator_id"],
+            "created_date": now,
+            "last_modified_date": now,
+        }
+        for i in range(deal_count)
+    ]
+    slot_ids = [str(sid) for sid in (await db["slots"].insert_many(slots)).inserted_ids]
+
+    bids = [
+        {
+            "slot_id": slot_id,
+            "objective": "Reach",
+            "pricing_model": "Fixed",
+            "amount_terms": "$5000",
+            "amount": 5000.0,
+            "currency": "USD",
+            "flight_window": "Q2",
+            "counterparty_id": buyers[i % len(buyers)],
+            "status": "Committed",
+            "created_date": now,
+            "last_modified_date": now,
+        }
+        for i, slot_id in enumerate(slot_ids)
+    ]
+    bid_ids = [str(bid_id) for bid_id in (await db["bids"].insert_many(bids)).inserted_ids]
+
+    comments = [
+        {"bid_id": bid_id, "author_id": buyers[0], "text": f"Negotiation note {n}", "timestamp": now}
+        for bid_id in bid_ids
+        for n in range(COMMENTS_PER_DEAL)
+    ]
+    await db["comments"].insert_many(comments)
+    await db["comments"].create_index([("bid_id", 1), ("_id", 1)])
+
+async def per_deal_lookups(db):
+    # What a loop over the single-deal endpoint costs: sequential lookups for every deal
+    packs = 0
+    async for bids in iter_bid_batches(db, {}, 200):
+        for listed in bids:
+            bid = await get_bid_by_id(db, listed.id)
+            slot = await get_slot_by_id(db, bid.slot_id)
+            project = await get_project_by_id(db, slot.project_id) if slot else None
+            creator = await get_user_by_id(db, slot.creator_id) if slot else None
+            buyer = await get_user_by_id(db, bid.counterparty_id)
+            comments = await get_comments_by_bid(db, bid.id)
+            evidence_pack(EvidenceDeal(bid, slot, project, creator, buyer, comments))
+            packs += 1
+    return packs
+
+async def batched_lookups(db):
+    packs = 0
+    async for bids in iter_bid_batches(db, {}, 200):
+        for deal in await resolve_deals(db, bids):
+            evidence_pack(deal)
+            packs += 1
+    return packs
+
+async def zip_export(db, include_memos):
+    size = 0
+    async for chunk in stream_evidence_zip(db, {}, include_memos):
+        size += len(chunk)
+    return size
+
+async def timed(coro_fn):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = await coro_fn()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak / (1024 * 1024), result
+
+async def run_benchmark():
+    client = AsyncIOMotorClient(MONGODB_URI)
+    db = client.get_database(BENCH_DB)
+
+    print(f"{'deals':>6} {'mode':>22} {'time (s)':>9} {'deals/s':>9} {'peak MB':>8} {'zip MB':>7}")
+    for deal_count in DEAL_COUNTS:
+        await seed(db, deal_count)
+        modes = [
+            ("per-deal lookups", lambda: per_deal_lookups(db)),
+            ("batched lookups", lambda: batched_lookups(db)),
+            ("zip, json only", lambda: zip_export(db, False)),
+            ("zip + memos (cold)", lambda: zip_export(db, True)),
+            ("zip + memos (cached)", lambda: zip_export(db, True)),
+        ]
+        for mode, run in modes:
+            elapsed, peak_mb, result = await timed(run)
+            zip_mb = f"{result / (1024 * 1024):.1f}" if mode.startswith("zip") else "-"
+            print(f"{deal_count:>6} {mode:>22} {elapsed:>9.2f} {deal_count / elapsed:>9.0f} {peak_mb:>8.1f} {zip_mb:>7}")
+
+    await client.drop_database(BENCH_DB)
+    shutdown_worker_pool()
+
+if __name__ == "__main__":
+    asyncio.run(run_benchmark())
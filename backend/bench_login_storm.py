@@ -0,0 +1,54 @@
+import asyncio
+import statistics
+import time
+
+from app.repository import get_password_hash, verify_password, verify_password_async, PASSWORD_HASH_WORKERS
+
+# Simulates a burst of logins while an unrelated endpoint keeps getting requests.
+# The probe stands in for that endpoint: it measures how late the event loop lets it run.
+# Needs no database, only the app's bcrypt settings.
+LOGINS = 40
+PROBE_INTERVAL = 0.005
+
+async def probe(latencies, stop):
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(PROBE_INTERVAL)
+        latencies.append((time.perf_counter() - start - PROBE_INTERVAL) * 1000)
+
+async def inline_login(password, hashed):
+    # What login did before: bcrypt directly on the event loop
+    return verify_password(password, hashed)
+
+async def storm(login, password, hashed):
+    latencies = []
+    stop = asyncio.Event()
+    probe_task = asyncio.create_task(probe(latencies, stop))
+    await asyncio.sleep(0.05)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(login(password, hashed) for _ in range(LOGINS)))
+    elapsed = time.perf_counter() - start
+
+    stop.set()
+    await probe_task
+    return elapsed, latencies
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+async def run_benchmark():
+    password = "correct horse battery staple"
+    hashed = get_password_hash(password)
+
+    print(f"{LOGINS} concurrent logins, {PASSWORD_HASH_WORKERS} hashing workers")
+    print(f"{'mode':>10} {'storm (s)':>10} {'probe p50 (ms)':>15} {'probe p99 (ms)':>15} {'probe max (ms)':>15}")
+    for mode, login in [("inline", inline_login), ("executor", verify_password_async)]:
+        elapsed, latencies = await storm(login, password, hashed)
+        if not latencies:
+            latencies = [elapsed * 1000]
+        print(f"{mode:>10} {elapsed:>10.2f} {statistics.median(latencies):>15.1f} {percentile(latencies, 99):>15.1f} {max(latencies):>15.1f}")
+
+if __name__ == "__main__":
+    asyncio.run(run_benchmark())
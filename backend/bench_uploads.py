@@ -0,0 +1,72 @@
+import asyncio
+import os
+import shutil
+import statistics
+import tempfile
+import time
+
+from fastapi import UploadFile
+from starlette.datastructures import Headers
+
+from app.uploads import store_upload, SCRIPT_UPLOAD_POLICY
+
+# Concurrent 50 MB script uploads versus latency of everything else on the loop.
+# Uploads are fed from spooled temp files exactly as Starlette hands them to the routes;
+# the probe stands in for unrelated API requests. Needs no database.
+UPLOADS = 8
+UPLOAD_MB = 50
+PROBE_INTERVAL = 0.005
+
+def make_upload(payload: bytes) -> UploadFile:
+    spool = tempfile.SpooledTemporaryFile(max_size=1024 * 1024)
+    spool.write(payload)
+    spool.seek(0)
+    return UploadFile(spool, size=len(payload), filename="script.pdf", headers=Headers({"content-type": "application/pdf"}))
+
+async def legacy_save(file: UploadFile, directory: str, filename: str):
+    # What create_new_project did before: a synchronous copy inside the async handler
+    with open(os.path.join(directory, filename), "wb+") as file_object:
+        shutil.copyfileobj(file.file, file_object)
+
+async def pipeline_save(file: UploadFile, directory: str, filename: str):
+    await store_upload(file, SCRIPT_UPLOAD_POLICY, directory)
+
+async def probe(latencies, stop):
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(PROBE_INTERVAL)
+        latencies.append((time.perf_counter() - start - PROBE_INTERVAL) * 1000)
+
+async def run_mode(save, payload, directory):
+    # Distinct contents, so the content-addressed store has to write every one
+    uploads = [make_upload(payload + str(i).encode()) for i in range(UPLOADS)]
+    latencies = []
+    stop = asyncio.Event()
+    probe_task = asyncio.create_task(probe(latencies, stop))
+    await asyncio.sleep(0.05)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(save(upload, directory, f"script-{i}.pdf") for i, upload in enumerate(uploads)))
+    elapsed = time.perf_counter() - start
+
+    stop.set()
+    await probe_task
+    for upload in uploads:
+        upload.file.close()
+    return elapsed, latencies or [elapsed * 1000]
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+async def run_benchmark():
+    payload = b"%PDF-1.4\n" + os.urandom(UPLOAD_MB * 1024 * 1024)
+    print(f"{UPLOADS} concurrent uploads of {UPLOAD_MB} MB")
+    print(f"{'mode':>10} {'total (s)':>10} {'probe p50 (ms)':>15} {'probe p99 (ms)':>15} {'probe max (ms)':>15}")
+    for mode, save in [("legacy", legacy_save), ("pipeline", pipeline_save)]:
+        with tempfile.TemporaryDirectory() as directory:
+            elapsed, latencies = await run_mode(save, payload, directory)
+        print(f"{mode:>10} {elapsed:>10.2f} {statistics.median(latencies):>15.1f} {percentile(latencies, 99):>15.1f} {max(latencies):>15.1f}")
+
+if __name__ == "__main__":
+    asyncio.run(run_benchmark())
@@ -0,0 +1,79 @@
+import asyncio
+import os
+import sys
+import time
+from datetime import timedelta
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from app.repository import iter_orphan_blobs, delete_orphan_blob, rebuild_blob_refs
+from app.uploads import BLOB_DIR, remove_blob_file
+from app.deal_memos import sweep_deal_memos
+
+load_dotenv()
+
+MONGODB_URI = os.getenv("MONGODB_URI")
+if not MONGODB_URI:
+    print("MONGODB_URI not found in .env")
+    exit(1)
+
+# Blobs must have been unreferenced (or never attached) for this long before they are deleted,
+# so an image uploaded a moment before its SKU is saved is not collected in between.
+GRACE = timedelta(hours=float(os.getenv("UPLOAD_GC_GRACE_HOURS", "24")))
+
+def untracked_files(known_ids: set) -> list:
+    """Files under BLOB_DIR with no blob document (e.g. a crash between write and register) or left-over temp files."""
+    cutoff = time.time() - GRACE.total_seconds()
+    stale = []
+    for root, _, files in os.walk(BLOB_DIR):
+        for name in files:
+            path = os.path.join(root, name)
+            # Variants (<sha256>@<name>.webp) belong to their original's blob
+            blob_id = os.path.splitext(name)[0].split("@")[0]
+            if (name.startswith(".upload-") or blob_id not in known_ids) and os.path.getmtime(path) < cutoff:
+                stale.append(path)
+    return stale
+
+async def gc_uploads(dry_run: bool, rebuild: bool):
+    client = AsyncIOMotorClient(MONGODB_URI)
+    db = client.get_database("backdrop_db")
+
+    if rebuild:
+        corrected = await rebuild_blob_refs(db)
+        print(f"Recounted references; corrected {corrected} blobs.")
+
+    removed, freed = 0, 0
+    orphans = [doc async for doc in iter_orphan_blobs(db, GRACE)]
+    for orphan in orphans:
+        if dry_run:
+            print(f"Would remove {orphan['path']} ({orphan.get('size', 0)} bytes)")
+            continue
+        # Conditional delete: skipped if something referenced or re-uploaded it since the scan
+        doc = await delete_orphan_blob(db, orphan["_id"], GRACE)
+        if doc:
+            remove_blob_file(doc["path"])
+            removed += 1
+            freed += doc.get("size", 0)
+
+    known_ids = set(await db["blobs"].distinct("_id"))
+    for path in untracked_files(known_ids):
+        if dry_run:
+            print(f"Would remove untracked {path}")
+            continue
+        remove_blob_file(path)
+        removed += 1
+
+    # Rendered deal memos are a cache: every bid change renders a new version and old ones age out here
+    memos = sweep_deal_memos(dry_run=dry_run)
+    if dry_run:
+        for path in memos:
+            print(f"Would remove deal memo {path}")
+
+    if not dry_run:
+        print(f"Removed {removed} files, {freed / (1024 * 1024):.1f} MB of orphaned blobs.")
+        print(f"Removed {len(memos)} expired deal memo renders.")
+
+if __name__ == "__main__":
+    # Usage: python gc_uploads.py [--dry-run] [--rebuild-refs]
+    args = sys.argv[1:]
+    asyncio.run(gc_uploads("--dry-run" in args, "--rebuild-refs" in args))
@@ -0,0 +1,44 @@
+import asyncio
+import os
+import sys
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from app.script_index import index_project_script
+from app.uploads import local_path
+from app.workers import shutdown_worker_pool
+
+load_dotenv()
+
+MONGODB_URI = os.getenv("MONGODB_URI")
+if not MONGODB_URI:
+    print("MONGODB_URI not found in .env")
+    exit(1)
+
+async def index_scripts(reindex: bool):
+    client = AsyncIOMotorClient(MONGODB_URI)
+    db = client.get_database("backdrop_db")
+
+    # New uploads are indexed by the API; this covers projects created before that or whose task failed
+    query = {"doc_link": {"$ne": None}}
+    if not reindex:
+        query["script_index"] = None
+    indexed, skipped = 0, 0
+    async for project in db["projects"].find(query, {"doc_link": 1}):
+        path = local_path(project.get("doc_link"))
+        if not path or not os.path.exists(path):
+            print(f"Skipping project {project['_id']}: script file not found")
+            skipped += 1
+            continue
+        index = await index_project_script(db, str(project["_id"]), path)
+        if index:
+            indexed += 1
+        else:
+            skipped += 1
+
+    print(f"Indexed {indexed} scripts, skipped {skipped}.")
+    shutdown_worker_pool()
+
+if __name__ == "__main__":
+    # Usage: python index_scripts.py [--reindex]
+    asyncio.run(index_scripts("--reindex" in sys.argv[1:]))
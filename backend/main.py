@@ -1,17 +1,55 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from app.database import db
+from app.indexes import ensure_indexes
+from app.financials import ensure_project_financials
+from app.pagination import NEXT_CURSOR_HEADER
+from app.principal_cache import principal_cache
+from app.response_cache import slot_cache, overview_cache
+from app.repository import shutdown_password_executor
+from app.workers import shutdown_worker_pool
+from app.events import bid_events
+from app.uploads import UploadSizeLimitMiddleware, ImmutableStaticFiles, BLOB_DIR, BLOB_URL_PREFIX
 from app.auth import router as auth_router
 from app.routers.projects import router as projects_router
 from app.routers.slots import router as slots_router
 from app.routers.skus import router as skus_router
 from app.routers.bids import router as bids_router
 from app.routers.finance import router as finance_router
+import logging
 import os
 import uvicorn
 
-app = FastAPI()
+logger = logging.getLogger(__name__)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Index creation is idempotent; a failure here should not keep the API from starting
+    try:
+        created, failed = await ensure_indexes(db)
+        if created:
+            logger.info("Created indexes: %s", ", ".join(created))
+        if failed:
+            # Queries relying on these fall back to collection scans; see the errors logged above
+            logger.warning("Could not create %d index(es): %s", len(failed), "; ".join(failed))
+    except Exception as e:
+        logger.warning("Could not reconcile indexes on startup: %s", e)
+    # The financing dashboard reads project_financials; build it once if it was never built
+    try:
+        built = await ensure_project_financials(db)
+        if built is not None:
+            logger.info("Built project_financials for %d project(s)", built)
+    except Exception as e:
+        logger.warning("Could not build project_financials on startup: %s", e)
+    bid_events.start(db)
+    yield
+    await bid_events.stop()
+    shutdown_password_executor()
+    shutdown_worker_pool()
+
+app = FastAPI(lifespan=lifespan)
 
 app.include_router(auth_router, prefix="/api/v1/auth", tags=["auth"])
 app.include_router(projects_router, prefix="/api/v1/projects", tags=["projects"])
@@ -20,8 +58,9 @@ app.include_router(skus_router, prefix="/api/v1/skus", tags=["skus"])
 app.include_router(bids_router, prefix="/api/v1/bids", tags=["bids"])
 app.include_router(finance_router, prefix="/api/v1/finance", tags=["finance"])
 
-# Mount static files
-os.makedirs("static/uploads", exist_ok=True)
+# Mount static files; content-addressed blobs first so they get the immutable Cache-Control
+os.makedirs(BLOB_DIR, exist_ok=True)
+app.mount(BLOB_URL_PREFIX, ImmutableStaticFiles(directory=BLOB_DIR), name="blobs")
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
 origins = [
@@ -34,12 +73,15 @@ origins = [
     "https://backdrop-ny3s.onrender.com",
 ]
 
+app.add_middleware(UploadSizeLimitMiddleware)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=origins,
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER, "ETag"],
 )
 
 @app.get("/healthz")
@@ -51,7 +93,7 @@ async def healthz():
     except Exception as e:
         db_status = f"disconnected: {str(e)}"
         
-    return {"status": "ok", "database": db_status}
+    return {"status": "ok", "database": db_status, "principal_cache": principal_cache.stats(), "slot_cache": slot_cache.stats(), "overview_cache": overview_cache.stats(), "bid_events": bid_events.stats()}
 
 if __name__ == "__main__":
     uvicorn.run("main:app", host="0.0.0.0", port=int(os.environ.get("PORT", 8000)))
\ No newline at end of file
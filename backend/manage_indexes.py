@@ -0,0 +1,44 @@
+import asyncio
+import os
+import sys
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from app.indexes import ensure_indexes, check_query_plans
+
+load_dotenv()
+
+MONGODB_URI = os.getenv("MONGODB_URI")
+if not MONGODB_URI:
+    print("MONGODB_URI not found in .env")
+    exit(1)
+
+async def manage_indexes(check: bool):
+    client = AsyncIOMotorClient(MONGODB_URI)
+    db = client.get_database("backdrop_db")
+
+    created, failed = await ensure_indexes(db)
+    if created:
+        print(f"Created indexes: {', '.join(created)}")
+    elif not failed:
+        print("All declared indexes already exist.")
+    if failed:
+        print("Indexes that could not be created:")
+        for failure in failed:
+            print(f"  {failure}")
+
+    if check:
+        failures = await check_query_plans(db)
+        if failures:
+            print("Queries not served by an index:")
+            for failure in failures:
+                print(f"  {failure}")
+            exit(1)
+        print("All repository queries use an index.")
+
+    if failed:
+        exit(1)
+
+if __name__ == "__main__":
+    # Usage: python manage_indexes.py [--check]
+    asyncio.run(manage_indexes("--check" in sys.argv[1:]))
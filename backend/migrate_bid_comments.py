@@ -0,0 +1,80 @@
+import asyncio
+import os
+from datetime import datetime
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import UpdateOne
+
+load_dotenv()
+
+MONGODB_URI = os.getenv("MONGODB_URI")
+if not MONGODB_URI:
+    print("MONGODB_URI not found in .env")
+    exit(1)
+
+# The buyer's thread view loads this many comments (DealApprovalPage, ?limit=500); longer threads
+# are migrated in full but only their first page shows there until it follows X-Next-Cursor
+THREAD_VIEW_LIMIT = 500
+
+async def migrate_bid_comments():
+    client = AsyncIOMotorClient(MONGODB_URI)
+    db = client.get_database("backdrop_db")
+
+    # Bids written before comments moved to their own collection
+    cursor = db["bids"].find({"comments": {"$exists": True}}, {"comments": 1, "counterparty_id": 1, "created_date": 1})
+
+    migrated_bids = 0
+    migrated_comments = 0
+    skipped_comments = 0
+    long_threads = 0
+    migrated_at = datetime.utcnow().isoformat()
+    async for doc in cursor:
+        bid_id = str(doc["_id"])
+        # The Comment model requires author_id and timestamp, which old embedded comments may lack:
+        # they default to the bid's author and creation time (or the time of this migration)
+        defaults = {"author_id": doc.get("counterparty_id"), "timestamp": doc.get("created_date") or migrated_at}
+        comments = []
+        skipped = 0
+        for position, comment in enumerate(doc.get("comments") or []):
+            if not isinstance(comment, dict) or not (comment.get("author_id") or defaults["author_id"]):
+                skipped += 1
+                continue
+            comments.append({
+                # Comments without an id are keyed by their place in the embedded array, which a re-run sees unchanged
+                "legacy_id": comment.get("id") or f"position-{position}",
+                "author_id": comment.get("author_id") or defaults["author_id"],
+                "text": comment.get("text") or "",
+                "timestamp": comment.get("timestamp") or defaults["timestamp"],
+            })
+        if len(comments) > THREAD_VIEW_LIMIT:
+            long_threads += 1
+        # Upserts keyed on the old embedded id make a re-run after an interruption safe;
+        # ordered writes assign _ids in thread order, which is what the API sorts by
+        writes = [
+            UpdateOne(
+                {"bid_id": bid_id, "legacy_id": comment["legacy_id"]},
+                {"$setOnInsert": {"bid_id": bid_id, **comment}},
+                upsert=True,
+            )
+            for comment in sorted(comments, key=lambda c: c["timestamp"])
+        ]
+        if writes:
+            result = await db["comments"].bulk_write(writes, ordered=True)
+            migrated_comments += result.upserted_count
+        if skipped:
+            # Keep the embedded copy so nothing is lost; a re-run after fixing it by hand is safe
+            skipped_comments += skipped
+            continue
+        await db["bids"].update_one({"_id": doc["_id"]}, {"$unset": {"comments": ""}})
+        migrated_bids += 1
+
+    print(f"Moved {migrated_comments} comments out of {migrated_bids} bids.")
+    if skipped_comments:
+        print(f"Skipped {skipped_comments} malformed comments (not an object, or no author and no bid author); "
+              "their bids keep the embedded comments until fixed.")
+    if long_threads:
+        print(f"{long_threads} bids have more than {THREAD_VIEW_LIMIT} comments; the thread view shows only the first {THREAD_VIEW_LIMIT}.")
+
+if __name__ == "__main__":
+    # Usage: python migrate_bid_comments.py
+    asyncio.run(migrate_bid_comments())
@@ -0,0 +1,36 @@
+import asyncio
+import os
+import sys
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from app.financials import rebuild_project_financials, verify_project_financials
+
+load_dotenv()
+
+MONGODB_URI = os.getenv("MONGODB_URI")
+if not MONGODB_URI:
+    print("MONGODB_URI not found in .env")
+    exit(1)
+
+async def rebuild_financials(verify_only: bool):
+    client = AsyncIOMotorClient(MONGODB_URI)
+    db = client.get_database("backdrop_db")
+
+    if verify_only:
+        mismatches = await verify_project_financials(db)
+        if mismatches:
+            print(f"{len(mismatches)} project(s) out of date:")
+            for mismatch in mismatches:
+                print(f"  {mismatch}")
+            exit(1)
+        print("project_financials matches bids.")
+        return
+
+    written = await rebuild_project_financials(db)
+    print(f"Rebuilt project_financials for {written} project(s).")
+
+if __name__ == "__main__":
+    # Usage: python rebuild_financials.py [--verify]
+    # The API builds the read model on startup if it is empty; run this whenever --verify reports drift
+    asyncio.run(rebuild_financials("--verify" in sys.argv[1:]))
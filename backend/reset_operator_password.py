@@ -31,6 +31,8 @@ async def reset_password():
     )
     
     if result.modified_count > 0:
+        # Running API workers cache principals without password hashes, so logins see the new
+        # password immediately; cached profiles expire on their own (PRINCIPAL_CACHE_TTL_SECONDS).
         print(f"Password updated for {email}")
     else:
         print(f"User {email} not found or password already set (or match).")
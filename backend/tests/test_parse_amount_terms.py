@@ -0,0 +1,57 @@
+import os
+
+import pytest
+
+os.environ.setdefault("MONGODB_URI", "mongodb://localhost:27017")
+
+from app.models import PricingModel
+from app.repository import parse_amount_terms
+
+
+@pytest.mark.parametrize("terms, amount", [
+    ("$5000", 5000),
+    ("$5,000 flat", 5000),
+    ("USD 7.5k flat", 7500),
+    ("$1.2m", 1200000),
+    ("Q3 flight: $5000", 5000),
+    ("2 spots, $3000 each", 3000),
+])
+def test_fixed_amount_prefers_number_next_to_currency(terms, amount):
+    assert parse_amount_terms(terms, PricingModel.FIXED) == {"amount": amount, "currency": "USD", "rev_share_percent": None}
+
+
+@pytest.mark.parametrize("terms, amount, currency", [
+    ("€3.000", 3000, "EUR"),
+    ("3.000€", 3000, "EUR"),
+    ("5000 EUR", 5000, "EUR"),
+    ("£1.234,56", 1234.56, "GBP"),
+    ("€1,234.56", 1234.56, "EUR"),
+])
+def test_fixed_amount_separators_and_currency(terms, amount, currency):
+    parsed = parse_amount_terms(terms, PricingModel.FIXED)
+    assert parsed["amount"] == amount
+    assert parsed["currency"] == currency
+
+
+def test_fixed_amount_without_currency_falls_back_to_bare_number():
+    assert parse_amount_terms("flat fee 8000", PricingModel.FIXED)["amount"] == 8000
+
+
+def test_rev_share_commits_nothing_up_front():
+    assert parse_amount_terms("20% rev share", PricingModel.REV_SHARE) == {"amount": 0, "currency": "USD", "rev_share_percent": 20}
+    assert parse_amount_terms("15% of $200k GMV", PricingModel.REV_SHARE)["amount"] == 0
+
+
+def test_hybrid_reads_both_components():
+    assert parse_amount_terms("$5000 + 10% GMV", PricingModel.HYBRID) == {"amount": 5000, "currency": "USD", "rev_share_percent": 10}
+    assert parse_amount_terms("3.000€ + 12.5% of sales", PricingModel.HYBRID) == {"amount": 3000, "currency": "EUR", "rev_share_percent": 12.5}
+
+
+@pytest.mark.parametrize("terms, pricing_model", [
+    ("10% of sales", PricingModel.FIXED),
+    ("$5000 flat", PricingModel.REV_SHARE),
+    ("10% of sales", PricingModel.HYBRID),
+])
+def test_missing_component_is_rejected(terms, pricing_model):
+    with pytest.raises(ValueError):
+        parse_amount_terms(terms, pricing_model)
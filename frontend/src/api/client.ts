@@ -57,4 +57,17 @@ export const api = {
   post: <T>(endpoint: string, body: any) => fetchClient<T>(endpoint, { method: 'POST', body: body instanceof FormData ? body : JSON.stringify(body) }),
   put: <T>(endpoint: string, body: any) => fetchClient<T>(endpoint, { method: 'PUT', body: JSON.stringify(body) }),
   delete: <T>(endpoint: string) => fetchClient<T>(endpoint, { method: 'DELETE' }),
-};
\ No newline at end of file
+};
+
+// Server-Sent Events for the signed-in user's bids; EventSource cannot send headers, so the token rides in the query
+export type BidEventType = 'bid.created' | 'bid.updated' | 'bid.deleted' | 'comment.created' | 'resync';
+
+export function subscribeBidEvents(onEvent: (type: BidEventType, data: any) => void): EventSource {
+  const token = localStorage.getItem('token');
+  const source = new EventSource(`${API_BASE_URL}/bids/events${token ? `?access_token=${encodeURIComponent(token)}` : ''}`);
+  const types: BidEventType[] = ['bid.created', 'bid.updated', 'bid.deleted', 'comment.created', 'resync'];
+  for (const type of types) {
+    source.addEventListener(type, (e) => onEvent(type, JSON.parse((e as MessageEvent).data)));
+  }
+  return source;
+}
@@ -9,7 +9,7 @@ import { Avatar, AvatarFallback, AvatarImage } from '@/components/ui/avatar';
 import { ArrowLeft, Send, CheckCircle, ShieldCheck, UserCheck, FileText } from 'lucide-react';
 import { showSuccess, showError } from '@/utils/toast';
 // import { v4 as uuidv4 } from 'uuid'; // Removed
-import { api } from '@/api/client';
+import { api, subscribeBidEvents } from '@/api/client';
 
 const DealApprovalPage = () => {
   const { bidId } = useParams<{ bidId: string }>();
@@ -20,6 +20,7 @@ const DealApprovalPage = () => {
   const [slot, setSlot] = useState<IntegrationSlot | null>(null);
   const [script, setScript] = useState<ProjectScript | null>(null);
   const [usersMap, setUsersMap] = useState<Map<string, User>>(new Map());
+  const [comments, setComments] = useState<Comment[]>([]);
   const [newComment, setNewComment] = useState('');
   const [creator, setCreator] = useState<User | null>(null);
 
@@ -62,16 +63,16 @@ const DealApprovalPage = () => {
             } catch (e) { console.error("Failed to fetch buyer", e); }
         }
         
-        // Fetch authors of comments if not already fetched
-        if (fetchedBid.comments) {
-            for (const comment of fetchedBid.comments) {
-                const authorId = comment.authorId || comment.author_id; // Handle backend naming
-                if (authorId && !uMap.has(authorId)) {
-                     try {
-                        const fetchedAuthor = await api.get<User>(`/auth/users/${authorId}`);
-                        uMap.set(authorId, fetchedAuthor);
-                    } catch (e) { console.error("Failed to fetch comment author", e); }
-                }
+        // Comments are a separate resource; fetch the thread and its authors
+        const fetchedComments = await api.get<Comment[]>(`/bids/${bidId}/comments?limit=500`);
+        setComments(fetchedComments);
+        for (const comment of fetchedComments) {
+            const authorId = comment.authorId || comment.author_id; // Handle backend naming
+            if (authorId && !uMap.has(authorId)) {
+                 try {
+                    const fetchedAuthor = await api.get<User>(`/auth/users/${authorId}`);
+                    uMap.set(authorId, fetchedAuthor);
+                } catch (e) { console.error("Failed to fetch comment author", e); }
             }
         }
 
@@ -92,12 +93,30 @@ const DealApprovalPage = () => {
     fetchDealData();
   }, [bidId, user, navigate, fetchDealData]);
 
+  // Live updates: the server pushes comment and status deltas for this user's bids
+  useEffect(() => {
+    if (!bidId) return;
+    const source = subscribeBidEvents((type, event) => {
+      if (type === 'resync') {
+        fetchDealData();
+        return;
+      }
+      if (event.bid_id !== bidId) return;
+      if (type === 'comment.created') {
+        setComments(prev => prev.some(p => p.id === event.comment.id) ? prev : [...prev, event.comment]);
+      } else if (type === 'bid.updated') {
+        setBid(prev => prev ? { ...prev, ...event.changes } : prev);
+      }
+    });
+    return () => source.close();
+  }, [bidId, fetchDealData]);
+
   const handleAddComment = async () => {
     if (!user || !bid || !newComment.trim()) return;
 
     try {
-        const updatedBid = await api.post<BidReservation>(`/bids/${bid.id}/comments`, { text: newComment });
-        setBid(updatedBid);
+        const created = await api.post<Comment>(`/bids/${bid.id}/comments`, { text: newComment });
+        setComments(prev => [...prev, created]);
         setNewComment('');
         showSuccess('Comment added.');
     } catch (error) {
@@ -160,7 +179,7 @@ const DealApprovalPage = () => {
             </CardHeader>
             <CardContent>
               <div className="space-y-4 h-96 overflow-y-auto p-4 border rounded-md">
-                {(bid.comments || []).map(comment => {
+                {comments.map(comment => {
                   const authorId = comment.authorId || comment.author_id; // Handle backend naming
                   const author = usersMap.get(authorId);
                   return (
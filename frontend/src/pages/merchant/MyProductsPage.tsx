@@ -451,8 +451,8 @@ const MyProductsPage = () => {
                 <div className="w-full aspect-square sm:w-28 md:w-32 flex-shrink-0">
                   {sku.imageUrl ? (
                     <Dialog>
-                      <DialogTrigger asChild><img src={sku.imageUrl} alt={sku.title} className="w-full h-full object-cover rounded-md cursor-pointer" /></DialogTrigger>
-                      <DialogContent className="sm:max-w-2xl"><DialogHeader><DialogTitle>{sku.title}</DialogTitle></DialogHeader><img src={sku.imageUrl} alt={sku.title} className="w-full h-auto rounded-lg" /></DialogContent>
+                      <DialogTrigger asChild><img src={sku.imageVariants?.thumbnail || sku.imageUrl} alt={sku.title} className="w-full h-full object-cover rounded-md cursor-pointer" /></DialogTrigger>
+                      <DialogContent className="sm:max-w-2xl"><DialogHeader><DialogTitle>{sku.title}</DialogTitle></DialogHeader><img src={sku.imageVariants?.web || sku.imageUrl} alt={sku.title} className="w-full h-auto rounded-lg" /></DialogContent>
                     </Dialog>
                   ) : (
                     <div className="w-full h-full bg-muted flex items-center justify-center rounded-md"><Package className="h-12 w-12 text-muted-foreground" /></div>
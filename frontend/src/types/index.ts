@@ -66,6 +66,7 @@ export interface SKU {
   margin: number; // 0-100
   tags: string[];
   imageUrl?: string;
+  imageVariants?: { thumbnail?: string; web?: string }; // Downscaled renditions, once rendered
   createdDate?: string;
   created_date?: string;
   lastModifiedDate?: string;
@@ -74,6 +75,7 @@ export interface SKU {
 
 export interface Comment {
   id: string;
+  bid_id?: string;
   authorId?: string;
   author_id?: string;
   text: string;
@@ -94,7 +96,7 @@ export interface BidReservation {
   flightWindow?: string; // text/date range
   flight_window?: string;
   status: "Pending" | "Accepted" | "AwaitingFinalApproval" | "Declined" | "Committed" | "Cancelled";
-  comments?: Comment[];
+  comments?: Comment[]; // Dummy data only; the API serves comments from /bids/{id}/comments
   creatorFinalApproval?: boolean;
   creator_final_approval?: boolean;
   buyerFinalApproval?: boolean;
@@ -11,6 +11,31 @@ SLOTS_URL = f"{BASE_URL}/slots"
 TEST_EMAIL = "creator_s2@example.com"
 TEST_PASSWORD = "password123"
 
+# A valid one-page blank PDF
+MINIMAL_PDF = (
+    b"%PDF-1.4\n"
+    b"1 0 obj\n"
+    b"<< /Type /Catalog /Pages 2 0 R >>\n"
+    b"endobj\n"
+    b"2 0 obj\n"
+    b"<< /Type /Pages /Kids [3 0 R] /Count 1 >>\n"
+    b"endobj\n"
+    b"3 0 obj\n"
+    b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] >>\n"
+    b"endobj\n"
+    b"xref\n"
+    b"0 4\n"
+    b"0000000000 65535 f \n"
+    b"0000000009 00000 n \n"
+    b"0000000058 00000 n \n"
+    b"0000000115 00000 n \n"
+    b"trailer\n"
+    b"<< /Size 4 /Root 1 0 R >>\n"
+    b"startxref\n"
+    b"186\n"
+    b"%%EOF\n"
+)
+
 def get_auth_token():
     print("Authenticating...")
     # Try login first
@@ -40,9 +65,9 @@ def test_create_project(token):
     print("\nTesting Create Project...")
     headers = {"Authorization": f"Bearer {token}"}
     
-    # Create a dummy file
-    with open("dummy_script.pdf", "w") as f:
-        f.write("Dummy PDF content")
+    # Create a dummy file; uploads must be a real PDF (the API checks the %PDF- signature)
+    with open("dummy_script.pdf", "wb") as f:
+        f.write(MINIMAL_PDF)
     
     files = {
         "file": ("dummy_script.pdf", open("dummy_script.pdf", "rb"), "application/pdf")
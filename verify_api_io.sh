@@ -24,7 +24,8 @@ fi
 echo "Login successful."
 
 echo "2. Creating Project..."
-echo "dummy content" > verify_dummy.pdf
+# Uploads must be a real PDF (the API checks the %PDF- signature); this is a blank one-page document
+printf '%b' "%PDF-1.4\n1 0 obj\n<< /Type /Catalog /Pages 2 0 R >>\nendobj\n2 0 obj\n<< /Type /Pages /Kids [3 0 R] /Count 1 >>\nendobj\n3 0 obj\n<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] >>\nendobj\nxref\n0 4\n0000000000 65535 f \n0000000009 00000 n \n0000000058 00000 n \n0000000115 00000 n \ntrailer\n<< /Size 4 /Root 1 0 R >>\nstartxref\n186\n%%EOF\n" > verify_dummy.pdf
 CREATE_RESP=$(curl -s -X POST "$BASE_URL/projects/" \
   -H "Authorization: Bearer $TOKEN" \
   -F "file=@verify_dummy.pdf" \